@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Auth Fast Path Benchmark for OnlyMentors.ai
+===========================================
+
+Measures requests per second for an identity-only endpoint under three
+authentication strategies: a users lookup on every request (the historical
+get_current_user), the short-TTL principal cache, and the stateless path
+that trusts signed JWT claims after a revocation-table check. Requests go
+through a real FastAPI app over an in-process ASGI transport, with a pool of
+users sharing the load; users live in a scratch database dropped afterwards.
+
+Usage: MONGO_URL=mongodb://localhost:27017 python auth_fast_path_benchmark.py [requests] [concurrency] [users]
+"""
+
+import os
+import sys
+import time
+import uuid
+import random
+import asyncio
+from datetime import datetime, timedelta
+import jwt
+import httpx
+from fastapi import FastAPI, Depends, HTTPException, Request
+from motor.motor_asyncio import AsyncIOMotorClient
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from user_history_system import LEAN_USER_PROJECTION
+from principal_cache_system import PrincipalCache
+from token_revocation_system import TokenRevocationTable, user_token_claims, has_identity_claims
+
+# Load environment variables
+load_dotenv()
+
+JWT_SECRET = "auth-benchmark-secret"
+
+def mint(user: dict) -> str:
+    claims = user_token_claims(user)
+    claims["exp"] = datetime.utcnow() + timedelta(days=7)
+    return jwt.encode(claims, JWT_SECRET, algorithm="HS256")
+
+def build_app(db, cache: PrincipalCache, revocations: TokenRevocationTable) -> FastAPI:
+    app = FastAPI()
+
+    def decode(request: Request) -> dict:
+        try:
+            return jwt.decode(request.headers["authorization"][7:], JWT_SECRET, algorithms=["HS256"])
+        except jwt.PyJWTError:
+            raise HTTPException(status_code=401, detail="Invalid token")
+
+    async def db_user(request: Request):
+        user_id = decode(request)["user_id"]
+        user = await db.users.find_one({"user_id": user_id}, LEAN_USER_PROJECTION)
+        if not user:
+            raise HTTPException(status_code=401, detail="User not found")
+        return user
+
+    async def cached_user(request: Request):
+        user_id = decode(request)["user_id"]
+        user = await cache.get_or_load(
+            "user", user_id, lambda: db.users.find_one({"user_id": user_id}, LEAN_USER_PROJECTION)
+        )
+        if not user:
+            raise HTTPException(status_code=401, detail="User not found")
+        return user
+
+    async def stateless_user(request: Request):
+        payload = decode(request)
+        if not has_identity_claims(payload):
+            raise HTTPException(status_code=401, detail="Token has no identity claims")
+        if revocations.is_revoked(payload["user_id"], payload["iat"]):
+            raise HTTPException(status_code=401, detail="Token has been revoked")
+        return payload
+
+    @app.get("/db")
+    async def via_db(current_user = Depends(db_user)):
+        return {"user_id": current_user["user_id"]}
+
+    @app.get("/cached")
+    async def via_cache(current_user = Depends(cached_user)):
+        return {"user_id": current_user["user_id"]}
+
+    @app.get("/stateless")
+    async def via_claims(current_user = Depends(stateless_user)):
+        return {"user_id": current_user["user_id"]}
+
+    return app
+
+async def drive(client: httpx.AsyncClient, path: str, tokens, requests: int, concurrency: int):
+    remaining = [requests]
+    failures = [0]
+
+    async def worker():
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            token = random.choice(tokens)
+            response = await client.get(path, headers={"Authorization": f"Bearer {token}"})
+            if response.status_code != 200:
+                failures[0] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return time.perf_counter() - started, failures[0]
+
+async def run_benchmark(requests: int, concurrency: int, users: int):
+    mongo_url = os.getenv("MONGO_URL", "mongodb://localhost:27017")
+    client = AsyncIOMotorClient(mongo_url)
+    db = client.onlymentors_benchmark_db
+
+    # Realistic user documents, including a legacy history array the lean projection skips
+    docs = [
+        {
+            "user_id": str(uuid.uuid4()),
+            "email": f"bench{i}@example.com",
+            "full_name": f"Bench User {i}",
+            "password_hash": "$2b$12$" + "x" * 53,
+            "questions_asked": i % 10,
+            "is_subscribed": i % 3 == 0,
+            "question_history": [{"question": "q" * 200, "timestamp": datetime.utcnow()} for _ in range(50)]
+        }
+        for i in range(users)
+    ]
+    await db.users.insert_many(docs)
+    await db.users.create_index("user_id")
+    tokens = [mint(doc) for doc in docs]
+
+    revocations = TokenRevocationTable(db.auth_revocations)
+    await revocations.ensure_indexes()
+    # A realistic revocation table: a handful of recently suspended users who are not in the pool
+    for _ in range(100):
+        await revocations.revoke(str(uuid.uuid4()), "suspended")
+    await revocations.refresh()
+
+    cache = PrincipalCache(ttl_seconds=30)
+    app = build_app(db, cache, revocations)
+
+    print(f"📊 {requests} requests, {concurrency} concurrent, {users} users against {mongo_url}\n")
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as http:
+            # Warm-up so connection pools and the cache start in steady state
+            for path in ("/db", "/cached", "/stateless"):
+                await drive(http, path, tokens, min(200, requests), concurrency)
+
+            baseline = None
+            for name, path in (("db per request", "/db"), ("principal cache", "/cached"), ("stateless claims", "/stateless")):
+                elapsed, failures = await drive(http, path, tokens, requests, concurrency)
+                rps = requests / elapsed
+                baseline = baseline or rps
+                print(f"{name:18} {rps:9.0f} req/s   {elapsed / requests * 1000:6.3f} ms/request   "
+                      f"x{rps / baseline:4.2f}   failures: {failures}")
+        print(f"\nprincipal cache: {cache.get_stats()['by_kind']['user']}")
+        print(f"revocation table: {revocations.get_stats()['entries']} entries")
+    finally:
+        await client.drop_database("onlymentors_benchmark_db")
+        client.close()
+
+if __name__ == "__main__":
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    users = int(sys.argv[3]) if len(sys.argv) > 3 else 500
+    asyncio.run(run_benchmark(requests, concurrency, users))
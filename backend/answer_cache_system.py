@@ -0,0 +1,265 @@
+"""
+OnlyMentors.ai Answer Cache System
+Bounded, process-stable LRU/TTL cache for AI mentor answers
+"""
+
+import os
+import re
+import time
+import hashlib
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Any, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "5000"))
+ANSWER_CACHE_MAX_BYTES = int(os.getenv("ANSWER_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "300"))
+PERSISTENT_ANSWER_CACHE_TTL_SECONDS = int(os.getenv("PERSISTENT_ANSWER_CACHE_TTL_SECONDS", str(24 * 3600)))
+ANSWER_CACHE_WARM_LIMIT = int(os.getenv("ANSWER_CACHE_WARM_LIMIT", "1000"))
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = " \t\n?!.,;:"
+
+def normalize_question(question: str) -> str:
+    """Normalize a question so trivial formatting differences share a cache key"""
+    return _WHITESPACE_RE.sub(" ", question or "").strip(_TRAILING_PUNCTUATION).lower()
+
+def question_digest(mentor_id: str, question: str, prompt_version: str = "") -> str:
+    """Stable digest of mentor + persona prompt version + normalized question (identical across workers and restarts)"""
+    payload = f"{mentor_id}\x1f{prompt_version}\x1f{normalize_question(question)}".encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+class AnswerCache:
+    """In-process LRU cache bounded by entry count and total bytes, with TTL expiry"""
+
+    def __init__(self, max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+                 max_bytes: int = ANSWER_CACHE_MAX_BYTES,
+                 ttl_seconds: int = ANSWER_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.hits_by_source: Dict[str, int] = defaultdict(int)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry["expires_at"] > time.monotonic()
+
+    @staticmethod
+    def _entry_size(key: str, value: str) -> int:
+        return len(key) + len(value.encode("utf-8"))
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry["size"]
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached answer and mark it most recently used, or None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        if entry["expires_at"] <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        if entry["source"]:
+            self.hits_by_source[entry["source"]] += 1
+        return entry["value"]
+
+    def set(self, key: str, value: str, ttl_seconds: Optional[int] = None, source: Optional[str] = None) -> None:
+        """Store an answer, evicting least recently used entries to stay within bounds"""
+        size = self._entry_size(key, value)
+        if size > self.max_bytes:
+            logger.warning(f"Answer for {key} is {size} bytes, larger than the whole cache; not cached")
+            return
+
+        if key in self._entries:
+            self._remove(key)
+
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._entries[key] = {
+            "value": value,
+            "size": size,
+            "source": source,
+            "expires_at": time.monotonic() + ttl
+        }
+        self._bytes += size
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def delete(self, key: str) -> bool:
+        """Drop a single entry; returns True if it was present"""
+        if key in self._entries:
+            self._remove(key)
+            return True
+        return False
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters for the admin performance endpoint"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups * 100, 2) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hits_by_source": dict(self.hits_by_source)
+        }
+
+class PersistentAnswerCache:
+    """Shared second-tier answer cache stored in a Mongo collection with a TTL index"""
+
+    def __init__(self, collection, ttl_seconds: int = PERSISTENT_ANSWER_CACHE_TTL_SECONDS):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.errors = 0
+        self.warmed = 0
+        self.hits_by_source: Dict[str, int] = defaultdict(int)
+
+    async def ensure_indexes(self):
+        """Create the digest lookup index and the TTL index that expires old answers"""
+        await self.collection.create_index("digest", unique=True)
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+        await self.collection.create_index([("last_hit_at", -1)])
+
+    async def get(self, digest: str) -> Optional[str]:
+        """Fetch a live answer by digest and record the hit"""
+        entry = await self.get_entry(digest)
+        return entry["answer"] if entry else None
+
+    async def get_entry(self, digest: str) -> Optional[Dict[str, Any]]:
+        """Like get, but returns {"answer", "source"} so the source can follow the answer"""
+        now = datetime.utcnow()
+        try:
+            doc = await self.collection.find_one_and_update(
+                {"digest": digest, "expires_at": {"$gt": now}},
+                {"$set": {"last_hit_at": now}, "$inc": {"hit_count": 1}},
+                projection={"_id": 0, "answer": 1, "source": 1}
+            )
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Persistent answer cache read failed: {str(e)}")
+            return None
+
+        if not doc:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        if doc.get("source"):
+            self.hits_by_source[doc["source"]] += 1
+        return doc
+
+    async def is_fresh(self, digest: str, min_remaining_seconds: int) -> bool:
+        """Whether a live answer exists that will not expire within min_remaining_seconds"""
+        horizon = datetime.utcnow() + timedelta(seconds=min_remaining_seconds)
+        try:
+            return await self.collection.count_documents(
+                {"digest": digest, "expires_at": {"$gt": horizon}}, limit=1
+            ) > 0
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Persistent answer cache read failed: {str(e)}")
+            return False
+
+    async def set(self, digest: str, mentor_id: str, question: str, answer: str,
+                  source: Optional[str] = None):
+        """Upsert an answer; the TTL index removes it once expires_at passes"""
+        now = datetime.utcnow()
+        try:
+            await self.collection.update_one(
+                {"digest": digest},
+                {
+                    "$set": {
+                        "mentor_id": mentor_id,
+                        "question": normalize_question(question),
+                        "answer": answer,
+                        "source": source,
+                        "updated_at": now,
+                        "expires_at": now + timedelta(seconds=self.ttl_seconds)
+                    },
+                    "$setOnInsert": {
+                        "created_at": now,
+                        "last_hit_at": now,
+                        "hit_count": 0
+                    }
+                },
+                upsert=True
+            )
+            self.writes += 1
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Persistent answer cache write failed: {str(e)}")
+
+    async def warm(self, memory_cache: AnswerCache, limit: int = ANSWER_CACHE_WARM_LIMIT,
+                   on_entry: Optional[Callable[[Dict[str, Any]], None]] = None) -> int:
+        """Load the most recently hit live answers into the in-memory tier"""
+        now = datetime.utcnow()
+        warmed = 0
+        try:
+            cursor = self.collection.find(
+                {"expires_at": {"$gt": now}},
+                {"_id": 0, "digest": 1, "mentor_id": 1, "question": 1, "answer": 1, "source": 1, "expires_at": 1}
+            ).sort("last_hit_at", -1).limit(limit)
+
+            async for doc in cursor:
+                remaining = (doc["expires_at"] - now).total_seconds()
+                memory_cache.set(doc["digest"], doc["answer"], ttl_seconds=min(memory_cache.ttl_seconds, remaining),
+                                 source=doc.get("source"))
+                if on_entry:
+                    on_entry(doc)
+                warmed += 1
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Persistent answer cache warm-up failed: {str(e)}")
+
+        self.warmed += warmed
+        return warmed
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups * 100, 2) if lookups else 0.0,
+            "writes": self.writes,
+            "errors": self.errors,
+            "warmed_entries": self.warmed,
+            "hits_by_source": dict(self.hits_by_source)
+        }
+
+# Initialize process-wide answer cache
+answer_cache = AnswerCache()
@@ -0,0 +1,176 @@
+"""
+OnlyMentors.ai Answer Prewarm System
+Off-peak pre-generation of answers for each mentor's most-asked questions
+"""
+
+import os
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import logging
+
+from answer_cache_system import normalize_question
+
+logger = logging.getLogger(__name__)
+
+ANSWER_PREWARM_ENABLED = os.getenv("ANSWER_PREWARM_ENABLED", "true").lower() == "true"
+ANSWER_PREWARM_TOP_K = int(os.getenv("ANSWER_PREWARM_TOP_K", "20"))
+ANSWER_PREWARM_MIN_COUNT = int(os.getenv("ANSWER_PREWARM_MIN_COUNT", "3"))
+ANSWER_PREWARM_LOOKBACK_DAYS = int(os.getenv("ANSWER_PREWARM_LOOKBACK_DAYS", "7"))
+# Off-peak window as UTC hours "start-end" (end exclusive, may wrap midnight)
+ANSWER_PREWARM_WINDOW_UTC = os.getenv("ANSWER_PREWARM_WINDOW_UTC", "2-6")
+# Rate budget for pre-generation calls
+ANSWER_PREWARM_RATE_PER_MINUTE = float(os.getenv("ANSWER_PREWARM_RATE_PER_MINUTE", "30"))
+# Answers expiring sooner than this are regenerated
+ANSWER_PREWARM_REFRESH_SECONDS = int(os.getenv("ANSWER_PREWARM_REFRESH_SECONDS", str(12 * 3600)))
+ANSWER_PREWARM_CHECK_SECONDS = int(os.getenv("ANSWER_PREWARM_CHECK_SECONDS", "600"))
+
+PREWARM_SOURCE = "prewarm"
+
+def parse_hour_window(window: str) -> Tuple[int, int]:
+    start, end = window.split("-")
+    return int(start) % 24, int(end) % 24
+
+def in_hour_window(hour: int, window: Tuple[int, int]) -> bool:
+    start, end = window
+    if start <= end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+class AnswerPrewarmer:
+    """Mines popular questions and regenerates their answers under a rate budget
+
+    The caller supplies three hooks so this module stays free of server state:
+    resolve_mentor(mentor_id) -> mentor dict or None, is_fresh(mentor, question)
+    -> bool, and generate(mentor, question) which produces and caches an answer.
+    """
+
+    def __init__(self, db, resolve_mentor: Callable[[str], Optional[Dict]],
+                 is_fresh: Callable[[Dict, str], Awaitable[bool]],
+                 generate: Callable[[Dict, str], Awaitable[Any]],
+                 top_k: int = ANSWER_PREWARM_TOP_K,
+                 rate_per_minute: float = ANSWER_PREWARM_RATE_PER_MINUTE,
+                 window: str = ANSWER_PREWARM_WINDOW_UTC):
+        self.db = db
+        self.resolve_mentor = resolve_mentor
+        self.is_fresh = is_fresh
+        self.generate = generate
+        self.top_k = top_k
+        self.rate_per_minute = rate_per_minute
+        self.window = parse_hour_window(window)
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+        self.runs = 0
+        self.candidates = 0
+        self.already_fresh = 0
+        self.generated = 0
+        self.failed = 0
+        self.stopped_by_window = 0
+        self.last_run_at: Optional[datetime] = None
+
+    async def top_questions(self) -> Dict[str, List[Tuple[str, int]]]:
+        """mentor_id -> [(question, times asked)] for the top-K questions in the lookback window"""
+        since = datetime.utcnow() - timedelta(days=ANSWER_PREWARM_LOOKBACK_DAYS)
+        pipeline = [
+            {"$match": {"timestamp": {"$gte": since}}},
+            {"$group": {
+                "_id": {"mentor_id": "$mentor_id", "question": {"$toLower": {"$trim": {"input": "$question"}}}},
+                "count": {"$sum": 1}
+            }},
+            {"$match": {"count": {"$gte": ANSWER_PREWARM_MIN_COUNT}}},
+            {"$sort": {"count": -1}},
+            {"$group": {"_id": "$_id.mentor_id", "questions": {"$push": {"q": "$_id.question", "n": "$count"}}}},
+            # Extra headroom so variants that normalize together still leave K distinct questions
+            {"$project": {"questions": {"$slice": ["$questions", self.top_k * 3]}}}
+        ]
+
+        top = {}
+        async for row in self.db.mentor_interactions.aggregate(pipeline, allowDiskUse=True):
+            merged: Dict[str, List] = {}
+            for item in row["questions"]:
+                normalized = normalize_question(item["q"])
+                if normalized in merged:
+                    merged[normalized][1] += item["n"]
+                else:
+                    merged[normalized] = [item["q"], item["n"]]
+            ranked = sorted(merged.values(), key=lambda pair: pair[1], reverse=True)[:self.top_k]
+            top[row["_id"]] = [(question, count) for question, count in ranked]
+        return top
+
+    def in_window(self) -> bool:
+        return in_hour_window(datetime.utcnow().hour, self.window)
+
+    async def run_once(self, force: bool = False) -> Dict[str, int]:
+        """One pass over the hottest mentor/question pairs, hottest first, within the rate budget"""
+        if self._running:
+            return {"skipped": 1}
+        self._running = True
+        self.runs += 1
+        self.last_run_at = datetime.utcnow()
+        generated = checked = 0
+        interval = 60.0 / self.rate_per_minute if self.rate_per_minute > 0 else 0.0
+        try:
+            top = await self.top_questions()
+            pairs = sorted(
+                ((count, mentor_id, question) for mentor_id, items in top.items() for question, count in items),
+                reverse=True
+            )
+            for count, mentor_id, question in pairs:
+                if not force and not self.in_window():
+                    self.stopped_by_window += 1
+                    break
+                mentor = self.resolve_mentor(mentor_id)
+                if mentor is None:
+                    continue
+                checked += 1
+                self.candidates += 1
+                if await self.is_fresh(mentor, question):
+                    self.already_fresh += 1
+                    continue
+                try:
+                    await self.generate(mentor, question)
+                    self.generated += 1
+                    generated += 1
+                except Exception as e:
+                    self.failed += 1
+                    logger.warning(f"Prewarm failed for {mentor_id}: {str(e)}")
+                if interval:
+                    await asyncio.sleep(interval)
+        finally:
+            self._running = False
+
+        logger.info(f"Answer prewarm checked {checked} questions, generated {generated}")
+        return {"checked": checked, "generated": generated}
+
+    async def run(self):
+        """Scheduler loop: run a pass whenever the off-peak window is open"""
+        while True:
+            try:
+                if self.in_window():
+                    await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Answer prewarm run failed: {str(e)}")
+            await asyncio.sleep(ANSWER_PREWARM_CHECK_SECONDS)
+
+    def start(self):
+        if ANSWER_PREWARM_ENABLED and self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": ANSWER_PREWARM_ENABLED,
+            "window_utc": f"{self.window[0]}-{self.window[1]}",
+            "in_window": self.in_window(),
+            "running": self._running,
+            "top_k": self.top_k,
+            "rate_per_minute": self.rate_per_minute,
+            "runs": self.runs,
+            "candidates": self.candidates,
+            "already_fresh": self.already_fresh,
+            "generated": self.generated,
+            "failed": self.failed,
+            "stopped_by_window": self.stopped_by_window,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None
+        }
@@ -0,0 +1,251 @@
+"""
+OnlyMentors.ai Auth Admission System
+Token-bucket admission control for login endpoints, checked before any password hashing
+"""
+
+import os
+import time
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+import logging
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+AUTH_ADMISSION_ENABLED = os.getenv("AUTH_ADMISSION_ENABLED", "true").lower() == "true"
+# "memory" for single-node deployments, "mongo" to share buckets across workers
+AUTH_ADMISSION_BACKEND = os.getenv("AUTH_ADMISSION_BACKEND", "memory").lower()
+# Per client IP: burst size and sustained attempts per minute
+AUTH_IP_BURST = float(os.getenv("AUTH_IP_BURST", "20"))
+AUTH_IP_PER_MINUTE = float(os.getenv("AUTH_IP_PER_MINUTE", "10"))
+# Per account and client IP: failed logins allowed in a burst and sustained failures per minute
+AUTH_ACCOUNT_BURST = float(os.getenv("AUTH_ACCOUNT_BURST", "5"))
+AUTH_ACCOUNT_PER_MINUTE = float(os.getenv("AUTH_ACCOUNT_PER_MINUTE", "2"))
+# Per account across all IPs: a larger failure budget that still stops guesses spread over many addresses
+AUTH_ACCOUNT_GLOBAL_BURST = float(os.getenv("AUTH_ACCOUNT_GLOBAL_BURST", "30"))
+AUTH_ACCOUNT_GLOBAL_PER_MINUTE = float(os.getenv("AUTH_ACCOUNT_GLOBAL_PER_MINUTE", "10"))
+# Only honour X-Forwarded-For behind proxies that append to it; the client controls every
+# hop left of the ones those proxies add, so the address is read from the right
+AUTH_TRUST_FORWARDED_FOR = os.getenv("AUTH_TRUST_FORWARDED_FOR", "false").lower() == "true"
+AUTH_TRUSTED_PROXY_HOPS = int(os.getenv("AUTH_TRUSTED_PROXY_HOPS", "1"))
+AUTH_MEMORY_MAX_BUCKETS = int(os.getenv("AUTH_MEMORY_MAX_BUCKETS", "100000"))
+
+class TokenBucketSpec:
+    """capacity tokens, refilled continuously at rate_per_second"""
+
+    __slots__ = ("capacity", "rate_per_second")
+
+    def __init__(self, capacity: float, per_minute: float):
+        self.capacity = capacity
+        self.rate_per_second = per_minute / 60.0
+
+    def retry_after(self, tokens: float) -> int:
+        """Whole seconds until one token is available"""
+        if self.rate_per_second <= 0:
+            return 60
+        return max(1, int((1.0 - tokens) / self.rate_per_second + 0.999))
+
+    @property
+    def idle_seconds(self) -> float:
+        """Time for an empty bucket to refill; after that its state is irrelevant"""
+        return self.capacity / self.rate_per_second if self.rate_per_second > 0 else 3600.0
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+class InMemoryTokenBuckets:
+    """Buckets in a bounded dict; exact for one process"""
+
+    name = "memory"
+
+    def __init__(self, max_buckets: int = AUTH_MEMORY_MAX_BUCKETS):
+        self.max_buckets = max_buckets
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def _refilled(self, key: str, spec: TokenBucketSpec, now: float) -> float:
+        tokens, updated = self._buckets.get(key, (spec.capacity, now))
+        return min(spec.capacity, tokens + (now - updated) * spec.rate_per_second)
+
+    async def peek(self, key: str, spec: TokenBucketSpec) -> float:
+        """Tokens currently available, without taking one"""
+        return self._refilled(key, spec, time.monotonic())
+
+    async def take(self, key: str, spec: TokenBucketSpec) -> Tuple[bool, float]:
+        """Take one token; returns (allowed, tokens left)"""
+        now = time.monotonic()
+        tokens = self._refilled(key, spec, now)
+        allowed = tokens >= 1.0
+        if allowed:
+            tokens -= 1.0
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_buckets:
+            # Least recently touched buckets are the ones closest to full anyway
+            self._buckets.popitem(last=False)
+        return allowed, tokens
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+class MongoTokenBuckets:
+    """Buckets as documents, refilled and taken in one pipeline update so workers share limits"""
+
+    name = "mongo"
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("key", unique=True)
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def peek(self, key: str, spec: TokenBucketSpec) -> float:
+        doc = await self.collection.find_one({"key": key}, {"_id": 0, "tokens": 1, "updated_at": 1})
+        if not doc:
+            return spec.capacity
+        elapsed = (datetime.utcnow() - doc["updated_at"]).total_seconds()
+        return min(spec.capacity, doc["tokens"] + max(0.0, elapsed) * spec.rate_per_second)
+
+    async def take(self, key: str, spec: TokenBucketSpec) -> Tuple[bool, float]:
+        now = datetime.utcnow()
+        elapsed_seconds = {"$divide": [{"$subtract": [now, {"$ifNull": ["$updated_at", now]}]}, 1000]}
+        refilled = {"$min": [
+            spec.capacity,
+            {"$add": [{"$ifNull": ["$tokens", spec.capacity]}, {"$multiply": [elapsed_seconds, spec.rate_per_second]}]}
+        ]}
+        doc = await self.collection.find_one_and_update(
+            {"key": key},
+            [
+                {"$set": {"refilled": refilled}},
+                {"$set": {
+                    "allowed": {"$gte": ["$refilled", 1]},
+                    "tokens": {"$cond": [{"$gte": ["$refilled", 1]}, {"$subtract": ["$refilled", 1]}, "$refilled"]},
+                    "updated_at": now,
+                    "expires_at": now + timedelta(seconds=spec.idle_seconds)
+                }},
+                {"$unset": "refilled"}
+            ],
+            projection={"_id": 0, "allowed": 1, "tokens": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return doc["allowed"], doc["tokens"]
+
+class AuthAdmissionController:
+    """Cheap checks run before a login touches bcrypt
+
+    In order: shed when the password-hashing queue is saturated, then take a
+    token from the client IP's bucket, then check that neither of the
+    account's failure buckets is empty. Failure tokens are only taken by
+    record_failure after a wrong password. The tight bucket is keyed on
+    (account, IP), so one address guessing at someone's email is stopped
+    quickly without affecting the owner elsewhere; the larger account-wide
+    bucket stops guesses spread across many addresses.
+    """
+
+    def __init__(self, buckets, hasher, ip_spec: TokenBucketSpec, account_spec: TokenBucketSpec,
+                 account_global_spec: TokenBucketSpec, enabled: bool = AUTH_ADMISSION_ENABLED):
+        self.buckets = buckets
+        self.hasher = hasher
+        self.ip_spec = ip_spec
+        self.account_spec = account_spec
+        self.account_global_spec = account_global_spec
+        self.enabled = enabled
+        self.admitted = 0
+        self.rejected: Dict[str, int] = defaultdict(int)
+        self.failures = 0
+        self.backend_errors = 0
+
+    async def admit(self, ip: str, account: str) -> None:
+        """Raises AdmissionRejected when the login attempt should be shed with 429"""
+        if not self.enabled:
+            return
+        if self.hasher.saturated:
+            self.rejected["hash_queue_saturated"] += 1
+            raise AdmissionRejected("hash_queue_saturated", 1)
+
+        try:
+            allowed, tokens = await self.buckets.take(f"ip:{ip}", self.ip_spec)
+            if not allowed:
+                self.rejected["ip_rate"] += 1
+                raise AdmissionRejected("ip_rate", self.ip_spec.retry_after(tokens))
+            for reason, key, spec in self._failure_buckets(ip, account):
+                tokens = await self.buckets.peek(key, spec)
+                if tokens < 1.0:
+                    self.rejected[reason] += 1
+                    raise AdmissionRejected(reason, spec.retry_after(tokens))
+        except AdmissionRejected:
+            raise
+        except Exception as e:
+            # Fail open: a limiter outage must not lock everyone out
+            self.backend_errors += 1
+            logger.error(f"Auth admission backend failed: {str(e)}")
+
+        self.admitted += 1
+
+    async def record_failure(self, ip: str, account: str) -> None:
+        """Charge a wrong password to both of the account's failure buckets"""
+        if not self.enabled:
+            return
+        try:
+            for _, key, spec in self._failure_buckets(ip, account):
+                await self.buckets.take(key, spec)
+            self.failures += 1
+        except Exception as e:
+            self.backend_errors += 1
+            logger.error(f"Auth admission backend failed: {str(e)}")
+
+    def _failure_buckets(self, ip: str, account: str):
+        return (
+            ("account_ip_failures", f"account:{account}|ip:{ip}", self.account_spec),
+            ("account_failures", f"account:{account}", self.account_global_spec)
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "backend": self.buckets.name,
+            "tracked_buckets": len(self.buckets) if isinstance(self.buckets, InMemoryTokenBuckets) else None,
+            "ip_limit": {"burst": self.ip_spec.capacity, "per_minute": self.ip_spec.rate_per_second * 60},
+            "account_ip_failure_limit": {"burst": self.account_spec.capacity, "per_minute": self.account_spec.rate_per_second * 60},
+            "account_failure_limit": {"burst": self.account_global_spec.capacity,
+                                      "per_minute": self.account_global_spec.rate_per_second * 60},
+            "admitted": self.admitted,
+            "failures_recorded": self.failures,
+            "rejected": dict(self.rejected),
+            "backend_errors": self.backend_errors
+        }
+
+def client_ip(headers, peer: Optional[str]) -> str:
+    """Caller address: the hop our trusted proxies recorded when configured, else the socket peer
+
+    Each trusted proxy appends the address it received the request from, so
+    with N of them the client is the N-th entry from the right. Anything
+    further left was supplied by the client and is ignored.
+    """
+    if AUTH_TRUST_FORWARDED_FOR and AUTH_TRUSTED_PROXY_HOPS > 0:
+        forwarded = headers.get("x-forwarded-for")
+        if forwarded:
+            hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+            if len(hops) >= AUTH_TRUSTED_PROXY_HOPS:
+                return hops[-AUTH_TRUSTED_PROXY_HOPS]
+    return peer or "unknown"
+
+def create_auth_admission(db, hasher, backend: str = AUTH_ADMISSION_BACKEND) -> AuthAdmissionController:
+    if backend == "memory":
+        buckets = InMemoryTokenBuckets()
+    elif backend == "mongo":
+        buckets = MongoTokenBuckets(db.auth_rate_buckets)
+    else:
+        raise ValueError(f"Unknown AUTH_ADMISSION_BACKEND: {backend}")
+    return AuthAdmissionController(
+        buckets, hasher,
+        TokenBucketSpec(AUTH_IP_BURST, AUTH_IP_PER_MINUTE),
+        TokenBucketSpec(AUTH_ACCOUNT_BURST, AUTH_ACCOUNT_PER_MINUTE),
+        TokenBucketSpec(AUTH_ACCOUNT_GLOBAL_BURST, AUTH_ACCOUNT_GLOBAL_PER_MINUTE)
+    )
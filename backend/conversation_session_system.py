@@ -0,0 +1,167 @@
+"""
+OnlyMentors.ai Conversation Session System
+In-memory state for WebSocket conversation threads, with idle and memory-budget eviction
+"""
+
+import os
+import sys
+import time
+import uuid
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+CONVERSATION_SESSION_IDLE_SECONDS = int(os.getenv("CONVERSATION_SESSION_IDLE_SECONDS", "600"))
+CONVERSATION_SESSION_MAX_BYTES = int(os.getenv("CONVERSATION_SESSION_MAX_BYTES", str(64 * 1024 * 1024)))
+CONVERSATION_SESSION_SWEEP_SECONDS = int(os.getenv("CONVERSATION_SESSION_SWEEP_SECONDS", "30"))
+
+# WebSocket close codes used on eviction
+CLOSE_IDLE = 1001  # going away
+CLOSE_OVER_BUDGET = 1013  # try again later
+
+def _text_size(items: List[Dict[str, Any]]) -> int:
+    return sum(len(str(value)) for item in items for value in item.values())
+
+class ConversationSession:
+    """One open socket: the thread's mentor, user and context window, plus a write-behind queue"""
+
+    def __init__(self, thread_id: str, user: Dict[str, Any], mentor: Dict[str, Any],
+                 recent: List[Dict[str, Any]], summary: List[Dict[str, Any]],
+                 close: Callable[[int], Awaitable[None]]):
+        self.session_id = str(uuid.uuid4())
+        self.thread_id = thread_id
+        self.user = user
+        self.mentor = mentor
+        self.recent = recent
+        self.summary = summary
+        self.close = close
+        self.opened_at = time.monotonic()
+        self.last_active = self.opened_at
+        self.turns = 0
+        self.size_bytes = 0
+        self._writes: "asyncio.Queue[Callable[[], Awaitable[None]]]" = asyncio.Queue()
+        self._writer: Optional[asyncio.Task] = None
+
+    def measure(self) -> int:
+        """Approximate bytes held by this session's context window"""
+        self.size_bytes = sys.getsizeof(self) + _text_size(self.recent) + _text_size(self.summary)
+        return self.size_bytes
+
+    def persist(self, write: Callable[[], Awaitable[None]]) -> None:
+        """Queue a write; writes for one session are applied in order, off the socket's path"""
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._drain_writes())
+        self._writes.put_nowait(write)
+
+    async def _drain_writes(self):
+        while True:
+            write = await self._writes.get()
+            try:
+                await write()
+            except Exception as e:
+                logger.error(f"Conversation session write failed for {self.thread_id}: {str(e)}")
+            finally:
+                self._writes.task_done()
+
+    async def flush(self, timeout: float = 10.0) -> None:
+        """Wait for queued writes, then stop the writer"""
+        if self._writer is None:
+            return
+        try:
+            await asyncio.wait_for(self._writes.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Conversation session {self.thread_id} closed with {self._writes.qsize()} pending writes")
+        self._writer.cancel()
+
+class ConversationSessionManager:
+    """Registry of live sessions, least recently active first"""
+
+    def __init__(self, idle_seconds: int = CONVERSATION_SESSION_IDLE_SECONDS,
+                 max_bytes: int = CONVERSATION_SESSION_MAX_BYTES):
+        self.idle_seconds = idle_seconds
+        self.max_bytes = max_bytes
+        self._sessions: "OrderedDict[str, ConversationSession]" = OrderedDict()
+        self._bytes = 0
+        self._sweeper: Optional[asyncio.Task] = None
+        self.opened = 0
+        self.idle_evictions = 0
+        self.budget_evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    async def register(self, session: ConversationSession) -> None:
+        self._sessions[session.session_id] = session
+        self._bytes += session.measure()
+        self.opened += 1
+        await self._enforce_budget(keep=session.session_id)
+
+    async def touch(self, session: ConversationSession) -> None:
+        """Mark a session active and re-account its memory after a turn"""
+        if session.session_id not in self._sessions:
+            return
+        session.last_active = time.monotonic()
+        self._sessions.move_to_end(session.session_id)
+        self._bytes -= session.size_bytes
+        self._bytes += session.measure()
+        await self._enforce_budget(keep=session.session_id)
+
+    async def unregister(self, session: ConversationSession) -> None:
+        if self._sessions.pop(session.session_id, None) is not None:
+            self._bytes -= session.size_bytes
+        await session.flush()
+
+    async def _evict(self, session: ConversationSession, code: int) -> None:
+        if self._sessions.pop(session.session_id, None) is None:
+            return
+        self._bytes -= session.size_bytes
+        try:
+            await session.close(code)
+        except Exception:
+            pass
+
+    async def _enforce_budget(self, keep: str) -> None:
+        """Close least recently active sessions until the total fits the budget"""
+        while self._bytes > self.max_bytes:
+            victim = next((s for s in self._sessions.values() if s.session_id != keep), None)
+            if victim is None:
+                break
+            self.budget_evictions += 1
+            await self._evict(victim, CLOSE_OVER_BUDGET)
+
+    async def evict_idle(self) -> int:
+        cutoff = time.monotonic() - self.idle_seconds
+        idle = [s for s in self._sessions.values() if s.last_active < cutoff]
+        for session in idle:
+            self.idle_evictions += 1
+            await self._evict(session, CLOSE_IDLE)
+        return len(idle)
+
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(CONVERSATION_SESSION_SWEEP_SECONDS)
+            try:
+                await self.evict_idle()
+            except Exception as e:
+                logger.error(f"Conversation session sweep failed: {str(e)}")
+
+    def start(self):
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep())
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "active_sessions": len(self._sessions),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "idle_seconds": self.idle_seconds,
+            "opened": self.opened,
+            "idle_evictions": self.idle_evictions,
+            "budget_evictions": self.budget_evictions
+        }
+
+# Initialize process-wide session registry
+conversation_sessions = ConversationSessionManager()
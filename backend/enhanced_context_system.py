@@ -43,6 +43,24 @@ from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Any
 from pydantic import BaseModel
 import uuid
+import os
+from pymongo import ReturnDocument, UpdateOne
+from llm_gateway_system import (
+    llm_singleflight, llm_governor, llm_hedger, llm_circuit_breaker, llm_request_identity, prompt_digest
+)
+from prompt_registry_system import prompt_registry, estimate_tokens
+from llm_backend_system import llm_backend
+
+# Context window: the thread document keeps the last CONTEXT_RECENT_MESSAGES
+# messages verbatim plus a rolling summary of earlier exchanges, and prompts
+# use as much of both as fits in CONTEXT_TOKEN_BUDGET
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+CONTEXT_RECENT_MESSAGES = int(os.getenv("CONTEXT_RECENT_MESSAGES", "6"))
+CONTEXT_SUMMARY_ENTRIES = int(os.getenv("CONTEXT_SUMMARY_ENTRIES", "20"))
+
+# Messages are stored in conversation_message_buckets, one document per
+# CONVERSATION_BUCKET_SIZE consecutive messages of a thread
+CONVERSATION_BUCKET_SIZE = int(os.getenv("CONVERSATION_BUCKET_SIZE", "50"))
 
 # Enhanced Models for Improved Context System
 
@@ -109,11 +127,52 @@ class EnhancedContext:
         await db.conversation_threads.insert_one(thread_doc)
         return thread_id
     
+    @staticmethod
+    async def ensure_indexes(db):
+        """Indexes behind the one-read context lookup and history queries"""
+        await db.conversation_threads.create_index("thread_id")
+        await db.conversation_threads.create_index([("user_id", 1), ("is_active", 1), ("updated_at", -1)])
+        await db.conversation_message_buckets.create_index([("thread_id", 1), ("bucket", -1)], unique=True)
+        await db.conversation_message_buckets.create_index([("user_id", 1), ("last_at", -1)])
+        # Legacy per-message collection, read only by the bucket migration
+        await db.conversation_messages.create_index([("thread_id", 1), ("created_at", 1)])
+    
+    @staticmethod
+    def _bucket_message(message_doc: Dict) -> Dict:
+        """Per-message fields stored inside a bucket; thread, user and mentor live on the bucket"""
+        return {
+            "message_id": message_doc["message_id"],
+            "message_type": message_doc["message_type"],
+            "content": message_doc["content"],
+            "context_summary": message_doc.get("context_summary"),
+            "created_at": message_doc["created_at"]
+        }
+    
+    @staticmethod
+    def _bucket_append(thread_id: str, bucket: int, user_id: str, mentor_id: str,
+                       messages: List[Dict]) -> Dict:
+        """Upsert update appending messages to one bucket"""
+        return {
+            "filter": {"thread_id": thread_id, "bucket": bucket},
+            "update": {
+                "$push": {"messages": {"$each": messages}},
+                "$inc": {"count": len(messages)},
+                "$min": {"first_at": min(m["created_at"] for m in messages)},
+                "$max": {"last_at": max(m["created_at"] for m in messages)},
+                "$setOnInsert": {"user_id": user_id, "mentor_id": mentor_id}
+            }
+        }
+    
     @staticmethod
     async def add_message_to_thread(db, thread_id: str, user_id: str, 
                                   mentor_id: str, message_type: str, 
-                                  content: str, context_summary: str = None):
-        """Add a message to a conversation thread"""
+                                  content: str, context_summary: str = None,
+                                  summary_entry: str = None):
+        """Add a message to a conversation thread
+        
+        The same thread update keeps the recent-message window and, for
+        responses, appends the exchange to the rolling summary.
+        """
         message_id = EnhancedContext.generate_message_id()
         
         message_doc = {
@@ -127,59 +186,218 @@ class EnhancedContext:
             "created_at": datetime.utcnow()
         }
         
-        await db.conversation_messages.insert_one(message_doc)
+        # Update thread message count, timestamp and context window
+        push = {
+            "recent_messages": {
+                "$each": [{
+                    "message_type": message_type,
+                    "content": content,
+                    "created_at": message_doc["created_at"]
+                }],
+                "$slice": -CONTEXT_RECENT_MESSAGES
+            }
+        }
+        if summary_entry:
+            push["context_summary"] = {
+                "$each": [{"text": summary_entry, "created_at": message_doc["created_at"]}],
+                "$slice": -CONTEXT_SUMMARY_ENTRIES
+            }
         
-        # Update thread message count and timestamp
-        await db.conversation_threads.update_one(
+        thread = await db.conversation_threads.find_one_and_update(
             {"thread_id": thread_id},
             {
                 "$inc": {"message_count": 1},
-                "$set": {"updated_at": datetime.utcnow()}
-            }
+                "$set": {"updated_at": datetime.utcnow()},
+                "$push": push
+            },
+            projection={"_id": 0, "message_count": 1},
+            return_document=ReturnDocument.AFTER
         )
         
+        # The message's sequence number in the thread picks its bucket
+        sequence = (thread["message_count"] if thread else 1) - 1
+        append = EnhancedContext._bucket_append(
+            thread_id, sequence // CONVERSATION_BUCKET_SIZE, user_id, mentor_id,
+            [EnhancedContext._bucket_message(message_doc)]
+        )
+        await db.conversation_message_buckets.update_one(append["filter"], append["update"], upsert=True)
+        
         return message_id
     
     @staticmethod
     async def get_conversation_history(db, thread_id: str, limit: int = 10) -> List[Dict]:
-        """Get conversation history for context"""
-        messages = await db.conversation_messages.find(
+        """Get the most recent messages of a thread, oldest first
+        
+        Reads only the newest buckets: one or two documents for limit <= bucket size.
+        """
+        bucket_count = limit // CONVERSATION_BUCKET_SIZE + 2
+        buckets = await db.conversation_message_buckets.find(
             {"thread_id": thread_id}
-        ).sort("created_at", 1).limit(limit).to_list(limit)
+        ).sort("bucket", -1).limit(bucket_count).to_list(bucket_count)
+        
+        messages = []
+        for bucket in buckets:
+            for message in bucket["messages"]:
+                messages.append({
+                    **message,
+                    "thread_id": thread_id,
+                    "user_id": bucket["user_id"],
+                    "mentor_id": bucket["mentor_id"]
+                })
+        
+        messages.sort(key=lambda m: m["created_at"])
+        return messages[-limit:] if limit else []
+    
+    @staticmethod
+    def _group_legacy_messages(legacy: List[Dict], existing: set) -> Dict[int, tuple]:
+        """bucket -> (user_id, mentor_id, messages) for legacy messages not yet bucketed
+        
+        legacy must be one thread's messages in created_at order; each keeps
+        its sequence number even when earlier ones were already migrated.
+        """
+        grouped = {}
+        for sequence, message_doc in enumerate(legacy):
+            if message_doc["message_id"] in existing:
+                continue
+            bucket = sequence // CONVERSATION_BUCKET_SIZE
+            grouped.setdefault(bucket, (message_doc["user_id"], message_doc["mentor_id"], []))[2].append(
+                EnhancedContext._bucket_message(message_doc)
+            )
+        return grouped
+    
+    @staticmethod
+    async def migrate_message_buckets(db, batch_threads: int = 100) -> Dict[str, int]:
+        """Move legacy conversation_messages documents into buckets
+        
+        Resumable and idempotent: migrated documents are flagged, and messages
+        already present in a bucket are skipped. Legacy messages take sequence
+        numbers in created_at order, matching the thread's message_count.
+        """
+        migrated_threads = 0
+        migrated_messages = 0
+        while True:
+            thread_ids = await db.conversation_messages.distinct(
+                "thread_id", {"bucketed": {"$ne": True}}
+            )
+            if not thread_ids:
+                break
+            
+            for thread_id in thread_ids[:batch_threads]:
+                legacy = await db.conversation_messages.find(
+                    {"thread_id": thread_id}
+                ).sort("created_at", 1).to_list(None)
+                
+                existing = set()
+                async for bucket in db.conversation_message_buckets.find(
+                    {"thread_id": thread_id}, {"messages.message_id": 1}
+                ):
+                    existing.update(m["message_id"] for m in bucket.get("messages", []))
+                
+                grouped = EnhancedContext._group_legacy_messages(legacy, existing)
+                
+                requests = []
+                for bucket, (user_id, mentor_id, messages) in grouped.items():
+                    append = EnhancedContext._bucket_append(thread_id, bucket, user_id, mentor_id, messages)
+                    requests.append(UpdateOne(append["filter"], append["update"], upsert=True))
+                if requests:
+                    await db.conversation_message_buckets.bulk_write(requests, ordered=False)
+                
+                await db.conversation_messages.update_many(
+                    {"thread_id": thread_id}, {"$set": {"bucketed": True}}
+                )
+                migrated_threads += 1
+                migrated_messages += sum(len(group[2]) for group in grouped.values())
         
-        return messages
+        return {"threads": migrated_threads, "messages": migrated_messages}
+    
+    @staticmethod
+    async def get_context_window(db, thread_id: str) -> Dict[str, List[Dict]]:
+        """Recent messages and rolling summary, read from the thread document alone"""
+        thread = await db.conversation_threads.find_one(
+            {"thread_id": thread_id},
+            {"_id": 0, "recent_messages": 1, "context_summary": 1}
+        )
+        if thread is None:
+            return {"recent": [], "summary": []}
+        
+        recent = thread.get("recent_messages")
+        if recent is None:
+            # Thread created before the context window existed
+            recent = await EnhancedContext.get_conversation_history(db, thread_id, CONTEXT_RECENT_MESSAGES)
+        
+        return {"recent": recent, "summary": thread.get("context_summary", [])}
+    
+    @staticmethod
+    def fit_context(recent: List[Dict], summary: List[Dict], budget: int) -> str:
+        """Render recent messages (newest first) then summary lines within a token budget"""
+        recent_lines = []
+        oldest_rendered = None
+        for msg in reversed(recent):
+            speaker = "User asked" if msg["message_type"] == "question" else "You responded"
+            line = f"{speaker}: {msg['content']}\n"
+            cost = estimate_tokens(line)
+            if cost > budget:
+                # Keep the start of the newest message that does not fit whole
+                if budget > 20 and not recent_lines:
+                    recent_lines.append(line[:budget * 4].rstrip() + "...\n")
+                    oldest_rendered = msg
+                    budget = 0
+                break
+            recent_lines.append(line)
+            oldest_rendered = msg
+            budget -= cost
+        recent_lines.reverse()
+        
+        # Summary entries already covered by a rendered recent message are skipped;
+        # recent messages cut by the budget are still represented by their summary
+        if oldest_rendered is not None:
+            summary = [entry for entry in summary if entry["created_at"] < oldest_rendered["created_at"]]
+        
+        summary_lines = []
+        for entry in reversed(summary):
+            line = f"- {entry['text']}\n"
+            cost = estimate_tokens(line)
+            if cost > budget:
+                break
+            summary_lines.append(line)
+            budget -= cost
+        summary_lines.reverse()
+        
+        context = ""
+        if summary_lines:
+            context += "Summary of earlier exchanges:\n" + "".join(summary_lines)
+        if recent_lines:
+            context += "Most recent messages:\n" + "".join(recent_lines)
+        return context
     
     @staticmethod
     async def build_contextual_prompt(db, mentor: Dict, current_question: str, 
                                     thread_id: str = None) -> str:
         """Build enhanced prompt with conversation context"""
+        if not thread_id:
+            return EnhancedContext.render_contextual_prompt(mentor, current_question)
         
-        base_prompt = f"""You are {mentor['name']}, {mentor['expertise']}. {mentor['wiki_description']}
-
-Personality and Communication Style:
-- Respond as if you are actually {mentor['name']}
-- Use your authentic voice, personality, and speaking patterns
-- Draw from your real-life experiences, achievements, and philosophy
-- Provide practical, actionable advice based on your expertise
-- Keep responses conversational yet insightful (2-3 paragraphs)
-- Use "I" statements and personal anecdotes where appropriate
-- Reflect your known values, beliefs, and approach to life/work
-
-Areas of Expertise: {mentor['expertise']}"""
-
-        if thread_id:
-            # Get conversation history for context
-            history = await EnhancedContext.get_conversation_history(db, thread_id, limit=5)
+        # Rolling summary + recent messages from the thread document
+        window = await EnhancedContext.get_context_window(db, thread_id)
+        recent = window["recent"]
+        if recent and recent[-1]["message_type"] == "question" and recent[-1]["content"] == current_question:
+            # The current question was already added to the thread; it is appended below
+            recent = recent[:-1]
+        return EnhancedContext.render_contextual_prompt(mentor, current_question, recent, window["summary"])
+    
+    @staticmethod
+    def render_contextual_prompt(mentor: Dict, current_question: str,
+                                 recent: List[Dict] = None, summary: List[Dict] = None) -> str:
+        """Contextual prompt from an already loaded context window, bounded by the token budget"""
+        # Persona header is precompiled once per mentor; only context is added here
+        base_prompt = prompt_registry.get(mentor).contextual_header
+        
+        if recent or summary:
+            history = EnhancedContext.fit_context(recent or [], summary or [], CONTEXT_TOKEN_BUDGET)
             
             if history:
                 context_prompt = "\n\nCONVERSATION CONTEXT:\n"
-                context_prompt += "Previous messages in this conversation:\n"
-                
-                for msg in history:
-                    if msg["message_type"] == "question":
-                        context_prompt += f"User asked: {msg['content']}\n"
-                    else:
-                        context_prompt += f"You responded: {msg['content'][:200]}...\n"
+                context_prompt += history
                 
                 context_prompt += f"\nNow the user is asking: {current_question}\n"
                 context_prompt += "Please provide a response that acknowledges this conversation history and builds upon previous discussions when relevant."
@@ -188,6 +406,24 @@ Areas of Expertise: {mentor['expertise']}"""
         
         return base_prompt + f"\n\nUser Question: {current_question}\n\nYour response should feel authentic to who you are as a person and thought leader."
     
+    @staticmethod
+    async def summarize_exchange(question: str, response: str):
+        """Return (response summary, rolling-summary entry) for one question/answer exchange"""
+        context_summary = await EnhancedContext.create_context_summary(response)
+        question_summary = await EnhancedContext.create_context_summary(question)
+        return context_summary, f"User asked: {question_summary} You answered: {context_summary}"
+    
+    @staticmethod
+    def advance_window(recent: List[Dict], summary: List[Dict], question: str,
+                       response: str, summary_entry: str) -> None:
+        """Apply one exchange to an in-memory context window the way add_message_to_thread does"""
+        now = datetime.utcnow()
+        recent.append({"message_type": "question", "content": question, "created_at": now})
+        recent.append({"message_type": "response", "content": response, "created_at": now})
+        del recent[:-CONTEXT_RECENT_MESSAGES]
+        summary.append({"text": summary_entry, "created_at": now})
+        del summary[:-CONTEXT_SUMMARY_ENTRIES]
+    
     @staticmethod
     async def get_user_conversation_threads(db, user_id: str, mentor_id: str = None) -> List[Dict]:
         """Get user's conversation threads, optionally filtered by mentor"""
@@ -237,16 +473,21 @@ class EnhancedQuestionProcessor:
             db, mentor, question_data.question, thread_id if question_data.include_history else None
         )
         
-        # Generate mentor response with context
+        # Generate mentor response with context. A brand-new thread has no prior
+        # history, so identical concurrent questions can share one provider call.
         response_text = await EnhancedQuestionProcessor.generate_contextual_response(
-            mentor, question_data.question, contextual_prompt, thread_id
+            mentor, question_data.question, contextual_prompt, thread_id,
+            coalesce=not question_data.thread_id, requester=current_user
         )
         
         # Add mentor response to conversation thread
-        context_summary = await EnhancedContext.create_context_summary(response_text)
+        context_summary, summary_entry = await EnhancedContext.summarize_exchange(
+            question_data.question, response_text
+        )
         await EnhancedContext.add_message_to_thread(
             db, thread_id, current_user["user_id"], mentor["id"],
-            "response", response_text, context_summary
+            "response", response_text, context_summary,
+            summary_entry=summary_entry
         )
         
         return {
@@ -258,28 +499,38 @@ class EnhancedQuestionProcessor:
     
     @staticmethod
     async def generate_contextual_response(mentor: Dict, question: str, 
-                                         contextual_prompt: str, thread_id: str):
+                                         contextual_prompt: str, thread_id: str,
+                                         coalesce: bool = False, requester: Dict = None):
         """Generate mentor response with enhanced context"""
+        if coalesce:
+            key = "contextual:" + prompt_digest(mentor["id"], contextual_prompt, question)
+            return await llm_singleflight.do(
+                key,
+                lambda: EnhancedQuestionProcessor.generate_contextual_response(
+                    mentor, question, contextual_prompt, thread_id, requester=requester
+                )
+            )
+        
         try:
-            from emergentintegrations.llm.chat import LlmChat, UserMessage
-            import os
-            
             # Use thread_id as session_id for conversation continuity
             session_id = f"thread_{thread_id}" if thread_id else f"mentor_{mentor['id']}_{hash(question) % 10000}"
             
-            # Initialize LLM chat with contextual prompt
-            chat = LlmChat(
-                api_key=os.getenv("OPENAI_API_KEY"),
-                session_id=session_id,
-                system_message=contextual_prompt
-            ).with_model("openai", "gpt-4o-mini")
+            async def send_attempt():
+                # One provider call per attempt with the contextual prompt (hedging-safe)
+                return await llm_backend.complete(contextual_prompt, question, session_id)
             
-            # Create user message
-            user_message = UserMessage(text=question)
+            # Get AI response inside a global LLM slot, with an adaptive timeout
+            # and a hedged duplicate when the call runs past the usual p90
+            tenant, lane = llm_request_identity(requester)
             
-            # Get AI response with timeout handling
-            import asyncio
-            response = await asyncio.wait_for(chat.send_message(user_message), timeout=30.0)
+            async def governed_call():
+                async with llm_governor.slot(tenant, lane):
+                    return await llm_hedger.call(
+                        send_attempt, key=llm_backend.latency_key(f"contextual:{mentor['id']}"), default_timeout=30.0
+                    )
+            
+            # Fails fast with CircuitOpenError (handled below) while the provider is degraded
+            response = await llm_circuit_breaker.call(governed_call)
             
             return response.strip()
             
@@ -302,30 +553,33 @@ class ConversationAnalytics:
             "is_active": True
         })
         
-        # Count total messages
-        message_count = await db.conversation_messages.count_documents({
-            "user_id": user_id
-        })
-        
-        # Get most active mentors
+        # Get most active mentors (bucket counters, no per-message scan)
         pipeline = [
             {"$match": {"user_id": user_id}},
             {"$group": {
                 "_id": "$mentor_id", 
-                "message_count": {"$sum": 1}
+                "message_count": {"$sum": "$count"}
             }},
-            {"$sort": {"message_count": -1}},
-            {"$limit": 5}
+            {"$sort": {"message_count": -1}}
         ]
         
-        most_active = await db.conversation_messages.aggregate(pipeline).to_list(5)
+        per_mentor = await db.conversation_message_buckets.aggregate(pipeline).to_list(None)
+        most_active = per_mentor[:5]
         
-        # Get conversation frequency (last 30 days)
+        # Count total messages
+        message_count = sum(m["message_count"] for m in per_mentor)
+        
+        # Get conversation frequency (last 30 days); only buckets touched since then are opened
         thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        recent_activity = await db.conversation_messages.count_documents({
-            "user_id": user_id,
-            "created_at": {"$gte": thirty_days_ago}
-        })
+        recent = await db.conversation_message_buckets.aggregate([
+            {"$match": {"user_id": user_id, "last_at": {"$gte": thirty_days_ago}}},
+            {"$project": {"recent": {"$size": {"$filter": {
+                "input": "$messages",
+                "cond": {"$gte": ["$$this.created_at", thirty_days_ago]}
+            }}}}},
+            {"$group": {"_id": None, "total": {"$sum": "$recent"}}}
+        ]).to_list(1)
+        recent_activity = recent[0]["total"] if recent else 0
         
         return {
             "total_threads": thread_count,
@@ -0,0 +1,223 @@
+"""
+OnlyMentors.ai LLM Backend System
+Pluggable chat-completion backends: the real provider or a deterministic offline stub
+"""
+
+import os
+import re
+import abc
+import json
+import math
+import random
+import asyncio
+import hashlib
+from collections import defaultdict
+from typing import Any, Dict
+import logging
+
+logger = logging.getLogger(__name__)
+
+# "emergent" (real provider) or "stub" (offline, no key needed)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "emergent").lower()
+DEFAULT_LLM_PROVIDER = "openai"
+DEFAULT_LLM_MODEL = "gpt-4o-mini"
+
+# Stub behaviour
+LLM_STUB_SEED = os.getenv("LLM_STUB_SEED", "onlymentors")
+LLM_STUB_LATENCY = os.getenv("LLM_STUB_LATENCY", "lognormal").lower()  # fixed | lognormal | heavy_tail
+LLM_STUB_LATENCY_MS = float(os.getenv("LLM_STUB_LATENCY_MS", "800"))  # fixed value / median
+LLM_STUB_LATENCY_SIGMA = float(os.getenv("LLM_STUB_LATENCY_SIGMA", "0.4"))
+LLM_STUB_TAIL_PROBABILITY = float(os.getenv("LLM_STUB_TAIL_PROBABILITY", "0.05"))
+LLM_STUB_TAIL_MULTIPLIER = float(os.getenv("LLM_STUB_TAIL_MULTIPLIER", "10"))
+LLM_STUB_ERROR_RATE = float(os.getenv("LLM_STUB_ERROR_RATE", "0"))
+LLM_STUB_TIMEOUT_RATE = float(os.getenv("LLM_STUB_TIMEOUT_RATE", "0"))
+LLM_STUB_HANG_SECONDS = float(os.getenv("LLM_STUB_HANG_SECONDS", "300"))
+
+class LLMBackendError(Exception):
+    """Raised by a backend when the provider call fails"""
+
+class LLMBackend(abc.ABC):
+    """One chat completion: system message + user text -> reply text"""
+
+    name = "base"
+
+    @abc.abstractmethod
+    async def complete(self, system_message: str, user_text: str, session_id: str,
+                       model: str = DEFAULT_LLM_MODEL) -> str:
+        """Reply text; raises on provider failure"""
+
+    def latency_key(self, scope: str, model: str = DEFAULT_LLM_MODEL) -> str:
+        """Latency-tracking key for calls in scope, so backends and models never share percentiles"""
+        return f"{scope}:{self.name}:{model}"
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+class EmergentLLMBackend(LLMBackend):
+    """The production provider through emergentintegrations' LlmChat"""
+
+    name = "emergent"
+
+    def __init__(self, api_key: str = None, provider: str = DEFAULT_LLM_PROVIDER):
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.provider = provider
+
+    async def complete(self, system_message: str, user_text: str, session_id: str,
+                       model: str = DEFAULT_LLM_MODEL) -> str:
+        from emergentintegrations.llm.chat import LlmChat, UserMessage
+
+        # Fresh chat per call so a hedged duplicate never shares session state
+        chat = LlmChat(
+            api_key=self.api_key,
+            session_id=session_id,
+            system_message=system_message
+        ).with_model(self.provider, model)
+        return await chat.send_message(UserMessage(text=user_text))
+
+_PERSONA_RE = re.compile(r"You are ([^,\n]+), ([^.\n]+)")
+_BATCH_PERSONA_RE = re.compile(r'^- "([^"]+)": ([^,\n]+), ([^\n]+)$', re.MULTILINE)
+
+_OPENINGS = [
+    "When I think about {topic}, I go back to my own early days.",
+    "I've been asked about {topic} many times, and my answer has changed over the years.",
+    "Let me be direct with you about {topic}.",
+    "Here's what I've learned about {topic} the hard way."
+]
+_MIDDLES = [
+    "In {expertise}, the people who succeed are the ones who keep showing up when it stops being exciting.",
+    "Everything I achieved in {expertise} came from small, repeated decisions rather than one big moment.",
+    "My experience in {expertise} taught me that clarity beats cleverness almost every time.",
+    "I made plenty of mistakes in {expertise}, and each one pointed me to what actually mattered."
+]
+_CLOSINGS = [
+    "Start this week with one concrete step, write down what happens, and adjust.",
+    "Pick the single most important thing, protect time for it every day, and measure your progress.",
+    "Find someone a few steps ahead of you, ask them specific questions, and act on the answers.",
+    "Be patient with the process and impatient with your excuses."
+]
+
+class StubLLMBackend(LLMBackend):
+    """Offline stand-in with persona-flavoured text, simulated latency, errors and hangs
+
+    Output and timing are a pure function of the seed, the prompt and how many
+    times that prompt has been sent, so runs are reproducible while a hedged
+    duplicate still draws its own latency.
+    """
+
+    name = "stub"
+
+    def __init__(self, seed: str = LLM_STUB_SEED, latency: str = LLM_STUB_LATENCY,
+                 latency_ms: float = LLM_STUB_LATENCY_MS, sigma: float = LLM_STUB_LATENCY_SIGMA,
+                 tail_probability: float = LLM_STUB_TAIL_PROBABILITY,
+                 tail_multiplier: float = LLM_STUB_TAIL_MULTIPLIER,
+                 error_rate: float = LLM_STUB_ERROR_RATE, timeout_rate: float = LLM_STUB_TIMEOUT_RATE,
+                 hang_seconds: float = LLM_STUB_HANG_SECONDS):
+        if latency not in ("fixed", "lognormal", "heavy_tail"):
+            raise ValueError(f"Unknown LLM_STUB_LATENCY distribution: {latency}")
+        self.seed = seed
+        self.latency = latency
+        self.latency_ms = latency_ms
+        self.sigma = sigma
+        self.tail_probability = tail_probability
+        self.tail_multiplier = tail_multiplier
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.hang_seconds = hang_seconds
+        self._sends: Dict[str, int] = defaultdict(int)
+        self.calls = 0
+        self.errors = 0
+        self.hangs = 0
+        self.latency_total_ms = 0.0
+
+    def _rng(self, system_message: str, user_text: str) -> random.Random:
+        prompt_key = hashlib.blake2b(f"{system_message}\x1f{user_text}".encode("utf-8"), digest_size=8).hexdigest()
+        if len(self._sends) > 100000:
+            # Bound memory on long load tests; attempt numbering restarts
+            self._sends.clear()
+        attempt = self._sends[prompt_key]
+        self._sends[prompt_key] += 1
+        seed = hashlib.blake2b(f"{self.seed}\x1f{prompt_key}\x1f{attempt}".encode("utf-8"), digest_size=8).digest()
+        return random.Random(int.from_bytes(seed, "big"))
+
+    def sample_latency_ms(self, rng: random.Random) -> float:
+        if self.latency == "fixed":
+            return self.latency_ms
+        value = self.latency_ms * math.exp(rng.gauss(0.0, self.sigma))
+        if self.latency == "heavy_tail" and rng.random() < self.tail_probability:
+            # Pareto-distributed stragglers on top of the lognormal body
+            value *= self.tail_multiplier * rng.paretovariate(1.5)
+        return value
+
+    @staticmethod
+    def _topic(user_text: str) -> str:
+        words = re.findall(r"[A-Za-z']+", user_text)
+        return " ".join(words[-6:]).lower() if words else "this"
+
+    @staticmethod
+    def _answer(rng: random.Random, name: str, expertise: str, topic: str) -> str:
+        paragraphs = [
+            f"{rng.choice(_OPENINGS).format(topic=topic)} {rng.choice(_MIDDLES).format(expertise=expertise)}",
+            f"As {name}, I'd tell you that the real question behind {topic} is what you're willing to practise every day. "
+            f"{rng.choice(_MIDDLES).format(expertise=expertise)}",
+            rng.choice(_CLOSINGS)
+        ]
+        return "\n\n".join(paragraphs[:rng.choice([2, 3])])
+
+    def render(self, rng: random.Random, system_message: str, user_text: str) -> str:
+        """Persona text for single-mentor prompts, a JSON object for batched prompts"""
+        topic = self._topic(user_text)
+        batch = _BATCH_PERSONA_RE.findall(system_message)
+        if batch and "JSON object" in system_message:
+            return json.dumps({
+                mentor_id: self._answer(rng, name, expertise, topic)
+                for mentor_id, name, expertise in batch
+            })
+        match = _PERSONA_RE.search(system_message)
+        name, expertise = (match.group(1), match.group(2)) if match else ("your mentor", "my field")
+        return self._answer(rng, name, expertise, topic)
+
+    async def complete(self, system_message: str, user_text: str, session_id: str,
+                       model: str = DEFAULT_LLM_MODEL) -> str:
+        rng = self._rng(system_message, user_text)
+        self.calls += 1
+
+        roll = rng.random()
+        if roll < self.timeout_rate:
+            # Never answers; the caller's timeout or hedge has to handle it
+            self.hangs += 1
+            await asyncio.sleep(self.hang_seconds)
+            raise LLMBackendError("Stub provider hung")
+
+        latency_ms = self.sample_latency_ms(rng)
+        self.latency_total_ms += latency_ms
+        await asyncio.sleep(latency_ms / 1000)
+
+        if roll < self.timeout_rate + self.error_rate:
+            self.errors += 1
+            raise LLMBackendError("Stub provider error")
+        return self.render(rng, system_message, user_text)
+
+    def get_stats(self) -> Dict[str, Any]:
+        answered = self.calls - self.hangs
+        return {
+            "backend": self.name,
+            "latency_distribution": self.latency,
+            "latency_ms": self.latency_ms,
+            "error_rate": self.error_rate,
+            "timeout_rate": self.timeout_rate,
+            "calls": self.calls,
+            "injected_errors": self.errors,
+            "injected_hangs": self.hangs,
+            "avg_simulated_latency_ms": round(self.latency_total_ms / answered, 1) if answered else 0.0
+        }
+
+def create_llm_backend(name: str = LLM_BACKEND) -> LLMBackend:
+    if name == "stub":
+        logger.warning("Using the offline stub LLM backend; answers are simulated")
+        return StubLLMBackend()
+    if name == "emergent":
+        return EmergentLLMBackend()
+    raise ValueError(f"Unknown LLM_BACKEND: {name}")
+
+# Initialize process-wide LLM backend
+llm_backend = create_llm_backend()
@@ -0,0 +1,560 @@
+"""
+OnlyMentors.ai LLM Gateway System
+Request coalescing and flow control in front of the LLM provider
+"""
+
+import os
+import time
+import heapq
+import asyncio
+import hashlib
+import itertools
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+LLM_PRIORITY_WEIGHT = float(os.getenv("LLM_PRIORITY_WEIGHT", "4"))
+LLM_STANDARD_WEIGHT = float(os.getenv("LLM_STANDARD_WEIGHT", "1"))
+
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").lower() == "true"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.9"))
+LLM_HEDGE_BUDGET = float(os.getenv("LLM_HEDGE_BUDGET", "0.1"))  # max fraction of calls hedged
+LLM_LATENCY_MIN_SAMPLES = int(os.getenv("LLM_LATENCY_MIN_SAMPLES", "20"))
+LLM_TIMEOUT_PERCENTILE = float(os.getenv("LLM_TIMEOUT_PERCENTILE", "0.99"))
+LLM_TIMEOUT_MULTIPLIER = float(os.getenv("LLM_TIMEOUT_MULTIPLIER", "2.0"))
+LLM_TIMEOUT_MIN_SECONDS = float(os.getenv("LLM_TIMEOUT_MIN_SECONDS", "5"))
+# Never above the 20s mentor timeout it replaced; callers with an endpoint deadline cap it further
+LLM_TIMEOUT_MAX_SECONDS = float(os.getenv("LLM_TIMEOUT_MAX_SECONDS", "20"))
+
+LLM_BREAKER_WINDOW_SECONDS = float(os.getenv("LLM_BREAKER_WINDOW_SECONDS", "60"))
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "10"))
+LLM_BREAKER_FAILURE_RATE = float(os.getenv("LLM_BREAKER_FAILURE_RATE", "0.5"))
+LLM_BREAKER_OPEN_SECONDS = float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30"))
+LLM_BREAKER_HALF_OPEN_PROBES = int(os.getenv("LLM_BREAKER_HALF_OPEN_PROBES", "2"))
+
+PRIORITY_LANE = "priority"
+STANDARD_LANE = "standard"
+
+def percentile(sorted_values, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def prompt_digest(*parts: str) -> str:
+    """Stable digest of the parts that fully determine an LLM request"""
+    payload = "\x1f".join(parts).encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+class SingleFlight:
+    """Coalesce concurrent identical calls so only one reaches the provider"""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved even if every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Run factory() once per key at a time; concurrent callers share its result"""
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(factory())
+        self._inflight[key] = task
+        self.leaders += 1
+        task.add_done_callback(lambda finished: self._forget(key, finished))
+        # Shielded so one caller disconnecting does not cancel the shared call
+        return await asyncio.shield(task)
+
+    def get_stats(self) -> Dict[str, Any]:
+        calls = self.leaders + self.coalesced
+        return {
+            "in_flight": len(self._inflight),
+            "provider_calls": self.leaders,
+            "coalesced_calls": self.coalesced,
+            "coalesced_rate": round(self.coalesced / calls * 100, 2) if calls else 0.0
+        }
+
+def llm_request_identity(user: Optional[Dict]) -> Tuple[str, str]:
+    """Fairness tenant and priority lane for the user behind an LLM call"""
+    if not user:
+        return "anonymous", STANDARD_LANE
+
+    company_id = user.get("company_id")
+    tenant = f"company:{company_id}" if company_id else f"user:{user.get('user_id')}"
+
+    is_business = bool(company_id) or user.get("user_type") == "business_employee"
+    lane = PRIORITY_LANE if user.get("is_subscribed", False) or is_business else STANDARD_LANE
+    return tenant, lane
+
+class LLMConcurrencyGovernor:
+    """Global cap on open LLM calls with weighted fair queuing across tenants.
+
+    Waiters are ordered by start-time fair queuing: each tenant's next request
+    gets a virtual finish tag of max(virtual_time, tenant's last tag) + 1/weight,
+    so a tenant flooding the queue only pushes its own requests back. The lane
+    sets the weight, giving subscribers and business users a larger share
+    without starving the free tier.
+    """
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 lane_weights: Optional[Dict[str, float]] = None):
+        self.max_concurrency = max_concurrency
+        self.lane_weights = lane_weights or {
+            PRIORITY_LANE: LLM_PRIORITY_WEIGHT,
+            STANDARD_LANE: LLM_STANDARD_WEIGHT
+        }
+        self.active = 0
+        self._queue = []  # heap of (finish_tag, seq, start_tag, lane, future)
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        self._tenant_finish: Dict[str, float] = {}
+        self._queued_by_lane = {lane: 0 for lane in self.lane_weights}
+        self._wait_times = {lane: deque(maxlen=1000) for lane in self.lane_weights}
+        self.acquired = 0
+        self.queued = 0
+        self.max_wait = 0.0
+
+    def _grant_next(self) -> bool:
+        """Hand a released slot to the next live waiter; False if none"""
+        while self._queue:
+            _, _, start_tag, lane, future = heapq.heappop(self._queue)
+            self._queued_by_lane[lane] -= 1
+            if future.done():
+                continue  # waiter was cancelled while queued
+            self._virtual_time = start_tag
+            future.set_result(None)
+            return True
+
+        # Queue drained: no tenant has backlog, so their tags can be dropped
+        self._tenant_finish.clear()
+        return False
+
+    def _release(self) -> None:
+        if not self._grant_next():
+            self.active -= 1
+
+    def _discard(self, entry: Tuple, tenant: str) -> None:
+        """Drop a cancelled waiter so it no longer counts as queued or holds back its tenant"""
+        try:
+            self._queue.remove(entry)
+        except ValueError:
+            return
+        heapq.heapify(self._queue)
+        self._queued_by_lane[entry[3]] -= 1
+        if self._tenant_finish.get(tenant) == entry[0]:
+            # It was the tenant's latest request; its next one starts where this one would have
+            self._tenant_finish[tenant] = entry[2]
+        if not self._queue:
+            self._tenant_finish.clear()
+
+    def try_acquire(self) -> bool:
+        """Take a slot only if one is free right now, without queueing"""
+        if self.active < self.max_concurrency and not self._queue:
+            self.active += 1
+            self.acquired += 1
+            return True
+        return False
+
+    def release(self) -> None:
+        """Return a slot taken with try_acquire"""
+        self._release()
+
+    async def _acquire(self, tenant: str, lane: str) -> None:
+        self.acquired += 1
+        if self.active < self.max_concurrency and not self._queue:
+            self.active += 1
+            self._wait_times[lane].append(0.0)
+            return
+
+        weight = self.lane_weights.get(lane, 1.0)
+        start_tag = max(self._virtual_time, self._tenant_finish.get(tenant, 0.0))
+        finish_tag = start_tag + 1.0 / weight
+        self._tenant_finish[tenant] = finish_tag
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (finish_tag, next(self._seq), start_tag, lane, future)
+        heapq.heappush(self._queue, entry)
+        self._queued_by_lane[lane] += 1
+        self.queued += 1
+
+        enqueued_at = time.monotonic()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # The slot may have been handed over just as we were cancelled
+            if future.done() and not future.cancelled():
+                self._release()
+            else:
+                self._discard(entry, tenant)
+            raise
+        finally:
+            waited = time.monotonic() - enqueued_at
+            self._wait_times[lane].append(waited)
+            self.max_wait = max(self.max_wait, waited)
+        # Slot ownership was transferred by _grant_next; active is unchanged
+
+    @asynccontextmanager
+    async def slot(self, tenant: str, lane: str = STANDARD_LANE):
+        """Hold one of the global LLM call slots for the duration of the block"""
+        await self._acquire(tenant, lane)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lanes = {}
+        for lane, waits in self._wait_times.items():
+            ordered = sorted(waits)
+            lanes[lane] = {
+                "queue_depth": self._queued_by_lane[lane],
+                "avg_wait_ms": round(sum(ordered) / len(ordered) * 1000, 1) if ordered else 0.0,
+                "p95_wait_ms": round(percentile(ordered, 0.95) * 1000, 1)
+            }
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": self.active,
+            "queue_depth": len(self._queue),
+            "acquired": self.acquired,
+            "queued": self.queued,
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+            "lanes": lanes
+        }
+
+class LatencyTracker:
+    """Per-key EWMA and recent-sample percentiles of successful call latency
+
+    Timeouts are censored samples: the call took at least the timeout, but
+    not how much longer. They are counted separately and never enter the
+    percentiles, so the adaptive timeout cannot feed its own ceiling back
+    into the p99 it is derived from.
+    """
+
+    def __init__(self, sample_size: int = 200, alpha: float = 0.2,
+                 min_samples: int = LLM_LATENCY_MIN_SAMPLES):
+        self.sample_size = sample_size
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self._samples: Dict[str, deque] = {}
+        self._ewma: Dict[str, float] = {}
+        self._censored: Dict[str, int] = {}
+
+    def observe(self, key: str, seconds: float) -> None:
+        samples = self._samples.get(key)
+        if samples is None:
+            samples = self._samples[key] = deque(maxlen=self.sample_size)
+        samples.append(seconds)
+        previous = self._ewma.get(key)
+        self._ewma[key] = seconds if previous is None else self.alpha * seconds + (1 - self.alpha) * previous
+
+    def observe_censored(self, key: str) -> None:
+        """Record a call that timed out before completing"""
+        self._censored[key] = self._censored.get(key, 0) + 1
+
+    def percentile(self, key: str, fraction: float) -> Optional[float]:
+        """Observed latency percentile, or None until enough samples exist"""
+        samples = self._samples.get(key)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        return percentile(sorted(samples), fraction)
+
+    def summary(self, key: str) -> Dict[str, Any]:
+        samples = sorted(self._samples.get(key, ()))
+        return {
+            "samples": len(samples),
+            "timeouts": self._censored.get(key, 0),
+            "ewma_ms": round(self._ewma.get(key, 0.0) * 1000, 1),
+            "p50_ms": round(percentile(samples, 0.5) * 1000, 1),
+            "p90_ms": round(percentile(samples, 0.9) * 1000, 1),
+            "p99_ms": round(percentile(samples, 0.99) * 1000, 1)
+        }
+
+    def keys(self):
+        return list(self._samples.keys() | self._censored.keys())
+
+class HedgedRequester:
+    """Adaptive timeouts and hedged duplicate requests for slow provider calls.
+
+    The timeout for a key is its observed p99 latency times a multiplier,
+    clamped to [min, max]; until enough samples exist the caller's default is
+    used. A caller with its own deadline passes it so the timeout never runs
+    past it. Once the primary attempt has been running longer than the key's p90,
+    one duplicate is fired (if the hedge budget and a free governor slot
+    allow) and whichever finishes first wins; the other is cancelled.
+    """
+
+    def __init__(self, governor: Optional["LLMConcurrencyGovernor"] = None,
+                 tracker: Optional[LatencyTracker] = None,
+                 enabled: bool = LLM_HEDGE_ENABLED,
+                 hedge_percentile: float = LLM_HEDGE_PERCENTILE,
+                 hedge_budget: float = LLM_HEDGE_BUDGET,
+                 timeout_percentile: float = LLM_TIMEOUT_PERCENTILE,
+                 timeout_multiplier: float = LLM_TIMEOUT_MULTIPLIER,
+                 min_timeout: float = LLM_TIMEOUT_MIN_SECONDS,
+                 max_timeout: float = LLM_TIMEOUT_MAX_SECONDS):
+        self.governor = governor
+        self.tracker = tracker or LatencyTracker()
+        self.enabled = enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedge_budget = hedge_budget
+        self.timeout_percentile = timeout_percentile
+        self.timeout_multiplier = timeout_multiplier
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.timeouts = 0
+
+    def timeout_for(self, key: str, default_timeout: float) -> float:
+        observed = self.tracker.percentile(key, self.timeout_percentile)
+        if observed is None:
+            return default_timeout
+        return min(self.max_timeout, max(self.min_timeout, observed * self.timeout_multiplier))
+
+    def hedge_delay_for(self, key: str) -> Optional[float]:
+        if not self.enabled:
+            return None
+        return self.tracker.percentile(key, self.hedge_percentile)
+
+    def _may_hedge(self) -> bool:
+        if self.hedges >= self.hedge_budget * self.calls:
+            return False
+        # Hedges only use spare capacity; they never queue behind real requests
+        return self.governor is None or self.governor.try_acquire()
+
+    def _start_hedge(self, factory: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        hedge = asyncio.ensure_future(factory())
+        if self.governor is not None:
+            hedge.add_done_callback(lambda _: self.governor.release())
+        self.hedges += 1
+        return hedge
+
+    async def call(self, factory: Callable[[], Awaitable[Any]], key: str, default_timeout: float,
+                   deadline: Optional[float] = None) -> Any:
+        """Run factory() with an adaptive timeout, hedging once if it runs long
+
+        deadline is a time.monotonic() value the call must finish by, e.g. the
+        endpoint's own timeout less the time already spent queueing.
+        """
+        self.calls += 1
+        started = time.monotonic()
+        timeout = self.timeout_for(key, default_timeout)
+        if deadline is not None:
+            timeout = max(0.0, min(timeout, deadline - started))
+        hedge_delay = self.hedge_delay_for(key)
+
+        primary = asyncio.ensure_future(factory())
+        attempts = {primary}
+        hedge = None
+        try:
+            if hedge_delay is not None and hedge_delay < timeout:
+                await asyncio.wait(attempts, timeout=hedge_delay)
+                if not primary.done() and self._may_hedge():
+                    hedge = self._start_hedge(factory)
+                    attempts.add(hedge)
+
+            last_error = None
+            while attempts:
+                remaining = timeout - (time.monotonic() - started)
+                done, attempts = await asyncio.wait(
+                    attempts, timeout=max(0.0, remaining), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    break
+                for attempt in done:
+                    if attempt.exception() is None:
+                        self.tracker.observe(key, time.monotonic() - started)
+                        if attempt is hedge:
+                            self.hedge_wins += 1
+                        return attempt.result()
+                    last_error = attempt.exception()
+
+            if last_error is not None and not attempts:
+                raise last_error
+
+            self.timeouts += 1
+            self.tracker.observe_censored(key)
+            raise asyncio.TimeoutError()
+        finally:
+            for attempt in (primary, hedge):
+                if attempt is not None and not attempt.done():
+                    attempt.cancel()
+
+    def get_stats(self) -> Dict[str, Any]:
+        keys = self.tracker.keys()
+        return {
+            "enabled": self.enabled,
+            "hedge_percentile": self.hedge_percentile,
+            "hedge_budget": self.hedge_budget,
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "timeouts": self.timeouts,
+            "tracked_keys": len(keys),
+            "slowest_keys": sorted(
+                ({"key": key, **self.tracker.summary(key)} for key in keys),
+                key=lambda item: item["p90_ms"],
+                reverse=True
+            )[:10]
+        }
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the provider while the circuit is open"""
+
+class CircuitBreaker:
+    """Fast-fail guard around the LLM provider.
+
+    closed: calls go through; errors and timeouts in the rolling window are
+    counted and the circuit opens once the failure rate crosses the threshold.
+    open: calls fail immediately with CircuitOpenError for open_seconds.
+    half_open: a few probe calls are let through; if they all succeed the
+    circuit closes, and any failure re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str = "llm_provider",
+                 window_seconds: float = LLM_BREAKER_WINDOW_SECONDS,
+                 min_calls: int = LLM_BREAKER_MIN_CALLS,
+                 failure_rate: float = LLM_BREAKER_FAILURE_RATE,
+                 open_seconds: float = LLM_BREAKER_OPEN_SECONDS,
+                 half_open_probes: int = LLM_BREAKER_HALF_OPEN_PROBES):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.state = self.CLOSED
+        self._outcomes = deque()  # (monotonic time, succeeded)
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self.transitions = deque(maxlen=50)
+        self.rejected = 0
+        self.successes = 0
+        self.failures = 0
+
+    def _transition(self, new_state: str, reason: str) -> None:
+        old_state, self.state = self.state, new_state
+        self.transitions.append({
+            "from": old_state,
+            "to": new_state,
+            "reason": reason,
+            "at": datetime.utcnow().isoformat()
+        })
+        logger.warning(f"Circuit {self.name}: {old_state} -> {new_state} ({reason})")
+
+        if new_state == self.OPEN:
+            self._opened_at = time.monotonic()
+        elif new_state == self.HALF_OPEN:
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+        elif new_state == self.CLOSED:
+            self._outcomes.clear()
+
+    def _window_failure_rate(self) -> Tuple[int, float]:
+        cutoff = time.monotonic() - self.window_seconds
+        while self._outcomes and self._outcomes[0][0] < cutoff:
+            self._outcomes.popleft()
+        calls = len(self._outcomes)
+        failures = sum(1 for _, succeeded in self._outcomes if not succeeded)
+        return calls, (failures / calls if calls else 0.0)
+
+    def _admit(self) -> bool:
+        """Decide whether a call may proceed; returns True if it is a half-open probe"""
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                self.rejected += 1
+                raise CircuitOpenError(f"Circuit {self.name} is open")
+            self._transition(self.HALF_OPEN, "open period elapsed")
+
+        if self.state == self.HALF_OPEN:
+            if self._probes_in_flight >= self.half_open_probes:
+                self.rejected += 1
+                raise CircuitOpenError(f"Circuit {self.name} is half-open and probes are in flight")
+            self._probes_in_flight += 1
+            return True
+        return False
+
+    def _record(self, succeeded: bool, is_probe: bool, error: str = "") -> None:
+        if succeeded:
+            self.successes += 1
+        else:
+            self.failures += 1
+
+        if is_probe:
+            self._probes_in_flight -= 1
+            if self.state != self.HALF_OPEN:
+                return
+            if not succeeded:
+                self._transition(self.OPEN, f"probe failed: {error}")
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_probes:
+                self._transition(self.CLOSED, "probes succeeded")
+            return
+
+        if self.state != self.CLOSED:
+            return
+        self._outcomes.append((time.monotonic(), succeeded))
+        if not succeeded:
+            calls, rate = self._window_failure_rate()
+            if calls >= self.min_calls and rate >= self.failure_rate:
+                self._transition(self.OPEN, f"failure rate {rate:.0%} over {calls} calls")
+
+    async def call(self, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Run factory() through the breaker; raises CircuitOpenError when open"""
+        is_probe = self._admit()
+        try:
+            result = await factory()
+        except asyncio.CancelledError:
+            # Caller went away; not a provider failure
+            if is_probe:
+                self._probes_in_flight -= 1
+            raise
+        except Exception as e:
+            self._record(False, is_probe, error=type(e).__name__)
+            raise
+        self._record(True, is_probe)
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        calls, rate = self._window_failure_rate()
+        return {
+            "name": self.name,
+            "state": self.state,
+            "window_calls": calls,
+            "window_failure_rate": round(rate * 100, 2),
+            "failure_rate_threshold": round(self.failure_rate * 100, 2),
+            "open_seconds": self.open_seconds,
+            "successes": self.successes,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "recent_transitions": list(self.transitions)[-10:]
+        }
+
+# Initialize process-wide request coalescer, concurrency governor, hedger and circuit breaker
+llm_singleflight = SingleFlight()
+llm_governor = LLMConcurrencyGovernor()
+llm_hedger = HedgedRequester(governor=llm_governor)
+llm_circuit_breaker = CircuitBreaker()
@@ -0,0 +1,88 @@
+"""
+OnlyMentors.ai Batched Mentor Generation System
+Answer several mentors in one structured LLM call and split the result per mentor
+"""
+
+import os
+import re
+import json
+from typing import Any, Dict, List
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Default for requests that do not choose a mode explicitly
+LLM_BATCH_MODE = os.getenv("LLM_BATCH_MODE", "false").lower() == "true"
+LLM_BATCH_MIN_MENTORS = int(os.getenv("LLM_BATCH_MIN_MENTORS", "2"))
+
+_CODE_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$", re.MULTILINE)
+
+def should_batch(requested: bool, mentor_count: int) -> bool:
+    """Whether a question should use one batched call instead of one call per mentor"""
+    enabled = LLM_BATCH_MODE if requested is None else requested
+    return enabled and mentor_count >= LLM_BATCH_MIN_MENTORS
+
+def build_batch_system_message(mentors: List[Dict]) -> str:
+    """System prompt asking for one answer per persona, keyed by mentor id"""
+    personas = "\n".join(
+        f'- "{mentor["id"]}": {mentor["name"]}, {mentor["expertise"]}'
+        for mentor in mentors
+    )
+    return f"""You will answer the user's question separately as each of the following people:
+{personas}
+
+For each person, respond in their authentic voice with 2-3 paragraphs. Use personal experiences and "I" statements. Be practical and actionable and draw on that person's expertise. Answers must be independent of each other.
+
+Return ONLY a JSON object whose keys are exactly the ids above and whose values are that person's answer as a string. Do not add any text outside the JSON object."""
+
+class BatchGenerationStats:
+    """Counters comparing batched generation with its per-mentor fallbacks"""
+
+    def __init__(self):
+        self.batched_calls = 0
+        self.batched_mentors = 0
+        self.parsed_answers = 0
+        self.parse_fallbacks = 0
+
+    def record(self, requested: int, parsed: int) -> None:
+        self.batched_calls += 1
+        self.batched_mentors += requested
+        self.parsed_answers += parsed
+        self.parse_fallbacks += requested - parsed
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "default_mode": "batched" if LLM_BATCH_MODE else "per_mentor",
+            "batched_calls": self.batched_calls,
+            "batched_mentors": self.batched_mentors,
+            "avg_mentors_per_call": round(self.batched_mentors / self.batched_calls, 2) if self.batched_calls else 0.0,
+            "parsed_answers": self.parsed_answers,
+            "per_mentor_fallbacks": self.parse_fallbacks
+        }
+
+def parse_batch_response(text: str, mentor_ids: List[str]) -> Dict[str, str]:
+    """Extract per-mentor answers; mentors missing or malformed in the output are omitted"""
+    cleaned = _CODE_FENCE_RE.sub("", (text or "").strip())
+    start, end = cleaned.find("{"), cleaned.rfind("}")
+    if start == -1 or end <= start:
+        logger.warning("Batched response contained no JSON object")
+        return {}
+
+    try:
+        payload = json.loads(cleaned[start:end + 1])
+    except json.JSONDecodeError as e:
+        logger.warning(f"Batched response was not valid JSON: {str(e)}")
+        return {}
+
+    if not isinstance(payload, dict):
+        return {}
+
+    answers = {}
+    for mentor_id in mentor_ids:
+        answer = payload.get(mentor_id)
+        if isinstance(answer, str) and answer.strip():
+            answers[mentor_id] = answer.strip()
+    return answers
+
+# Initialize batched generation counters
+batch_generation_stats = BatchGenerationStats()
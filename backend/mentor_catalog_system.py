@@ -0,0 +1,95 @@
+"""
+OnlyMentors.ai Mentor Catalog System
+Indexed, read-only view of the static AI mentor catalog with O(1) lookups
+"""
+
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Mapping, NamedTuple, Optional, Tuple
+
+class MentorRecord(NamedTuple):
+    """Immutable summary of one catalog mentor, for listings that don't need the persona"""
+    id: str
+    name: str
+    category: str
+    title: str
+    expertise: str
+    bio: str
+    image_url: Optional[str]
+
+class MentorCatalog:
+    """Catalog mentors indexed by id and category
+
+    Built once from ALL_MENTORS after the expanded mentor lists are merged in.
+    get() returns the catalog's own persona dict, so callers share objects
+    with the prompt registry's identity fast path. The catalog repeats some
+    ids; like the linear scans it replaces, the first occurrence in category
+    order wins, both globally and within each category.
+    """
+
+    def __init__(self, mentors_by_category: Mapping[str, Iterable[Dict[str, Any]]]):
+        by_id: Dict[str, Dict[str, Any]] = {}
+        category_of: Dict[str, str] = {}
+        by_category_id: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        records: Dict[str, MentorRecord] = {}
+        categories: Dict[str, Tuple[Dict[str, Any], ...]] = {}
+        duplicates = 0
+
+        for category, mentors in mentors_by_category.items():
+            categories[category] = tuple(mentors)
+            for mentor in categories[category]:
+                by_category_id.setdefault((category, mentor["id"]), mentor)
+                if mentor["id"] in by_id:
+                    duplicates += 1
+                    continue
+                by_id[mentor["id"]] = mentor
+                category_of[mentor["id"]] = category
+                records[mentor["id"]] = MentorRecord(
+                    id=mentor["id"],
+                    name=mentor["name"],
+                    category=category,
+                    title=mentor.get("title", ""),
+                    expertise=mentor.get("expertise", ""),
+                    bio=mentor.get("bio", ""),
+                    image_url=mentor.get("image_url")
+                )
+
+        self._by_id = MappingProxyType(by_id)
+        self._category_of = MappingProxyType(category_of)
+        self._by_category_id = MappingProxyType(by_category_id)
+        self._records = MappingProxyType(records)
+        self._categories = MappingProxyType(categories)
+        self.duplicates = duplicates
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __contains__(self, mentor_id: str) -> bool:
+        return mentor_id in self._by_id
+
+    def get(self, mentor_id: str) -> Optional[Dict[str, Any]]:
+        return self._by_id.get(mentor_id)
+
+    def get_in_category(self, category: str, mentor_id: str) -> Optional[Dict[str, Any]]:
+        """Mentor only if listed under this category (question endpoints take both)"""
+        return self._by_category_id.get((category, mentor_id))
+
+    def category_of(self, mentor_id: str) -> Optional[str]:
+        return self._category_of.get(mentor_id)
+
+    def record(self, mentor_id: str) -> Optional[MentorRecord]:
+        return self._records.get(mentor_id)
+
+    def in_category(self, category: str) -> Tuple[Dict[str, Any], ...]:
+        return self._categories.get(category, ())
+
+    @property
+    def categories(self) -> Tuple[str, ...]:
+        return tuple(self._categories)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "mentors": len(self._by_id),
+            "listed_entries": sum(len(mentors) for mentors in self._categories.values()),
+            "duplicate_ids": self.duplicates,
+            "categories": {category: len(mentors) for category, mentors in self._categories.items()}
+        }
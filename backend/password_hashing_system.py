@@ -0,0 +1,106 @@
+"""
+OnlyMentors.ai Password Hashing System
+bcrypt hashing and verification on a dedicated bounded thread pool, off the event loop
+"""
+
+import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from passlib.context import CryptContext
+
+# bcrypt cost factor for new hashes; hashes at any other cost are upgraded on the next login
+PASSWORD_BCRYPT_ROUNDS = int(os.getenv("PASSWORD_BCRYPT_ROUNDS", "12"))
+# bcrypt releases the GIL, so a few threads use that many cores without touching the loop
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Jobs waiting or running above which the pool reports itself saturated
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(PASSWORD_HASH_WORKERS * 16)))
+
+class PasswordHasher:
+    """CryptContext wrapper whose every bcrypt call runs on its own executor
+
+    Verification and hashing are awaited, so a login storm costs queueing
+    delay for logins only; LLM streams and other requests keep their loop.
+    """
+
+    def __init__(self, rounds: int = PASSWORD_BCRYPT_ROUNDS, workers: int = PASSWORD_HASH_WORKERS,
+                 max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max_pending
+        # min = max = default rounds: any hash at a different cost reports needs_update
+        self.context = CryptContext(
+            schemes=["bcrypt"],
+            deprecated="auto",
+            bcrypt__default_rounds=rounds,
+            bcrypt__min_rounds=rounds,
+            bcrypt__max_rounds=rounds
+        )
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self.pending = 0
+        self.running = 0
+        self.max_pending_seen = 0
+        self.completed: Dict[str, int] = {"hash": 0, "verify": 0}
+        self.rehashed = 0
+        self.wait_ms_total = 0.0
+        self.run_ms_total = 0.0
+
+    @property
+    def saturated(self) -> bool:
+        return self.pending >= self.max_pending
+
+    async def _submit(self, kind: str, fn: Callable[..., Any], *args) -> Any:
+        enqueued_at = time.perf_counter()
+        timings = {}
+
+        def job():
+            started_at = time.perf_counter()
+            timings["wait"] = started_at - enqueued_at
+            self.running += 1
+            try:
+                return fn(*args)
+            finally:
+                self.running -= 1
+                timings["run"] = time.perf_counter() - started_at
+
+        self.pending += 1
+        self.max_pending_seen = max(self.max_pending_seen, self.pending)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, job)
+        finally:
+            self.pending -= 1
+            self.completed[kind] += 1
+            self.wait_ms_total += timings.get("wait", 0.0) * 1000
+            self.run_ms_total += timings.get("run", 0.0) * 1000
+
+    async def hash(self, password: str) -> str:
+        return await self._submit("hash", self.context.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._submit("verify", self.context.verify, password, hashed)
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """(valid, new hash or None); a new hash is returned when the stored cost is outdated"""
+        return await self._submit("verify", self.context.verify_and_update, password, hashed)
+
+    def get_stats(self) -> Dict[str, Any]:
+        done = sum(self.completed.values())
+        return {
+            "rounds": self.rounds,
+            "workers": self.workers,
+            "pending": self.pending,
+            "running": self.running,
+            "max_pending": self.max_pending,
+            "max_pending_seen": self.max_pending_seen,
+            "saturated": self.saturated,
+            "hashes": self.completed["hash"],
+            "verifications": self.completed["verify"],
+            "rehashed_on_login": self.rehashed,
+            "avg_queue_wait_ms": round(self.wait_ms_total / done, 2) if done else 0.0,
+            "avg_hash_ms": round(self.run_ms_total / done, 2) if done else 0.0
+        }
+
+# Initialize process-wide password hasher
+password_hasher = PasswordHasher()
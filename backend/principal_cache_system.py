@@ -0,0 +1,111 @@
+"""
+OnlyMentors.ai Principal Cache System
+Short-TTL in-process cache of authenticated user and creator documents
+"""
+
+import os
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+PRINCIPAL_CACHE_ENABLED = os.getenv("PRINCIPAL_CACHE_ENABLED", "true").lower() == "true"
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "30"))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "20000"))
+
+# Admins are deliberately absent: their status is changed outside any handler
+# that could invalidate them, so get_current_admin always reads the database
+PRINCIPAL_KINDS = ("user", "creator")
+
+# Credentials and payout details are never needed once a token is verified
+LEAN_CREATOR_PROJECTION = {"_id": 0, "password_hash": 0, "banking_info": 0}
+LEAN_ADMIN_PROJECTION = {"_id": 0, "password_hash": 0}
+
+class PrincipalCache:
+    """(kind, id) -> principal document, least recently used evicted first
+
+    Entries expire after a short TTL, and the handlers that change a
+    principal's account state invalidate it explicitly, so within one worker
+    a suspension or role change applies to the very next request. Other
+    workers see it once their entry expires. Misses are never cached.
+    """
+
+    def __init__(self, ttl_seconds: float = PRINCIPAL_CACHE_TTL_SECONDS,
+                 max_entries: int = PRINCIPAL_CACHE_MAX_ENTRIES,
+                 enabled: bool = PRINCIPAL_CACHE_ENABLED):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.hits: Dict[str, int] = defaultdict(int)
+        self.misses: Dict[str, int] = defaultdict(int)
+        self.invalidations: Dict[str, int] = defaultdict(int)
+        self.evictions = 0
+        # Bumped on every invalidation so a load racing with one is not cached
+        self._epoch = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get_or_load(self, kind: str, principal_id: str,
+                          load: Callable[[], Awaitable[Optional[Dict[str, Any]]]]) -> Optional[Dict[str, Any]]:
+        """Cached principal, or load() it on a miss; callers get their own shallow copy"""
+        if not self.enabled:
+            return await load()
+
+        key = (kind, principal_id)
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, doc = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits[kind] += 1
+                return dict(doc)
+            del self._entries[key]
+
+        self.misses[kind] += 1
+        epoch = self._epoch
+        doc = await load()
+        if doc is not None and epoch == self._epoch:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, doc)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return dict(doc) if doc is not None else None
+
+    def invalidate(self, kind: str, principal_id: str) -> None:
+        """Drop one principal after its account state changed"""
+        self.invalidations[kind] += 1
+        self._epoch += 1
+        self._entries.pop((kind, principal_id), None)
+
+    def invalidate_where(self, kind: str, field: str, value: Any) -> int:
+        """Drop cached principals matching a field, for updates keyed by email"""
+        stale = [key for key, (_, doc) in self._entries.items() if key[0] == kind and doc.get(field) == value]
+        for key in stale:
+            del self._entries[key]
+        self.invalidations[kind] += 1
+        self._epoch += 1
+        return len(stale)
+
+    def get_stats(self) -> Dict[str, Any]:
+        by_kind = {}
+        for kind in PRINCIPAL_KINDS:
+            lookups = self.hits[kind] + self.misses[kind]
+            by_kind[kind] = {
+                "hits": self.hits[kind],
+                "misses": self.misses[kind],
+                "hit_ratio": round(self.hits[kind] / lookups, 3) if lookups else 0.0,
+                "invalidations": self.invalidations[kind]
+            }
+        return {
+            "enabled": self.enabled,
+            "ttl_seconds": self.ttl_seconds,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+            "by_kind": by_kind
+        }
+
+# Initialize process-wide principal cache
+principal_cache = PrincipalCache()
@@ -0,0 +1,130 @@
+"""
+OnlyMentors.ai Prompt Registry System
+Persona prompt headers compiled once per mentor, with a version id and token estimate
+"""
+
+import hashlib
+from typing import Dict, List, Any
+
+# Bump when the templates below change so every cached answer is re-keyed
+PROMPT_TEMPLATE_REVISION = "1"
+
+# Rough rule of thumb for English text with the GPT tokenizers
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def persona_version(mentor: Dict[str, Any]) -> str:
+    """Short id that changes whenever a persona field used in a prompt changes"""
+    payload = "\x1f".join([
+        PROMPT_TEMPLATE_REVISION,
+        mentor.get("id", ""),
+        mentor.get("name", ""),
+        mentor.get("expertise", ""),
+        mentor.get("wiki_description", "")
+    ]).encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=6).hexdigest()
+
+class CompiledPersona:
+    """Precomputed prompt headers for one mentor; request code only appends to them"""
+
+    __slots__ = ("mentor_id", "version", "source", "answer_prompt", "contextual_header",
+                 "answer_tokens", "contextual_tokens")
+
+    def __init__(self, mentor: Dict[str, Any]):
+        self.mentor_id = mentor["id"]
+        self.version = persona_version(mentor)
+        self.source = mentor
+
+        # System message for /api/questions/ask: short, no question appended
+        self.answer_prompt = f"""You are {mentor['name']}, {mentor['expertise']}.
+
+Respond in your authentic voice with 2-3 paragraphs. Use personal experiences and "I" statements. Be practical and actionable. Your expertise: {mentor['expertise']}."""
+
+        # Header for contextual prompts; context window and question are appended
+        self.contextual_header = f"""You are {mentor['name']}, {mentor['expertise']}. {mentor.get('wiki_description', '')}
+
+Personality and Communication Style:
+- Respond as if you are actually {mentor['name']}
+- Use your authentic voice, personality, and speaking patterns
+- Draw from your real-life experiences, achievements, and philosophy
+- Provide practical, actionable advice based on your expertise
+- Keep responses conversational yet insightful (2-3 paragraphs)
+- Use "I" statements and personal anecdotes where appropriate
+- Reflect your known values, beliefs, and approach to life/work
+
+Areas of Expertise: {mentor['expertise']}"""
+
+        self.answer_tokens = estimate_tokens(self.answer_prompt)
+        self.contextual_tokens = estimate_tokens(self.contextual_header)
+
+class PromptRegistry:
+    """Mentor id -> compiled persona, built from the catalog at startup"""
+
+    def __init__(self):
+        self._personas: Dict[str, CompiledPersona] = {}
+        # Every listed catalog dict, by identity: the catalog repeats some ids,
+        # and each listing must hit the fast path, not evict the other's persona
+        self._catalog: Dict[int, CompiledPersona] = {}
+        self.compiled_on_demand = 0
+        self.recompiled = 0
+
+    def __len__(self) -> int:
+        return len(self._personas)
+
+    def build(self, mentors_by_category: Dict[str, List[Dict[str, Any]]]) -> int:
+        """Compile every catalog mentor; returns how many personas are registered
+
+        For a repeated id the first listing owns the id, as in MentorCatalog.
+        """
+        personas = {}
+        catalog = {}
+        for mentors in mentors_by_category.values():
+            for mentor in mentors:
+                persona = catalog[id(mentor)] = CompiledPersona(mentor)
+                personas.setdefault(mentor["id"], persona)
+        self._personas = personas
+        self._catalog = catalog
+        return len(personas)
+
+    def get(self, mentor: Dict[str, Any]) -> CompiledPersona:
+        """Compiled persona for a mentor dict
+
+        Catalog mentors are the same dict objects the registry was built from, so
+        the lookup is a single dict access. Mentors built per request (human
+        creators) are re-versioned and recompiled only when their fields changed.
+        """
+        persona = self._catalog.get(id(mentor))
+        if persona is not None and persona.source is mentor:
+            return persona
+
+        persona = self._personas.get(mentor["id"])
+        if persona is not None and persona.source is mentor:
+            return persona
+
+        if persona is None:
+            self.compiled_on_demand += 1
+        elif persona.version == persona_version(mentor):
+            return persona
+        else:
+            self.recompiled += 1
+
+        persona = CompiledPersona(mentor)
+        self._personas[mentor["id"]] = persona
+        return persona
+
+    def get_stats(self) -> Dict[str, Any]:
+        personas = list(self._personas.values())
+        return {
+            "template_revision": PROMPT_TEMPLATE_REVISION,
+            "personas": len(personas),
+            "compiled_on_demand": self.compiled_on_demand,
+            "recompiled": self.recompiled,
+            "avg_answer_prompt_tokens": round(sum(p.answer_tokens for p in personas) / len(personas), 1) if personas else 0.0,
+            "avg_contextual_header_tokens": round(sum(p.contextual_tokens for p in personas) / len(personas), 1) if personas else 0.0,
+            "max_contextual_header_tokens": max((p.contextual_tokens for p in personas), default=0)
+        }
+
+# Initialize process-wide prompt registry
+prompt_registry = PromptRegistry()
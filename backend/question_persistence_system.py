@@ -0,0 +1,90 @@
+"""
+OnlyMentors.ai Question Persistence System
+Batched write unit for a question and its deferred per-mentor bookkeeping
+"""
+
+import os
+import time
+import asyncio
+from typing import Any, Dict, List
+import logging
+
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Multi-document transactions need a replica set or mongos; off by default
+QUESTION_WRITE_TRANSACTIONS = os.getenv("QUESTION_WRITE_TRANSACTIONS", "false").lower() == "true"
+
+# Server error code for "Transaction numbers are only allowed on a replica set member or mongos"
+_ILLEGAL_OPERATION = 20
+
+class QuestionAnswerWriter:
+    """Persist one answered question in a constant number of round trips
+
+    The request path writes only the questions document and one outbox event
+    carrying the bookkeeping (interaction records, user history and counters),
+    which the outbox drainer applies later. The two writes are independent, so
+    they run concurrently. In transaction mode they run in a single session so
+    the question and its outbox event are recorded all-or-nothing.
+    """
+
+    def __init__(self, client, db, outbox, use_transactions: bool = QUESTION_WRITE_TRANSACTIONS):
+        self.client = client
+        self.db = db
+        self.outbox = outbox
+        self.use_transactions = use_transactions
+        self.writes = 0
+        self.transactional_writes = 0
+        self.round_trips = 0
+        self.errors = 0
+        self.write_time_total = 0.0
+
+    async def write(self, question_doc: Dict[str, Any], deferred_ops: List[Dict[str, Any]]) -> None:
+        started = time.perf_counter()
+        try:
+            if self.use_transactions:
+                try:
+                    await self._write_transaction(question_doc, deferred_ops)
+                    self.transactional_writes += 1
+                except OperationFailure as e:
+                    if e.code != _ILLEGAL_OPERATION:
+                        raise
+                    # Standalone server: nothing was written, so switch modes and retry
+                    logger.warning("MongoDB does not support transactions here; using concurrent question writes")
+                    self.use_transactions = False
+                    await self._write_concurrent(question_doc, deferred_ops)
+            else:
+                await self._write_concurrent(question_doc, deferred_ops)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.write_time_total += time.perf_counter() - started
+
+        self.writes += 1
+
+    async def _write_concurrent(self, question_doc, deferred_ops):
+        await asyncio.gather(
+            self.db.questions.insert_one(question_doc),
+            self.outbox.enqueue("question_answered", deferred_ops)
+        )
+        self.round_trips += 2
+
+    async def _write_transaction(self, question_doc, deferred_ops):
+        async with await self.client.start_session() as session:
+            async with session.start_transaction():
+                await self.db.questions.insert_one(question_doc, session=session)
+                await self.outbox.enqueue("question_answered", deferred_ops, session=session)
+        # Both writes plus the commitTransaction command
+        self.round_trips += 3
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "transaction_mode": self.use_transactions,
+            "writes": self.writes,
+            "transactional_writes": self.transactional_writes,
+            "errors": self.errors,
+            "avg_round_trips_per_question": round(self.round_trips / self.writes, 2) if self.writes else 0.0,
+            "avg_write_ms": round(self.write_time_total / self.writes * 1000, 2) if self.writes else 0.0
+        }
@@ -0,0 +1,210 @@
+"""
+OnlyMentors.ai Question Similarity System
+Per-mentor MinHash/LSH index so paraphrased questions reuse cached mentor answers
+"""
+
+import os
+import re
+import time
+import random
+import hashlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple, Any
+import logging
+
+logger = logging.getLogger(__name__)
+
+ANSWER_SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_SIMILARITY_THRESHOLD", "0.8"))
+ANSWER_SIMILARITY_MAX_PER_MENTOR = int(os.getenv("ANSWER_SIMILARITY_MAX_PER_MENTOR", "5000"))
+ANSWER_SIMILARITY_MIN_TOKENS = int(os.getenv("ANSWER_SIMILARITY_MIN_TOKENS", "2"))
+
+# 32 permutations split into 8 bands of 4 rows: pairs at Jaccard 0.8 collide in
+# at least one band ~98% of the time, pairs at 0.5 only ~40%
+MINHASH_PERMUTATIONS = 32
+LSH_BANDS = 8
+LSH_ROWS = MINHASH_PERMUTATIONS // LSH_BANDS
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(20240917)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(MINHASH_PERMUTATIONS)
+]
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Filler words that do not change what is being asked. Negations and
+# interrogatives are kept on purpose: "why raise a seed round" and "how
+# raise a seed round" ask different things.
+STOPWORDS = frozenset({
+    "a", "an", "the", "i", "me", "my", "we", "our", "you", "your", "it", "its",
+    "is", "are", "was", "were", "be", "been", "am", "do", "does", "did", "can",
+    "could", "should", "would", "will", "shall", "may", "might", "must",
+    "to", "of", "in", "on", "for", "at", "by", "with", "about", "as", "from",
+    "and", "or", "so", "if", "then", "that", "this", "these", "those",
+    "please", "tell", "some", "any", "get", "got", "there", "here", "just", "really"
+})
+
+_SUFFIXES = ("ing", "ed", "es", "s")
+# Words ending like this are not plurals ("business", "focus", "analysis")
+_NOT_PLURAL = ("ss", "us", "is")
+
+def _stem(token: str) -> str:
+    if token.endswith(_NOT_PLURAL):
+        return token
+    for suffix in _SUFFIXES:
+        if len(token) - len(suffix) >= 3 and token.endswith(suffix):
+            return token[:-len(suffix)]
+    return token
+
+def question_shingles(question: str) -> Set[str]:
+    """Normalize a question into its set of meaningful, lightly stemmed words"""
+    return {
+        _stem(token)
+        for token in _TOKEN_RE.findall((question or "").lower())
+        if token not in STOPWORDS
+    }
+
+def _token_hash(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+
+def minhash_signature(shingles: Set[str]) -> Tuple[int, ...]:
+    """MinHash signature of a shingle set (stable across processes)"""
+    hashes = [_token_hash(token) for token in shingles]
+    return tuple(
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+def jaccard_similarity(first: Set[str], second: Set[str]) -> float:
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+class MentorQuestionIndex:
+    """LSH index of one mentor's cached questions, mapping to answer cache keys"""
+
+    def __init__(self, max_entries: int = ANSWER_SIMILARITY_MAX_PER_MENTOR):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[frozenset, Tuple[int, ...]]]" = OrderedDict()
+        self._bands: List[Dict[Tuple[int, ...], Set[str]]] = [{} for _ in range(LSH_BANDS)]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _band_keys(signature: Tuple[int, ...]):
+        for band in range(LSH_BANDS):
+            yield band, signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+
+    def add(self, cache_key: str, shingles: Set[str]) -> None:
+        if cache_key in self._entries:
+            self.remove(cache_key)
+
+        signature = minhash_signature(shingles)
+        self._entries[cache_key] = (frozenset(shingles), signature)
+        for band, band_key in self._band_keys(signature):
+            self._bands[band].setdefault(band_key, set()).add(cache_key)
+
+        while len(self._entries) > self.max_entries:
+            self.remove(next(iter(self._entries)))
+
+    def remove(self, cache_key: str) -> None:
+        entry = self._entries.pop(cache_key, None)
+        if entry is None:
+            return
+        for band, band_key in self._band_keys(entry[1]):
+            bucket = self._bands[band].get(band_key)
+            if bucket is not None:
+                bucket.discard(cache_key)
+                if not bucket:
+                    del self._bands[band][band_key]
+
+    def query(self, shingles: Set[str], threshold: float) -> Tuple[Optional[str], float, int]:
+        """Return (best cache key, similarity, candidates examined) above threshold"""
+        signature = minhash_signature(shingles)
+        candidates: Set[str] = set()
+        for band, band_key in self._band_keys(signature):
+            bucket = self._bands[band].get(band_key)
+            if bucket:
+                candidates.update(bucket)
+
+        best_key, best_score = None, 0.0
+        for cache_key in candidates:
+            score = jaccard_similarity(shingles, self._entries[cache_key][0])
+            if score > best_score:
+                best_key, best_score = cache_key, score
+
+        if best_score < threshold:
+            return None, best_score, len(candidates)
+        return best_key, best_score, len(candidates)
+
+class QuestionSimilarityIndex:
+    """Per-mentor near-duplicate lookup in front of the exact-key answer cache"""
+
+    def __init__(self, threshold: float = ANSWER_SIMILARITY_THRESHOLD,
+                 max_per_mentor: int = ANSWER_SIMILARITY_MAX_PER_MENTOR,
+                 min_tokens: int = ANSWER_SIMILARITY_MIN_TOKENS):
+        self.threshold = threshold
+        self.max_per_mentor = max_per_mentor
+        self.min_tokens = min_tokens
+        self._mentors: Dict[str, MentorQuestionIndex] = {}
+        self.lookups = 0
+        self.matches = 0
+        self.stale_matches = 0
+        self.candidates_examined = 0
+        self.lookup_time_total = 0.0
+
+    def add(self, mentor_id: str, question: str, cache_key: str) -> None:
+        """Index a question whose answer is stored under cache_key"""
+        shingles = question_shingles(question)
+        if len(shingles) < self.min_tokens:
+            return
+        index = self._mentors.get(mentor_id)
+        if index is None:
+            index = self._mentors[mentor_id] = MentorQuestionIndex(self.max_per_mentor)
+        index.add(cache_key, shingles)
+
+    def discard_stale(self, mentor_id: str, cache_key: str) -> None:
+        """Forget a matched cache key whose answer has already been evicted"""
+        index = self._mentors.get(mentor_id)
+        if index is not None:
+            index.remove(cache_key)
+            self.stale_matches += 1
+
+    def find(self, mentor_id: str, question: str) -> Optional[str]:
+        """Return the cache key of the most similar indexed question, if close enough"""
+        index = self._mentors.get(mentor_id)
+        if index is None:
+            return None
+
+        shingles = question_shingles(question)
+        if len(shingles) < self.min_tokens:
+            return None
+
+        started = time.perf_counter()
+        cache_key, score, examined = index.query(shingles, self.threshold)
+        self.lookup_time_total += time.perf_counter() - started
+        self.lookups += 1
+        self.candidates_examined += examined
+
+        if cache_key is not None:
+            self.matches += 1
+            logger.debug(f"Near-duplicate match for mentor {mentor_id} (similarity {score:.2f})")
+        return cache_key
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "threshold": self.threshold,
+            "mentors_indexed": len(self._mentors),
+            "questions_indexed": sum(len(index) for index in self._mentors.values()),
+            "lookups": self.lookups,
+            "matches": self.matches,
+            "match_rate": round(self.matches / self.lookups * 100, 2) if self.lookups else 0.0,
+            "stale_matches": self.stale_matches,
+            "avg_candidates": round(self.candidates_examined / self.lookups, 2) if self.lookups else 0.0,
+            "avg_lookup_us": round(self.lookup_time_total / self.lookups * 1e6, 1) if self.lookups else 0.0
+        }
+
+# Initialize process-wide similarity index
+question_similarity_index = QuestionSimilarityIndex()
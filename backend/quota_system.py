@@ -0,0 +1,93 @@
+"""
+OnlyMentors.ai Quota System
+Atomic counter-based quotas: reserve a slot with one conditional update, release on failure
+"""
+
+from typing import Any, Dict, Optional
+import logging
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+class QuotaExceededError(Exception):
+    """No slot left for this key"""
+
+class QuotaReservation:
+    """One reserved slot; remaining is None when the key is exempt from the limit"""
+
+    __slots__ = ("key", "remaining", "released")
+
+    def __init__(self, key: str, remaining: Optional[int]):
+        self.key = key
+        self.remaining = remaining
+        self.released = False
+
+class CounterQuota:
+    """Limit on a counter field of one document per key
+
+    reserve() increments the counter only if it is below the limit (or the
+    document is exempt), in a single find_one_and_update, so concurrent
+    requests can never overshoot and no prior read is needed. The same class
+    covers per-user free questions and per-company business allowances.
+    """
+
+    def __init__(self, collection, key_field: str, counter_field: str, limit: int,
+                 exempt_field: Optional[str] = None):
+        self.collection = collection
+        self.key_field = key_field
+        self.counter_field = counter_field
+        self.limit = limit
+        self.exempt_field = exempt_field
+        self.reserved = 0
+        self.rejected = 0
+        self.released = 0
+
+    async def reserve(self, key: str) -> QuotaReservation:
+        allowed = [
+            {self.counter_field: {"$lt": self.limit}},
+            {self.counter_field: {"$exists": False}}
+        ]
+        if self.exempt_field:
+            allowed.append({self.exempt_field: True})
+
+        projection = {"_id": 0, self.counter_field: 1}
+        if self.exempt_field:
+            projection[self.exempt_field] = 1
+
+        doc = await self.collection.find_one_and_update(
+            {self.key_field: key, "$or": allowed},
+            {"$inc": {self.counter_field: 1}},
+            projection=projection,
+            return_document=ReturnDocument.AFTER
+        )
+        if doc is None:
+            self.rejected += 1
+            raise QuotaExceededError(f"Quota exhausted for {self.key_field}={key}")
+
+        self.reserved += 1
+        if self.exempt_field and doc.get(self.exempt_field):
+            return QuotaReservation(key, None)
+        return QuotaReservation(key, max(0, self.limit - doc.get(self.counter_field, 0)))
+
+    async def release(self, reservation: QuotaReservation) -> None:
+        """Give a reserved slot back (the request that reserved it failed)"""
+        if reservation.released:
+            return
+        reservation.released = True
+        try:
+            await self.collection.update_one(
+                {self.key_field: reservation.key, self.counter_field: {"$gt": 0}},
+                {"$inc": {self.counter_field: -1}}
+            )
+            self.released += 1
+        except Exception as e:
+            logger.error(f"Failed to release quota slot for {reservation.key}: {str(e)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "reserved": self.reserved,
+            "rejected": self.rejected,
+            "released": self.released
+        }
@@ -1,19 +1,24 @@
-from fastapi import FastAPI, HTTPException, Request, Depends, UploadFile, File, Form, Query
+from fastapi import FastAPI, HTTPException, Request, Depends, UploadFile, File, Form, Query, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field, validator, EmailStr
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from motor.motor_asyncio import AsyncIOMotorClient
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
 import jwt
 import uuid
 import os
 import json
 import re
+import logging
 from dotenv import load_dotenv
+
+# Logging is configured once here; helper modules only create their own loggers
+logging.basicConfig(level=logging.INFO)
 from complete_mentors_database import ALL_MENTORS, TOTAL_MENTORS, BUSINESS_MENTORS, SPORTS_MENTORS, HEALTH_MENTORS, SCIENCE_MENTORS
 from expanded_mentors import ADDITIONAL_BUSINESS_MENTORS, ADDITIONAL_SPORTS_MENTORS, ADDITIONAL_HEALTH_MENTORS, ADDITIONAL_SCIENCE_MENTORS
+from mentor_catalog_system import MentorCatalog
 
 # Merge additional mentors with existing ones
 BUSINESS_MENTORS.extend(ADDITIONAL_BUSINESS_MENTORS)
@@ -24,10 +29,12 @@ SCIENCE_MENTORS.extend(ADDITIONAL_SCIENCE_MENTORS)
 # Recalculate total mentors after merging
 TOTAL_MENTORS = sum(len(mentors) for mentors in ALL_MENTORS.values())
 
+# O(1) mentor lookups by id and category over the merged catalog
+mentor_catalog = MentorCatalog(ALL_MENTORS)
+
 # Load environment variables from .env file
 load_dotenv()
 from emergentintegrations.payments.stripe.checkout import StripeCheckout, CheckoutSessionResponse, CheckoutStatusResponse, CheckoutSessionRequest
-from emergentintegrations.llm.chat import LlmChat, UserMessage
 from creator_system import (
     CreatorSignupRequest, CreatorProfileUpdate, BankingInfoRequest, ContentUploadRequest, MessageRequest,
     CreatorStatus, ContentType, validate_file_upload, calculate_creator_earnings,
@@ -85,7 +92,6 @@ app.add_middleware(
 )
 
 # Security
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
 # Database
@@ -230,6 +236,7 @@ class QuestionRequest(BaseModel):
     category: str
     mentor_ids: List[str]  # Multiple mentors can be selected
     question: str
+    batch_mode: Optional[bool] = None  # One LLM call for all mentors; None uses LLM_BATCH_MODE
 
 class CheckoutRequest(BaseModel):
     package_id: str
@@ -281,11 +288,22 @@ async def validate_business_employee_email(email: str, business_slug: str) -> di
     except Exception as e:
         return {"valid": False, "error": f"Email validation failed: {str(e)}"}
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+async def hash_password(password: str) -> str:
+    return await password_hasher.hash(password)
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.verify(plain_password, hashed_password)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_login_password(collection, id_filter: dict, plain_password: str, hashed_password: str) -> bool:
+    """Verify a login and, if the stored hash uses an outdated cost factor, replace it"""
+    valid, new_hash = await password_hasher.verify_and_update(plain_password, hashed_password)
+    if valid and new_hash:
+        try:
+            await collection.update_one(id_filter, {"$set": {"password_hash": new_hash}})
+            password_hasher.rehashed += 1
+        except Exception as e:
+            print(f"⚠️ Password rehash failed: {str(e)}")
+    return valid
 
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
@@ -293,14 +311,47 @@ def create_access_token(data: dict) -> str:
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, JWT_SECRET, algorithm="HS256")
 
+def create_user_access_token(user: dict) -> str:
+    """User JWT carrying the signed identity claims used by get_current_identity"""
+    return create_access_token(user_token_claims(user))
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return await authenticate_user_token(credentials.credentials)
+
+async def get_current_identity(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Identity-only authentication for endpoints that just need user_id
+    
+    With STATELESS_AUTH_ENABLED the token's signed claims are returned after a
+    revocation check, without touching the database. Otherwise, and for tokens
+    minted before claims existed, this is the same lookup as get_current_user.
+    """
+    if not STATELESS_AUTH_ENABLED:
+        return await authenticate_user_token(credentials.credentials)
     try:
         payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=["HS256"])
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    
+    if not has_identity_claims(payload):
+        return await authenticate_user_token(credentials.credentials)
+    if token_revocations.is_revoked(payload["user_id"], payload["iat"]):
+        raise HTTPException(status_code=401, detail="Token has been revoked")
+    return payload
+
+async def authenticate_user_token(token: str):
+    """Resolve a user JWT to the user document (shared by HTTP and WebSocket auth)"""
+    try:
+        payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
         user_id = payload.get("user_id")
         if user_id is None:
             raise HTTPException(status_code=401, detail="Invalid token")
+        if has_identity_claims(payload) and token_revocations.is_revoked(user_id, payload["iat"]):
+            raise HTTPException(status_code=401, detail="Token has been revoked")
         
-        user = await db.users.find_one({"user_id": user_id})
+        # Lean projection, cached briefly: the principal is loaded on every request
+        user = await principal_cache.get_or_load(
+            "user", user_id, lambda: db.users.find_one({"user_id": user_id}, LEAN_USER_PROJECTION)
+        )
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
         return user
@@ -317,7 +368,9 @@ async def get_current_admin(credentials: HTTPAuthorizationCredentials = Depends(
         if admin_id is None or admin_type != "admin":
             raise HTTPException(status_code=401, detail="Invalid admin token")
         
-        admin = await admin_db.admins.find_one({"admin_id": admin_id})
+        # Not cached: admin status and roles are changed directly in the admin
+        # database, where no handler could invalidate a cached copy
+        admin = await admin_db.admins.find_one({"admin_id": admin_id}, LEAN_ADMIN_PROJECTION)
         if not admin or admin["status"] != AdminStatus.ACTIVE:
             raise HTTPException(status_code=401, detail="Admin not found or inactive")
         return admin
@@ -334,7 +387,9 @@ async def get_current_creator(credentials: HTTPAuthorizationCredentials = Depend
         if creator_id is None or creator_type != "creator":
             raise HTTPException(status_code=401, detail="Invalid creator token")
         
-        creator = await db.creators.find_one({"creator_id": creator_id})
+        creator = await principal_cache.get_or_load(
+            "creator", creator_id, lambda: db.creators.find_one({"creator_id": creator_id}, LEAN_CREATOR_PROJECTION)
+        )
         if not creator:
             raise HTTPException(status_code=401, detail="Creator not found")
         return creator
@@ -344,78 +399,166 @@ async def get_current_creator(credentials: HTTPAuthorizationCredentials = Depend
 # Performance optimization: Response cache
 from typing import Dict
 import time
+import asyncio
+from answer_cache_system import answer_cache, question_digest, PersistentAnswerCache
+from prompt_registry_system import prompt_registry
+from llm_backend_system import llm_backend
+from answer_prewarm_system import AnswerPrewarmer, PREWARM_SOURCE, ANSWER_PREWARM_REFRESH_SECONDS
+from question_similarity_system import question_similarity_index
+from llm_gateway_system import (
+    llm_singleflight, llm_governor, llm_hedger, llm_circuit_breaker, llm_request_identity,
+    CircuitOpenError, prompt_digest
+)
+from question_persistence_system import QuestionAnswerWriter
+from write_outbox_system import WriteOutbox, outbox_insert, outbox_update
+from conversation_session_system import ConversationSession, conversation_sessions
+from quota_system import CounterQuota, QuotaReservation, QuotaExceededError
+from user_history_system import UserHistory, LEAN_USER_PROJECTION
+from principal_cache_system import principal_cache, LEAN_CREATOR_PROJECTION, LEAN_ADMIN_PROJECTION
+from password_hashing_system import password_hasher
+from auth_admission_system import create_auth_admission, client_ip, AdmissionRejected, MongoTokenBuckets
+from token_revocation_system import (
+    TokenRevocationTable, user_token_claims, has_identity_claims, STATELESS_AUTH_ENABLED
+)
+from mentor_batch_system import (
+    should_batch, build_batch_system_message, parse_batch_response, batch_generation_stats
+)
 
-# Simple in-memory cache with TTL (Time To Live)
-response_cache: Dict[str, Dict] = {}
-CACHE_TTL = 300  # 5 minutes cache
+# Shared second tier: consulted after the in-memory cache and before the LLM
+persistent_answer_cache = PersistentAnswerCache(db.mentor_answer_cache)
+write_outbox = WriteOutbox(db)
+question_writer = QuestionAnswerWriter(client, db, write_outbox)
+token_revocations = TokenRevocationTable(db.auth_revocations)
+auth_admission = create_auth_admission(db, password_hasher)
 
-def get_cache_key(mentor_id: str, question: str) -> str:
-    """Generate cache key for mentor-question combination"""
-    return f"{mentor_id}:{hash(question)}"
+async def admit_login(request: Request, scope: str, email: str) -> Tuple[str, str]:
+    """Rate and hashing-queue admission for a login attempt, before any lookup or bcrypt work
+    
+    Returns the (ip, account) attempt to pass to auth_admission.record_failure
+    when the credentials turn out to be wrong.
+    """
+    attempt = (
+        client_ip(request.headers, request.client.host if request.client else None),
+        f"{scope}:{(email or '').strip().lower()}"
+    )
+    try:
+        await auth_admission.admit(*attempt)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many login attempts. Please try again later.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    return attempt
+
+def get_cache_key(mentor: dict, question: str) -> str:
+    """Generate cache key for mentor-question combination; a persona change re-keys it"""
+    return question_digest(mentor['id'], question, prompt_registry.get(mentor).version)
 
 def get_cached_response(cache_key: str) -> str:
     """Get cached response if still valid"""
-    if cache_key in response_cache:
-        cached_data = response_cache[cache_key]
-        if time.time() - cached_data["timestamp"] < CACHE_TTL:
-            print(f"📦 Using cached response for {cache_key[:20]}...")
-            return cached_data["response"]
-        else:
-            # Remove expired cache entry
-            del response_cache[cache_key]
-    return None
+    return answer_cache.get(cache_key)
 
-def cache_response(cache_key: str, response: str):
+def cache_response(cache_key: str, response: str, source: str = None):
     """Cache a mentor response"""
-    response_cache[cache_key] = {
-        "response": response,
-        "timestamp": time.time()
-    }
-    print(f"💾 Cached response for {cache_key[:20]}...")
+    answer_cache.set(cache_key, response, source=source)
 
-async def create_mentor_response(mentor, question):
-    """Create AI-powered response from a mentor using their personality and expertise"""
-    
+async def lookup_cached_mentor_response(mentor, question, cache_key: str):
+    """Return a cached answer from any cache tier, or None"""
     # Check cache first for speed
-    cache_key = get_cache_key(mentor['id'], question)
     cached_response = get_cached_response(cache_key)
     if cached_response:
         return cached_response
     
-    try:
-        # Create a unique session ID for this mentor-question combination
-        session_id = f"mentor_{mentor['id']}_{hash(question) % 10000}"
-        
-        # Optimized system message - shorter but still personalized
-        system_message = f"""You are {mentor['name']}, {mentor['expertise']}.
+    # Paraphrases of an already answered question reuse that answer
+    similar_key = question_similarity_index.find(mentor['id'], question)
+    if similar_key:
+        cached_response = get_cached_response(similar_key)
+        if cached_response:
+            return cached_response
+    
+    # Then the shared cache tier, so other workers' answers are reused
+    cached_entry = await persistent_answer_cache.get_entry(cache_key)
+    if cached_entry:
+        cache_response(cache_key, cached_entry["answer"], source=cached_entry.get("source"))
+        question_similarity_index.add(mentor['id'], question, cache_key)
+        return cached_entry["answer"]
+    
+    # A paraphrase's answer usually outlives the memory tier, so look for it there too
+    if similar_key:
+        cached_entry = await persistent_answer_cache.get_entry(similar_key)
+        if cached_entry:
+            cache_response(similar_key, cached_entry["answer"], source=cached_entry.get("source"))
+            return cached_entry["answer"]
+        question_similarity_index.discard_stale(mentor['id'], similar_key)
+    
+    return None
 
-Respond in your authentic voice with 2-3 paragraphs. Use personal experiences and "I" statements. Be practical and actionable. Your expertise: {mentor['expertise']}."""
+async def remember_mentor_response(mentor, question, cache_key: str, response_text: str, source: str = None):
+    """Store a real (non-fallback) answer in every cache tier"""
+    cache_response(cache_key, response_text, source=source)
+    await persistent_answer_cache.set(cache_key, mentor['id'], question, response_text, source=source)
+    question_similarity_index.add(mentor['id'], question, cache_key)
 
-        print(f"🤖 Creating response for {mentor['name']} (concurrent)")
-        
-        # Initialize LLM chat with faster model settings
-        chat = LlmChat(
-            api_key=OPENAI_API_KEY,
-            session_id=session_id,
-            system_message=system_message
-        ).with_model("openai", "gpt-4o-mini")
-        
-        # Create user message
-        user_message = UserMessage(text=question)
-        
-        # Get AI response with shorter timeout for faster responses
-        import asyncio
-        response = await asyncio.wait_for(chat.send_message(user_message), timeout=20.0)
-        
-        response_text = response.strip()
+async def create_mentor_response(mentor, question, requester: dict = None):
+    """Create AI-powered response from a mentor using their personality and expertise"""
+    cache_key = get_cache_key(mentor, question)
+    cached_response = await lookup_cached_mentor_response(mentor, question, cache_key)
+    if cached_response:
+        return cached_response
+    
+    # Concurrent identical questions share a single provider call
+    return await llm_singleflight.do(
+        cache_key, lambda: generate_mentor_response(mentor, question, cache_key, requester)
+    )
+
+async def request_mentor_answer(mentor, question, requester: dict = None) -> str:
+    """One governed provider call for a mentor answer; raises on timeout, open circuit or provider error"""
+    # Create a unique session ID for this mentor-question combination
+    session_id = f"mentor_{mentor['id']}_{hash(question) % 10000}"
+    
+    # Optimized system message - shorter but still personalized (precompiled per mentor)
+    system_message = prompt_registry.get(mentor).answer_prompt
+
+    print(f"🤖 Creating response for {mentor['name']} (concurrent)")
+    
+    async def send_attempt():
+        # Fresh provider call per attempt so a hedged duplicate never shares session state
+        return await llm_backend.complete(system_message, question, session_id)
+    
+    # Wait for a global LLM slot (fair-queued per tenant), then get the AI
+    # response with a timeout derived from this mentor's observed latency,
+    # hedging once if it runs past the usual p90
+    tenant, lane = llm_request_identity(requester)
+    # Time spent queueing for a slot comes out of the endpoint's own timeout
+    deadline = time.monotonic() + ASK_QUESTION_TIMEOUT - ASK_QUESTION_DEADLINE_MARGIN
+    
+    async def governed_call():
+        async with llm_governor.slot(tenant, lane):
+            return await llm_hedger.call(
+                send_attempt, key=llm_backend.latency_key(mentor['id']), default_timeout=20.0,
+                deadline=deadline
+            )
+    
+    # The circuit breaker fails fast while the provider is degraded
+    response = await llm_circuit_breaker.call(governed_call)
+    return response.strip()
+
+async def generate_mentor_response(mentor, question, cache_key: str, requester: dict = None):
+    """Call the LLM for a mentor answer and populate the answer caches, falling back on failure"""
+    try:
+        response_text = await request_mentor_answer(mentor, question, requester)
         
         # Cache the response for future use
-        cache_response(cache_key, response_text)
+        await remember_mentor_response(mentor, question, cache_key, response_text)
         
         print(f"✅ Response ready for {mentor['name']}: {len(response_text)} chars")
         
         return response_text
         
+    except CircuitOpenError:
+        # Answer immediately; not cached so real answers resume once the circuit closes
+        return f"Thank you for your question. Based on my experience in {mentor['expertise']}, this is an important topic that requires thoughtful consideration."
     except asyncio.TimeoutError:
         print(f"⏰ Timeout for {mentor['name']} - using fallback")
         fallback = f"Thank you for your question. Based on my experience in {mentor['expertise']}, this is an important topic. {mentor.get('wiki_description', '')[:200]}..."
@@ -427,6 +570,103 @@ Respond in your authentic voice with 2-3 paragraphs. Use personal experiences an
         cache_response(cache_key, fallback)  # Cache fallback too
         return fallback
 
+# Background pre-generation runs in its own fairness tenant on the standard lane
+PREWARM_REQUESTER = {"user_id": "system:prewarm"}
+
+async def prewarm_mentor_answer(mentor, question):
+    """Regenerate and cache an answer for a popular question, bypassing cache lookups
+    
+    Uses the raw provider call rather than generate_mentor_response: a failure
+    must raise so the prewarmer counts it, and a fallback must never be cached
+    under the real key. It also stays out of the user-facing singleflight, so
+    a failed prewarm is never handed to a user waiting on the same question.
+    """
+    cache_key = get_cache_key(mentor, question)
+    response_text = await request_mentor_answer(mentor, question, PREWARM_REQUESTER)
+    await remember_mentor_response(mentor, question, cache_key, response_text, source=PREWARM_SOURCE)
+    return response_text
+
+async def prewarm_answer_is_fresh(mentor, question) -> bool:
+    return await persistent_answer_cache.is_fresh(get_cache_key(mentor, question), ANSWER_PREWARM_REFRESH_SECONDS)
+
+answer_prewarmer = AnswerPrewarmer(
+    db,
+    resolve_mentor=mentor_catalog.get,
+    is_fresh=prewarm_answer_is_fresh,
+    generate=prewarm_mentor_answer
+)
+
+async def generate_batched_mentor_responses(mentors, question, requester: dict = None) -> dict:
+    """One provider call answering as several mentors; returns mentor id -> parsed answer"""
+    mentor_ids = [mentor['id'] for mentor in mentors]
+    system_message = build_batch_system_message(mentors)
+    session_id = f"batch_{prompt_digest(question, *mentor_ids)[:12]}"
+    
+    print(f"🤖 Creating batched response for {len(mentors)} mentors")
+    
+    async def send_attempt():
+        return await llm_backend.complete(system_message, question, session_id)
+    
+    tenant, lane = llm_request_identity(requester)
+    deadline = time.monotonic() + ASK_QUESTION_TIMEOUT - ASK_QUESTION_DEADLINE_MARGIN
+    
+    async def governed_call():
+        async with llm_governor.slot(tenant, lane):
+            return await llm_hedger.call(
+                send_attempt, key=llm_backend.latency_key(f"batch{len(mentors)}"), default_timeout=30.0,
+                deadline=deadline
+            )
+    
+    response = await llm_circuit_breaker.call(governed_call)
+    answers = parse_batch_response(response, mentor_ids)
+    batch_generation_stats.record(len(mentors), len(answers))
+    return answers
+
+async def create_batched_mentor_responses(mentors, question, requester: dict = None) -> dict:
+    """Answer several mentors with a single LLM call, falling back per mentor; returns mentor id -> answer"""
+    answers = {}
+    uncached = []
+    for mentor in mentors:
+        cache_key = get_cache_key(mentor, question)
+        cached_response = await lookup_cached_mentor_response(mentor, question, cache_key)
+        if cached_response:
+            answers[mentor['id']] = cached_response
+        else:
+            uncached.append((mentor, cache_key))
+    
+    if not uncached:
+        return answers
+    
+    uncached_mentors = [mentor for mentor, _ in uncached]
+    batch_key = "batch:" + prompt_digest(question, *sorted(mentor['id'] for mentor in uncached_mentors))
+    try:
+        parsed = await llm_singleflight.do(
+            batch_key, lambda: generate_batched_mentor_responses(uncached_mentors, question, requester)
+        )
+    except Exception as e:
+        # Provider failure (timeout, open circuit): answer every mentor with the fallback now
+        print(f"❌ Batched generation failed: {str(e)}")
+        for mentor in uncached_mentors:
+            answers[mentor['id']] = mentor_fallback_response(mentor, question)
+        return answers
+    
+    # Mentors missing from (or malformed in) the batched output get their own call
+    unparsed = []
+    for mentor, cache_key in uncached:
+        if mentor['id'] in parsed:
+            answers[mentor['id']] = parsed[mentor['id']]
+            await remember_mentor_response(mentor, question, cache_key, parsed[mentor['id']])
+        else:
+            unparsed.append(mentor)
+    
+    if unparsed:
+        fallbacks = await asyncio.gather(
+            *(create_mentor_response(mentor, question, requester) for mentor in unparsed)
+        )
+        answers.update(zip((mentor['id'] for mentor in unparsed), fallbacks))
+    
+    return answers
+
 # Admin helper functions
 async def log_admin_action(db, admin_id: str, admin_email: str, action: str, target_id: str, details: dict):
     """Log admin action for audit trail"""
@@ -583,20 +823,16 @@ async def get_business_employee_mentors(
                 
                 if not mentor:
                     # Check static mentors data if not in database
-                    for cat_name, cat_mentors in ALL_MENTORS.items():
-                        for ai_mentor in cat_mentors:
-                            if ai_mentor["id"] == assignment["mentor_id"]:
-                                mentor = {
-                                    "mentor_id": ai_mentor["id"],
-                                    "name": ai_mentor["name"],
-                                    "description": ai_mentor.get("bio", ""),
-                                    "expertise": ai_mentor.get("expertise", ""),
-                                    "type": "ai",
-                                    "category": cat_name
-                                }
-                                break
-                        if mentor:
-                            break
+                    record = mentor_catalog.record(assignment["mentor_id"])
+                    if record:
+                        mentor = {
+                            "mentor_id": record.id,
+                            "name": record.name,
+                            "description": record.bio,
+                            "expertise": record.expertise,
+                            "type": "ai",
+                            "category": record.category
+                        }
                 
                 if mentor and (not search_term or 
                               search_term in mentor["name"].lower() or 
@@ -762,7 +998,7 @@ async def register_user_with_profile(
             "email": email,
             "full_name": full_name,
             "phone_number": phone_number,
-            "password_hash": hash_password(password),
+            "password_hash": await hash_password(password),
             "communication_preferences": {
                 "email": comm_prefs.get("email", True),
                 "text": comm_prefs.get("text", False),
@@ -773,8 +1009,6 @@ async def register_user_with_profile(
             "subscription_expires": None,
             "payment_info": payment_data,  # Store encrypted in production
             "questions_asked": 0,
-            "mentor_interactions": [],  # Track all mentor interactions
-            "question_history": [],  # Track all questions asked
             "profile_completed": True,
             "created_at": datetime.utcnow(),
             "last_login": None,
@@ -848,7 +1082,7 @@ async def register_user_with_profile(
             await db.creators.insert_one(mentor_doc)
         
         # Create access token
-        token = create_access_token({"user_id": user_id})
+        token = create_user_access_token(user_doc)
         
         # Return user data (exclude sensitive info)
         user_response = {
@@ -890,6 +1124,7 @@ async def become_mentor(current_user = Depends(get_current_user)):
                 {"user_id": user_id},
                 {"$set": {"is_mentor": True}}
             )
+            principal_cache.invalidate("user", user_id)
             return {
                 "success": True,
                 "message": "You are already a mentor!",
@@ -968,6 +1203,7 @@ async def become_mentor(current_user = Depends(get_current_user)):
             {"user_id": user_id},
             {"$set": {"is_mentor": True}}
         )
+        principal_cache.invalidate("user", user_id)
         
         return {
             "success": True,
@@ -1000,16 +1236,8 @@ async def ask_mentor_question(
             raise HTTPException(status_code=400, detail="Question cannot be empty")
         
         # Find mentor
-        mentor = None
-        mentor_category = None
-        for category, mentors in ALL_MENTORS.items():
-            for m in mentors:
-                if m["id"] == mentor_id:
-                    mentor = m
-                    mentor_category = category
-                    break
-            if mentor:
-                break
+        mentor = mentor_catalog.get(mentor_id)
+        mentor_category = mentor_catalog.category_of(mentor_id)
         
         if not mentor:
             raise HTTPException(status_code=404, detail="Mentor not found")
@@ -1032,26 +1260,12 @@ async def ask_mentor_question(
             "follow_up_questions": []
         }
         
-        # Store in interactions collection
-        await db.mentor_interactions.insert_one(interaction_record)
-        
-        # Update user's question count and history
-        await db.users.update_one(
-            {"user_id": user_id},
-            {
-                "$inc": {"questions_asked": 1},
-                "$push": {
-                    "question_history": {
-                        "interaction_id": interaction_id,
-                        "mentor_id": mentor_id,
-                        "mentor_name": mentor["name"],
-                        "question": question_text,
-                        "timestamp": datetime.utcnow()
-                    },
-                    "mentor_interactions": interaction_id
-                }
-            }
-        )
+        # Interaction record and question count are applied by the outbox drainer;
+        # history is read from mentor_interactions, never stored on the user
+        await write_outbox.enqueue("mentor_question", [
+            outbox_insert("mentor_interactions", "interaction_id", [interaction_record]),
+            outbox_update("users", {"user_id": user_id}, {"$inc": {"questions_asked": 1}})
+        ])
         
         return {
             "interaction_id": interaction_id,
@@ -1071,7 +1285,7 @@ async def ask_mentor_question(
         raise HTTPException(status_code=500, detail=f"Failed to process question: {str(e)}")
 
 @app.get("/api/user/question-history")
-async def get_user_question_history(current_user = Depends(get_current_user)):
+async def get_user_question_history(current_user = Depends(get_current_identity)):
     """Get user's complete question and mentor interaction history"""
     try:
         user_id = current_user["user_id"]
@@ -1107,22 +1321,18 @@ async def get_user_question_history(current_user = Depends(get_current_user)):
         raise HTTPException(status_code=500, detail=f"Failed to retrieve history: {str(e)}")
 
 @app.get("/api/user/profile/complete")
-async def get_complete_user_profile(current_user = Depends(get_current_user)):
+async def get_complete_user_profile(current_user = Depends(get_current_identity)):
     """Get user's complete profile including all data we collect"""
     try:
         user_id = current_user["user_id"]
         
-        # Get user from database with all fields
-        user = await db.users.find_one({"user_id": user_id})
+        user = await db.users.find_one({"user_id": user_id}, LEAN_USER_PROJECTION)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
         # Get interaction statistics
         total_interactions = await db.mentor_interactions.count_documents({"user_id": user_id})
-        unique_mentors = len(set([
-            interaction["mentor_id"] async for interaction in 
-            db.mentor_interactions.find({"user_id": user_id}, {"mentor_id": 1})
-        ]))
+        unique_mentors = len(await db.mentor_interactions.distinct("mentor_id", {"user_id": user_id}))
         
         return {
             "user_id": user["user_id"],
@@ -1158,6 +1368,7 @@ async def update_communication_preferences(
             {"user_id": current_user["user_id"]},
             {"$set": {"communication_preferences": preferences}}
         )
+        principal_cache.invalidate("user", current_user["user_id"])
         
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="User not found")
@@ -1343,7 +1554,7 @@ async def business_employee_signup_test(signup_data: dict):
         user_doc = {
             "user_id": user_id,
             "email": email,
-            "password_hash": hash_password(password),
+            "password_hash": await hash_password(password),
             "full_name": full_name,
             "phone_number": "+12345678901",  # Test phone number
             "profile_completed": True,
@@ -1364,7 +1575,7 @@ async def business_employee_signup_test(signup_data: dict):
         await db.users.insert_one(user_doc)
         
         # Create access token
-        token = create_access_token({"user_id": user_id})
+        token = create_user_access_token(user_doc)
         
         return {
             "token": token,
@@ -1508,7 +1719,7 @@ async def business_employee_signup(signup_data: BusinessEmployeeSignup):
         user_doc = {
             "user_id": user_id,
             "email": signup_data.email,
-            "password_hash": hash_password(signup_data.password),
+            "password_hash": await hash_password(signup_data.password),
             "full_name": signup_data.full_name,
             "phone_number": signup_data.phone_number,
             "profile_completed": True,
@@ -1529,7 +1740,7 @@ async def business_employee_signup(signup_data: BusinessEmployeeSignup):
         await db.users.insert_one(user_doc)
         
         # Create access token
-        token = create_access_token({"user_id": user_id})
+        token = create_user_access_token(user_doc)
         
         return {
             "token": token,
@@ -1563,7 +1774,7 @@ async def signup(user_data: UserSignup):
     user_doc = {
         "user_id": user_id,
         "email": user_data.email,
-        "password_hash": hash_password(user_data.password),
+        "password_hash": await hash_password(user_data.password),
         "full_name": user_data.full_name,
         "profile_completed": True,
         "created_at": datetime.utcnow(),
@@ -1586,7 +1797,7 @@ async def signup(user_data: UserSignup):
     await db.users.insert_one(user_doc)
     
     # Create access token
-    token = create_access_token({"user_id": user_id})
+    token = create_user_access_token(user_doc)
     
     return {
         "token": token,
@@ -1600,10 +1811,15 @@ async def signup(user_data: UserSignup):
     }
 
 @app.post("/api/auth/login")
-async def login(login_data: UserLogin):
+async def login(login_data: UserLogin, request: Request):
+    attempt = await admit_login(request, "user", login_data.email)
+    
     # Find user
     user = await db.users.find_one({"email": login_data.email})
-    if not user or not verify_password(login_data.password, user["password_hash"]):
+    if not user or not await verify_login_password(
+        db.users, {"user_id": user["user_id"]}, login_data.password, user["password_hash"]
+    ):
+        await auth_admission.record_failure(*attempt)
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     # Check if account is suspended
@@ -1621,7 +1837,7 @@ async def login(login_data: UserLogin):
         )
     
     # Create access token
-    token = create_access_token({"user_id": user["user_id"]})
+    token = create_user_access_token(user)
     
     return {
         "token": token,
@@ -1641,13 +1857,19 @@ async def login(login_data: UserLogin):
 
 @app.get("/api/auth/me")
 async def get_me(current_user = Depends(get_current_user)):
+    # The principal may be cached; the counter and subscription change on every
+    # question (quota reservations, outbox increments), so read them fresh
+    counters = await db.users.find_one(
+        {"user_id": current_user["user_id"]},
+        {"_id": 0, "questions_asked": 1, "is_subscribed": 1}
+    ) or {}
     return {
         "user": {
             "user_id": current_user["user_id"],
             "email": current_user["email"],
             "full_name": current_user["full_name"],
-            "questions_asked": current_user.get("questions_asked", 0),
-            "is_subscribed": current_user.get("is_subscribed", False)
+            "questions_asked": counters.get("questions_asked", 0),
+            "is_subscribed": counters.get("is_subscribed", False)
         }
     }
 
@@ -1722,7 +1944,7 @@ async def google_oauth_login(auth_request: SocialAuthRequest):
             is_new_user = True
         
         # Create access token for our system
-        access_token = create_access_token({"user_id": user_doc["user_id"]})
+        access_token = create_user_access_token(user_doc)
         
         return SocialAuthResponse(
             user_id=user_doc["user_id"],
@@ -1815,7 +2037,7 @@ async def facebook_oauth_login(auth_request: SocialAuthRequest):
             is_new_user = True
         
         # Create access token for our system
-        access_token = create_access_token({"user_id": user_doc["user_id"]})
+        access_token = create_user_access_token(user_doc)
         
         return SocialAuthResponse(
             user_id=user_doc["user_id"],
@@ -1969,7 +2191,7 @@ async def reset_password(request: ResetPasswordRequest):
             raise HTTPException(status_code=404, detail="User not found")
         
         # Hash new password
-        new_password_hash = hash_password(request.new_password)
+        new_password_hash = await hash_password(request.new_password)
         
         # Update password in database
         if request.user_type == "mentor":
@@ -1986,6 +2208,7 @@ async def reset_password(request: ResetPasswordRequest):
                     }
                 }
             )
+            principal_cache.invalidate("creator", user_doc["creator_id"])
         else:
             await collection.update_one(
                 {"email": token_doc["email"]},
@@ -2000,6 +2223,8 @@ async def reset_password(request: ResetPasswordRequest):
                     }
                 }
             )
+            principal_cache.invalidate("user", user_doc["user_id"])
+            await token_revocations.revoke(user_doc["user_id"], "password_reset")
         
         # Mark token as used
         await mark_token_as_used(db, request.token)
@@ -2034,10 +2259,10 @@ async def reset_password(request: ResetPasswordRequest):
 # ================================
 
 @app.get("/api/user/profile")
-async def get_user_profile(current_user = Depends(get_current_user)):
+async def get_user_profile(current_user = Depends(get_current_identity)):
     """Get current user's profile information"""
     try:
-        user_doc = await db.users.find_one({"user_id": current_user["user_id"]})
+        user_doc = await db.users.find_one({"user_id": current_user["user_id"]}, LEAN_USER_PROJECTION)
         
         if not user_doc:
             raise HTTPException(status_code=404, detail="User not found")
@@ -2114,12 +2339,13 @@ async def update_user_profile(profile_update: UserProfileUpdate, current_user =
             {"user_id": current_user["user_id"]},
             {"$set": update_data}
         )
+        principal_cache.invalidate("user", current_user["user_id"])
         
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="User not found")
         
         # Get updated profile
-        updated_user = await db.users.find_one({"user_id": current_user["user_id"]})
+        updated_user = await db.users.find_one({"user_id": current_user["user_id"]}, LEAN_USER_PROJECTION)
         
         # Return updated profile data
         profile_data = {
@@ -2164,11 +2390,11 @@ async def change_user_password(password_request: PasswordChangeRequest, current_
             )
         
         # Verify current password
-        if not verify_password(password_request.current_password, user_doc["password_hash"]):
+        if not await verify_password(password_request.current_password, user_doc["password_hash"]):
             raise HTTPException(status_code=400, detail="Current password is incorrect")
         
         # Hash new password
-        new_password_hash = hash_password(password_request.new_password)
+        new_password_hash = await hash_password(password_request.new_password)
         
         # Update password in database
         result = await db.users.update_one(
@@ -2181,10 +2407,14 @@ async def change_user_password(password_request: PasswordChangeRequest, current_
                 }
             }
         )
+        principal_cache.invalidate("user", current_user["user_id"])
         
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="User not found")
         
+        # Tokens issued before the change, including any stolen ones, stop working
+        await token_revocations.revoke(current_user["user_id"], "password_changed")
+        
         # Optional: Send email notification about password change
         try:
             user_name = user_doc.get("full_name", "User")
@@ -2327,131 +2557,159 @@ async def send_password_reset_confirmation_email(email: str, user_name: str, use
         print(f"❌ Confirmation email error: {str(e)}")
         # Don't raise exception - this is not critical
 
-@app.post("/api/questions/ask")
-async def ask_question(question_data: QuestionRequest, current_user = Depends(get_current_user)):
-    start_time = time.time()  # Track performance
-    
-    # Check if user can ask questions
-    questions_asked = current_user.get("questions_asked", 0)
-    is_subscribed = current_user.get("is_subscribed", False)
+FREE_QUESTION_LIMIT = 10
+ASK_QUESTION_TIMEOUT = 35.0
+# Provider calls give up this much before the endpoint does, so they fail inside it
+ASK_QUESTION_DEADLINE_MARGIN = 1.0
+
+# Free-tier allowance: users.questions_asked is incremented when a slot is reserved
+question_quota = CounterQuota(
+    db.users, key_field="user_id", counter_field="questions_asked",
+    limit=FREE_QUESTION_LIMIT, exempt_field="is_subscribed"
+)
+
+async def reserve_question_slot(current_user: dict) -> QuotaReservation:
+    """Atomically take one question from the user's allowance; 402 when it is used up
     
-    if not is_subscribed and questions_asked >= 10:
+    reservation.remaining is the number of free questions left (None for subscribers).
+    Callers release the reservation if the question fails.
+    """
+    try:
+        return await question_quota.reserve(current_user["user_id"])
+    except QuotaExceededError:
         raise HTTPException(
             status_code=402, 
             detail=f"You've reached your free question limit. Please subscribe to continue asking questions to any of our {TOTAL_MENTORS} mentors."
         )
+
+def resolve_question_mentors(question_data: QuestionRequest) -> list:
+    """Validate the mentor selection for a question and return the mentor dicts"""
+    # Enforce 5-mentor limit for performance and quality
+    if len(question_data.mentor_ids) > 5:
+        raise HTTPException(
+            status_code=400, 
+            detail="You can select a maximum of 5 mentors per question for optimal response time and quality."
+        )
+    
+    # Validate mentors exist
+    selected_mentors = []
+    for mentor_id in question_data.mentor_ids:
+        mentor = mentor_catalog.get_in_category(question_data.category, mentor_id)
+        if not mentor:
+            raise HTTPException(status_code=404, detail=f"Mentor {mentor_id} not found")
+        selected_mentors.append(mentor)
+    return selected_mentors
+
+def mentor_fallback_response(mentor: dict, question: str) -> str:
+    """Answer shown when a mentor's response times out or fails"""
+    return f"Thank you for your question about '{question}'. Based on my experience in {mentor['expertise']}, I believe this is an important topic that requires thoughtful consideration. While I'd love to provide a detailed response right now, I encourage you to explore this further and perhaps rephrase your question for the best guidance."
+
+async def save_question_answers(question_data: QuestionRequest, current_user: dict,
+                                selected_mentors: list, responses: list, processing_time: float) -> dict:
+    """Persist a question, its per-mentor interactions and the user's history"""
+    question_doc = {
+        "question_id": str(uuid.uuid4()),
+        "user_id": current_user["user_id"],
+        "category": question_data.category,
+        "mentor_ids": question_data.mentor_ids,
+        "question": question_data.question,
+        "responses": responses,
+        "processing_time": processing_time,  # Track performance
+        "created_at": datetime.utcnow(),
+        # Business tracking fields
+        "company_id": current_user.get("company_id"),
+        "department_code": getattr(question_data, 'department_code', None) or current_user.get("department_code"),
+        "business_cost": 0.0  # Will be calculated based on mentor usage
+    }
+    
+    # Create individual mentor interaction records for detailed tracking
+    interaction_records = []
+    for mentor, response_data in zip(selected_mentors, responses):
+        interaction_records.append({
+            "interaction_id": str(uuid.uuid4()),
+            "user_id": current_user["user_id"],
+            "question_id": question_doc["question_id"],
+            "mentor_id": mentor["id"],
+            "mentor_name": mentor["name"],
+            "mentor_category": question_data.category,
+            "question": question_data.question,
+            "response": response_data["response"],
+            "timestamp": datetime.utcnow()
+        })
+    
+    # The question is written now; interactions go through the outbox. The
+    # question count was taken by the quota reservation, so the user is untouched.
+    await question_writer.write(question_doc, [
+        outbox_insert("mentor_interactions", "interaction_id", interaction_records)
+    ])
+    
+    return question_doc
+
+@app.post("/api/questions/ask")
+async def ask_question(question_data: QuestionRequest, current_user = Depends(get_current_user)):
+    start_time = time.time()  # Track performance
+    
+    # Reserve a question slot up front; it is given back if the question fails
+    reservation = await reserve_question_slot(current_user)
     
     try:
-        # Enforce 5-mentor limit for performance and quality
-        if len(question_data.mentor_ids) > 5:
-            raise HTTPException(
-                status_code=400, 
-                detail="You can select a maximum of 5 mentors per question for optimal response time and quality."
-            )
-        
-        # Validate mentors exist
-        selected_mentors = []
-        for mentor_id in question_data.mentor_ids:
-            mentor = next((m for m in ALL_MENTORS[question_data.category] if m["id"] == mentor_id), None)
-            if not mentor:
-                raise HTTPException(status_code=404, detail=f"Mentor {mentor_id} not found")
-            selected_mentors.append(mentor)
+        selected_mentors = resolve_question_mentors(question_data)
         
-        print(f"🚀 Starting parallel processing for {len(selected_mentors)} mentors")
+        generation_mode = "batched" if should_batch(question_data.batch_mode, len(selected_mentors)) else "per_mentor"
+        print(f"🚀 Starting {generation_mode} processing for {len(selected_mentors)} mentors")
         
         # Create responses from all selected mentors CONCURRENTLY for speed
         import asyncio
         
         # Create tasks for all mentors to run in parallel
         mentor_tasks = []
-        for mentor in selected_mentors:
-            task = asyncio.create_task(create_mentor_response(mentor, question_data.question))
-            mentor_tasks.append((mentor, task))
+        if generation_mode == "batched":
+            # One shared call answers every mentor; each mentor awaits its share
+            batch_task = asyncio.create_task(
+                create_batched_mentor_responses(selected_mentors, question_data.question, current_user)
+            )
+            
+            async def batched_answer(mentor_id):
+                # Shielded so one mentor timing out does not cancel the shared call
+                return (await asyncio.shield(batch_task))[mentor_id]
+            
+            for mentor in selected_mentors:
+                mentor_tasks.append((mentor, asyncio.create_task(batched_answer(mentor["id"]))))
+        else:
+            for mentor in selected_mentors:
+                task = asyncio.create_task(create_mentor_response(mentor, question_data.question, current_user))
+                mentor_tasks.append((mentor, task))
         
         # Wait for all mentors to respond simultaneously
         responses = []
         for mentor, task in mentor_tasks:
             try:
                 # Wait for this mentor's response (with timeout)
-                response_text = await asyncio.wait_for(task, timeout=35.0)
+                response_text = await asyncio.wait_for(task, timeout=ASK_QUESTION_TIMEOUT)
                 responses.append({
                     "mentor": mentor,
                     "response": response_text
                 })
             except asyncio.TimeoutError:
                 # Fallback response for timeout
-                fallback_response = f"Thank you for your question about '{question_data.question}'. Based on my experience in {mentor['expertise']}, I believe this is an important topic that requires thoughtful consideration. While I'd love to provide a detailed response right now, I encourage you to explore this further and perhaps rephrase your question for the best guidance."
                 responses.append({
                     "mentor": mentor,
-                    "response": fallback_response
+                    "response": mentor_fallback_response(mentor, question_data.question)
                 })
             except Exception as e:
                 print(f"❌ Error getting response from {mentor['name']}: {str(e)}")
                 # Fallback response for errors
-                fallback_response = f"Thank you for your question about '{question_data.question}'. Based on my experience in {mentor['expertise']}, I believe this is an important topic that requires thoughtful consideration. While I'd love to provide a detailed response right now, I encourage you to explore this further and perhaps rephrase your question for the best guidance."
                 responses.append({
                     "mentor": mentor,
-                    "response": fallback_response
+                    "response": mentor_fallback_response(mentor, question_data.question)
                 })
         
         processing_time = time.time() - start_time
         print(f"⚡ Total processing time: {processing_time:.2f}s for {len(selected_mentors)} mentors")
         
         # Save question and responses
-        question_doc = {
-            "question_id": str(uuid.uuid4()),
-            "user_id": current_user["user_id"],
-            "category": question_data.category,
-            "mentor_ids": question_data.mentor_ids,
-            "question": question_data.question,
-            "responses": responses,
-            "processing_time": processing_time,  # Track performance
-            "created_at": datetime.utcnow(),
-            # Business tracking fields
-            "company_id": current_user.get("company_id"),
-            "department_code": getattr(question_data, 'department_code', None) or current_user.get("department_code"),
-            "business_cost": 0.0  # Will be calculated based on mentor usage
-        }
-        
-        await db.questions.insert_one(question_doc)
-        
-        # Update user question count and add comprehensive tracking
-        question_summary = {
-            "question_id": question_doc["question_id"],
-            "question": question_data.question,
-            "category": question_data.category,
-            "mentor_count": len(selected_mentors),
-            "mentor_names": [m["name"] for m in selected_mentors],
-            "timestamp": datetime.utcnow()
-        }
-        
-        # Create individual mentor interaction records for detailed tracking
-        mentor_interaction_ids = []
-        for mentor, response_data in zip(selected_mentors, responses):
-            interaction_id = str(uuid.uuid4())
-            interaction_record = {
-                "interaction_id": interaction_id,
-                "user_id": current_user["user_id"],
-                "question_id": question_doc["question_id"],
-                "mentor_id": mentor["id"],
-                "mentor_name": mentor["name"],
-                "mentor_category": question_data.category,
-                "question": question_data.question,
-                "response": response_data["response"],
-                "timestamp": datetime.utcnow()
-            }
-            await db.mentor_interactions.insert_one(interaction_record)
-            mentor_interaction_ids.append(interaction_id)
-
-        await db.users.update_one(
-            {"user_id": current_user["user_id"]},
-            {
-                "$inc": {"questions_asked": 1},
-                "$push": {
-                    "question_history": question_summary,
-                    "mentor_interactions": {"$each": mentor_interaction_ids}
-                }
-            }
+        question_doc = await save_question_answers(
+            question_data, current_user, selected_mentors, responses, processing_time
         )
         
         return {
@@ -2460,17 +2718,105 @@ async def ask_question(question_data: QuestionRequest, current_user = Depends(ge
             "responses": responses,
             "selected_mentors": selected_mentors,
             "processing_time": f"{processing_time:.2f}s",  # Include performance info
+            "generation_mode": generation_mode,
             "total_mentors": len(selected_mentors),
-            "questions_remaining": max(0, 10 - (questions_asked + 1)) if not is_subscribed else None
+            "questions_remaining": reservation.remaining
         }
         
     except Exception as e:
+        await question_quota.release(reservation)
         if isinstance(e, HTTPException):
             raise e
         raise HTTPException(status_code=500, detail=f"Failed to process question: {str(e)}")
 
+def format_sse_event(event: str, data: dict) -> str:
+    """Encode one Server-Sent Events frame"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.post("/api/questions/ask/stream")
+async def ask_question_stream(question_data: QuestionRequest, current_user = Depends(get_current_user)):
+    """Streaming variant of /api/questions/ask: emits each mentor's answer as soon as it is ready"""
+    start_time = time.time()
+    
+    # Validate before the stream starts so errors still surface as HTTP status codes
+    selected_mentors = resolve_question_mentors(question_data)
+    reservation = await reserve_question_slot(current_user)
+    
+    async def event_stream():
+        tasks = {
+            asyncio.create_task(create_mentor_response(mentor, question_data.question, current_user)): index
+            for index, mentor in enumerate(selected_mentors)
+        }
+        responses = [None] * len(selected_mentors)
+        pending = set(tasks)
+        deadline = start_time + ASK_QUESTION_TIMEOUT
+        saved = False
+        
+        try:
+            # Completion-order iteration: the fastest mentor is sent first
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=max(0.0, deadline - time.time()),
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    break
+                
+                for task in done:
+                    index = tasks[task]
+                    mentor = selected_mentors[index]
+                    try:
+                        response_text = task.result()
+                    except Exception as e:
+                        print(f"❌ Error getting response from {mentor['name']}: {str(e)}")
+                        response_text = mentor_fallback_response(mentor, question_data.question)
+                    
+                    responses[index] = {"mentor": mentor, "response": response_text}
+                    yield format_sse_event("mentor_response", {"index": index, **responses[index]})
+            
+            # Mentors still running at the deadline get the timeout fallback
+            for task in pending:
+                task.cancel()
+                index = tasks[task]
+                mentor = selected_mentors[index]
+                responses[index] = {
+                    "mentor": mentor,
+                    "response": mentor_fallback_response(mentor, question_data.question)
+                }
+                yield format_sse_event("mentor_response", {"index": index, **responses[index]})
+            
+            processing_time = time.time() - start_time
+            question_doc = await save_question_answers(
+                question_data, current_user, selected_mentors, responses, processing_time
+            )
+            saved = True
+            
+            yield format_sse_event("complete", {
+                "question_id": question_doc["question_id"],
+                "processing_time": f"{processing_time:.2f}s",
+                "total_mentors": len(selected_mentors),
+                "questions_remaining": reservation.remaining
+            })
+        except Exception as e:
+            yield format_sse_event("error", {"detail": f"Failed to process question: {str(e)}"})
+        finally:
+            # Client disconnected or stream failed: stop outstanding LLM work
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            # An unsaved question does not count against the allowance
+            if not saved:
+                await question_quota.release(reservation)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/api/questions/history")
-async def get_question_history(current_user = Depends(get_current_user)):
+async def get_question_history(current_user = Depends(get_current_identity)):
     questions = await db.questions.find(
         {"user_id": current_user["user_id"]},
         {"_id": 0}
@@ -2493,30 +2839,18 @@ async def ask_contextual_question(
     current_user = Depends(get_current_user)
 ):
     """Enhanced question asking with conversation context and thread management"""
+    # Reserve a question slot up front; it is given back if the question fails
+    reservation = await reserve_question_slot(current_user)
     try:
-        # Check if user can ask questions
-        questions_asked = current_user.get("questions_asked", 0)
-        is_subscribed = current_user.get("is_subscribed", False)
-        
-        if not is_subscribed and questions_asked >= 10:
-            raise HTTPException(
-                status_code=402, 
-                detail=f"You've reached your free question limit. Please subscribe to continue asking questions to any of our {TOTAL_MENTORS} mentors."
-            )
-        
         # Validate mentors exist
         selected_mentors = []
         for mentor_id in question_data.mentor_ids:
-            mentor = next((m for m in ALL_MENTORS[question_data.category] if m["id"] == mentor_id), None)
+            mentor = mentor_catalog.get_in_category(question_data.category, mentor_id)
             if not mentor:
                 raise HTTPException(status_code=404, detail=f"Mentor {mentor_id} not found")
             selected_mentors.append(mentor)
         
-        # Process contextual responses
-        contextual_responses = []
-        thread_ids = []
-        
-        for mentor in selected_mentors:
+        async def process_mentor(mentor):
             # Create individual thread per mentor if not specified
             mentor_question_data = ContextualQuestionRequest(
                 category=question_data.category,
@@ -2526,13 +2860,28 @@ async def ask_contextual_question(
                 include_history=question_data.include_history
             )
             
-            response_data = await EnhancedQuestionProcessor.process_contextual_question(
-                db, mentor_question_data, current_user, mentor
-            )
-            
-            contextual_responses.append(response_data)
-            thread_ids.append(response_data["thread_id"])
+            try:
+                return await EnhancedQuestionProcessor.process_contextual_question(
+                    db, mentor_question_data, current_user, mentor
+                )
+            except Exception as e:
+                # One mentor failing must not fail the others
+                print(f"❌ Error processing contextual question for {mentor['name']}: {str(e)}")
+                return {
+                    "thread_id": mentor_question_data.thread_id,
+                    "mentor": mentor,
+                    "response": mentor_fallback_response(mentor, question_data.question),
+                    "context_enabled": question_data.include_history
+                }
+        
+        # Process contextual responses for all mentors CONCURRENTLY; provider
+        # calls still go through the global LLM governor
+        contextual_responses = await asyncio.gather(
+            *(process_mentor(mentor) for mentor in selected_mentors)
+        )
+        thread_ids = [r["thread_id"] for r in contextual_responses if r["thread_id"]]
         
+        # Written once, after every mentor has answered
         # Also save to traditional questions collection for backward compatibility
         question_doc = {
             "question_id": str(uuid.uuid4()),
@@ -2553,12 +2902,6 @@ async def ask_contextual_question(
         
         await db.questions.insert_one(question_doc)
         
-        # Update user question count
-        await db.users.update_one(
-            {"user_id": current_user["user_id"]},
-            {"$inc": {"questions_asked": 1}}
-        )
-        
         return {
             "question_id": question_doc["question_id"],
             "question": question_data.question,
@@ -2566,17 +2909,19 @@ async def ask_contextual_question(
             "thread_ids": thread_ids,
             "context_enabled": question_data.include_history,
             "selected_mentors": selected_mentors,
-            "questions_remaining": max(0, 10 - (questions_asked + 1)) if not is_subscribed else None
+            "questions_remaining": reservation.remaining
         }
         
     except HTTPException:
+        await question_quota.release(reservation)
         raise
     except Exception as e:
+        await question_quota.release(reservation)
         raise HTTPException(status_code=500, detail=f"Failed to process contextual question: {str(e)}")
 
 @app.get("/api/conversations/threads")
 async def get_conversation_threads(
-    current_user = Depends(get_current_user),
+    current_user = Depends(get_current_identity),
     mentor_id: Optional[str] = None,
     limit: int = 20
 ):
@@ -2598,7 +2943,7 @@ async def get_conversation_threads(
 @app.get("/api/conversations/threads/{thread_id}")
 async def get_conversation_thread(
     thread_id: str,
-    current_user = Depends(get_current_user),
+    current_user = Depends(get_current_identity),
     limit: int = 50
 ):
     """Get full conversation thread with messages"""
@@ -2615,9 +2960,10 @@ async def get_conversation_thread(
         # Get conversation messages
         messages = await EnhancedContext.get_conversation_history(db, thread_id, limit)
         
-        # Remove MongoDB _id fields
+        # Remove MongoDB _id fields and the internal context window
         if "_id" in thread:
             del thread["_id"]
+        thread.pop("recent_messages", None)
         for msg in messages:
             if "_id" in msg:
                 del msg["_id"]
@@ -2652,7 +2998,7 @@ async def continue_conversation(
         
         # Find the mentor for this thread
         mentor_id = thread["mentor_id"]
-        mentor = next((m for mentors in ALL_MENTORS.values() for m in mentors if m["id"] == mentor_id), None)
+        mentor = mentor_catalog.get(mentor_id)
         
         if not mentor:
             raise HTTPException(status_code=404, detail="Mentor not found")
@@ -2666,23 +3012,24 @@ async def continue_conversation(
             include_history=True
         )
         
-        # Process the contextual question
-        response_data = await EnhancedQuestionProcessor.process_contextual_question(
-            db, contextual_request, current_user, mentor
-        )
-        
-        # Update user question count
-        await db.users.update_one(
-            {"user_id": current_user["user_id"]},
-            {"$inc": {"questions_asked": 1}}
-        )
+        # Reserve a question slot (counts the question); given back if processing fails
+        reservation = await reserve_question_slot(current_user)
+        try:
+            # Process the contextual question
+            response_data = await EnhancedQuestionProcessor.process_contextual_question(
+                db, contextual_request, current_user, mentor
+            )
+        except Exception:
+            await question_quota.release(reservation)
+            raise
         
         return {
             "thread_id": thread_id,
             "question": question_data.get("question"),
             "mentor": mentor,
             "response": response_data["response"],
-            "context_enabled": True
+            "context_enabled": True,
+            "questions_remaining": reservation.remaining
         }
         
     except HTTPException:
@@ -2690,8 +3037,109 @@ async def continue_conversation(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to continue conversation: {str(e)}")
 
+@app.websocket("/api/conversations/threads/{thread_id}/ws")
+async def conversation_socket(websocket: WebSocket, thread_id: str):
+    """Conversation thread over a WebSocket
+    
+    Authenticates on connect (token query parameter) and re-checks the token
+    before every question, so a revoked or deleted account loses the socket
+    on its next message. Keeps the mentor and context
+    window in memory for the life of the socket, sends each answer back as
+    soon as it is ready and persists turns in the background.
+    
+    Client sends {"question": "..."}; server replies with "complete" carrying
+    the full response, or "error". The provider client only returns whole
+    completions, so there are no partial-token events.
+    """
+    token = websocket.query_params.get("token", "")
+    try:
+        current_user = await authenticate_user_token(token)
+        thread = await db.conversation_threads.find_one(
+            {"thread_id": thread_id, "user_id": current_user["user_id"]},
+            {"_id": 0, "mentor_id": 1}
+        )
+        if not thread:
+            raise HTTPException(status_code=404, detail="Conversation thread not found")
+        mentor = mentor_catalog.get(thread["mentor_id"])
+        if not mentor:
+            raise HTTPException(status_code=404, detail="Mentor not found")
+        window = await EnhancedContext.get_context_window(db, thread_id)
+    except HTTPException as e:
+        # Accept first: closing during the handshake reaches the client as a
+        # plain HTTP 403. 4000 + HTTP status, e.g. 4401 for a bad token
+        await websocket.accept()
+        await websocket.close(code=4000 + e.status_code)
+        return
+    
+    await websocket.accept()
+    session = ConversationSession(
+        thread_id, current_user, mentor, list(window["recent"]), list(window["summary"]),
+        close=lambda code: websocket.close(code=code)
+    )
+    await conversation_sessions.register(session)
+    await websocket.send_json({"type": "ready", "thread_id": thread_id, "mentor_id": mentor["id"]})
+    
+    try:
+        while True:
+            message = await websocket.receive_json()
+            question = (message.get("question") or "").strip()
+            if not question:
+                await websocket.send_json({"type": "error", "detail": "Question cannot be empty"})
+                continue
+            try:
+                # Principal cache and revocation table: no database read in the common case
+                session.user = await authenticate_user_token(token)
+            except HTTPException as e:
+                await websocket.send_json({"type": "error", "status": e.status_code, "detail": e.detail})
+                await websocket.close(code=4000 + e.status_code)
+                break
+            try:
+                reservation = await reserve_question_slot(session.user)
+            except HTTPException as e:
+                await websocket.send_json({"type": "error", "status": e.status_code, "detail": e.detail})
+                continue
+            
+            try:
+                prompt = EnhancedContext.render_contextual_prompt(mentor, question, session.recent, session.summary)
+                response_text = await EnhancedQuestionProcessor.generate_contextual_response(
+                    mentor, question, prompt, thread_id, requester=session.user
+                )
+            except BaseException:
+                await question_quota.release(reservation)
+                raise
+            
+            session.turns += 1
+            await websocket.send_json({
+                "type": "complete",
+                "thread_id": thread_id,
+                "response": response_text,
+                "questions_remaining": reservation.remaining
+            })
+            
+            context_summary, summary_entry = await EnhancedContext.summarize_exchange(question, response_text)
+            EnhancedContext.advance_window(session.recent, session.summary, question, response_text, summary_entry)
+            await conversation_sessions.touch(session)
+            
+            async def persist_turn(question=question, response_text=response_text,
+                                   context_summary=context_summary, summary_entry=summary_entry):
+                await EnhancedContext.add_message_to_thread(
+                    db, thread_id, current_user["user_id"], mentor["id"], "question", question
+                )
+                await EnhancedContext.add_message_to_thread(
+                    db, thread_id, current_user["user_id"], mentor["id"],
+                    "response", response_text, context_summary, summary_entry=summary_entry
+                )
+            
+            session.persist(persist_turn)
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"❌ Conversation socket error for {thread_id}: {str(e)}")
+    finally:
+        await conversation_sessions.unregister(session)
+
 @app.get("/api/conversations/analytics")
-async def get_conversation_analytics(current_user = Depends(get_current_user)):
+async def get_conversation_analytics(current_user = Depends(get_current_identity)):
     """Get user's conversation analytics and context usage statistics"""
     try:
         # Get basic conversation stats
@@ -2717,7 +3165,7 @@ async def get_conversation_analytics(current_user = Depends(get_current_user)):
 @app.post("/api/conversations/threads/{thread_id}/archive")
 async def archive_conversation_thread(
     thread_id: str,
-    current_user = Depends(get_current_user)
+    current_user = Depends(get_current_identity)
 ):
     """Archive a conversation thread"""
     try:
@@ -2809,7 +3257,7 @@ async def get_context_system_explanation():
         "technical_implementation": {
             "database_structure": {
                 "conversation_threads": "Stores conversation metadata and thread information",
-                "conversation_messages": "Individual messages within threads with context summaries",
+                "conversation_message_buckets": "Thread messages with context summaries, stored in fixed-size buckets",
                 "enhanced_prompts": "Context-aware system prompts for mentors"
             },
             "api_endpoints": {
@@ -3065,6 +3513,7 @@ async def handle_business_payment_success(transaction):
                     }
                 }
             )
+            principal_cache.invalidate_where("user", "email", transaction["contact_email"])
         
         return {"success": True, "company_id": company_id}
         
@@ -3155,6 +3604,7 @@ async def get_payment_status(session_id: str, current_user = Depends(get_current
                 }
             }
         )
+        principal_cache.invalidate("user", current_user["user_id"])
     
     return {
         "status": status_response.status,
@@ -3201,6 +3651,7 @@ async def stripe_webhook(request: Request):
                             }
                         }
                     )
+                    principal_cache.invalidate("user", user_id)
         
         return {"status": "success"}
     except Exception as e:
@@ -3460,6 +3911,7 @@ async def invite_employee(company_id: str, employee: EmployeeInvite, current_use
                     }
                 }
             )
+            principal_cache.invalidate_where("user", "email", employee.email)
             message = f"Existing user {employee.email} added to company"
         else:
             # Create invitation record
@@ -3822,20 +4274,16 @@ async def get_business_portal_data(company_slug: str):
             
             if assignment["mentor_type"] == "ai":
                 # Get AI mentor from static data
-                for cat_name, cat_mentors in ALL_MENTORS.items():
-                    for ai_mentor in cat_mentors:
-                        if ai_mentor["id"] == assignment["mentor_id"]:
-                            mentor = {
-                                "mentor_id": ai_mentor["id"],
-                                "name": ai_mentor["name"],
-                                "description": ai_mentor.get("bio", ""),
-                                "expertise": ai_mentor.get("expertise", ""),
-                                "type": "ai",
-                                "category": cat_name
-                            }
-                            break
-                    if mentor:
-                        break
+                record = mentor_catalog.record(assignment["mentor_id"])
+                if record:
+                    mentor = {
+                        "mentor_id": record.id,
+                        "name": record.name,
+                        "description": record.bio,
+                        "expertise": record.expertise,
+                        "type": "ai",
+                        "category": record.category
+                    }
             
             elif assignment["mentor_type"] == "human":
                 # Get human mentor (business employee who is also a mentor)
@@ -4253,7 +4701,7 @@ async def creator_signup(creator_data: CreatorSignupRequest):
             "creator_id": creator_id,
             "user_id": None,  # Will be set if upgrading from user
             "email": creator_data.email,
-            "password_hash": hash_password(creator_data.password),
+            "password_hash": await hash_password(creator_data.password),
             "full_name": creator_data.full_name,
             "account_name": creator_data.account_name,
             "description": creator_data.description,
@@ -4319,11 +4767,16 @@ class CreatorLoginRequest(BaseModel):
     password: str
 
 @app.post("/api/creators/login")
-async def creator_login(login_data: CreatorLoginRequest):
+async def creator_login(login_data: CreatorLoginRequest, request: Request):
     """Creator login"""
     try:
+        attempt = await admit_login(request, "creator", login_data.email)
+        
         creator = await db.creators.find_one({"email": login_data.email})
-        if not creator or not verify_password(login_data.password, creator["password_hash"]):
+        if not creator or not await verify_login_password(
+            db.creators, {"creator_id": creator["creator_id"]}, login_data.password, creator["password_hash"]
+        ):
+            await auth_admission.record_failure(*attempt)
             raise HTTPException(status_code=401, detail="Invalid credentials")
         
         # Update last active
@@ -4365,7 +4818,9 @@ async def upgrade_user_to_mentor(creator_data: CreatorSignupRequest, current_use
             "creator_id": creator_id,
             "user_id": current_user["user_id"],
             "email": current_user["email"],
-            "password_hash": current_user["password_hash"],
+            "password_hash": (await db.users.find_one(
+                {"user_id": current_user["user_id"]}, {"_id": 0, "password_hash": 1}
+            ))["password_hash"],
             "full_name": creator_data.full_name,
             "account_name": creator_data.account_name,
             "description": creator_data.description,
@@ -4477,6 +4932,7 @@ async def submit_banking_info(creator_id: str, banking_data: BankingInfoRequest)
                     {"creator_id": creator_id},
                     {"$set": {"status": CreatorStatus.APPROVED}}
                 )
+                principal_cache.invalidate("creator", creator_id)
             
             return {"message": "Banking information submitted and verified successfully", "verified": True}
         else:
@@ -4533,6 +4989,7 @@ async def upload_id_verification(creator_id: str, id_document: UploadFile = File
                 {"creator_id": creator_id},
                 {"$set": {"status": CreatorStatus.APPROVED}}
             )
+            principal_cache.invalidate("creator", creator_id)
         
         return {"message": "ID document uploaded and verified successfully"}
         
@@ -5464,7 +5921,7 @@ async def create_initial_admin():
         existing_admin = await admin_db.admins.find_one({"email": INITIAL_SUPER_ADMIN["email"]})
         if not existing_admin:
             print("🔧 Creating initial super admin account...")
-            admin_doc = create_initial_super_admin_doc(hash_password(INITIAL_SUPER_ADMIN["password"]))
+            admin_doc = create_initial_super_admin_doc(await hash_password(INITIAL_SUPER_ADMIN["password"]))
             await admin_db.admins.insert_one(admin_doc)
             print(f"✅ Initial super admin created: {INITIAL_SUPER_ADMIN['email']}")
             print(f"🔑 Password: {INITIAL_SUPER_ADMIN['password']}")
@@ -5473,11 +5930,16 @@ async def create_initial_admin():
         print(f"❌ Error creating initial admin: {str(e)}")
 
 @app.post("/api/admin/login")
-async def admin_login(login_data: AdminLoginRequest):
+async def admin_login(login_data: AdminLoginRequest, request: Request):
     """Admin login endpoint"""
     try:
+        attempt = await admit_login(request, "admin", login_data.email)
+        
         admin = await admin_db.admins.find_one({"email": login_data.email})
-        if not admin or not verify_password(login_data.password, admin["password_hash"]):
+        if not admin or not await verify_login_password(
+            admin_db.admins, {"admin_id": admin["admin_id"]}, login_data.password, admin["password_hash"]
+        ):
+            await auth_admission.record_failure(*attempt)
             raise HTTPException(status_code=401, detail="Invalid admin credentials")
         
         if admin["status"] != AdminStatus.ACTIVE:
@@ -5609,6 +6071,8 @@ async def manage_business_users(
                 if action == "delete":
                     # Delete user
                     result = await db.users.delete_one({"user_id": user_id})
+                    principal_cache.invalidate("user", user_id)
+                    await token_revocations.revoke(user_id, "deleted")
                     if result.deleted_count > 0:
                         results.append({"user_id": user_id, "status": "deleted"})
                     else:
@@ -5627,6 +6091,8 @@ async def manage_business_users(
                             }
                         }
                     )
+                    principal_cache.invalidate("user", user_id)
+                    await token_revocations.revoke(user_id, "suspended")
                     if result.modified_count > 0:
                         results.append({"user_id": user_id, "status": "suspended"})
                     else:
@@ -5647,6 +6113,7 @@ async def manage_business_users(
                             }
                         }
                     )
+                    principal_cache.invalidate("user", user_id)
                     if result.modified_count > 0:
                         results.append({"user_id": user_id, "status": "activated"})
                     else:
@@ -5692,13 +6159,15 @@ async def reset_business_user_password(
             {"user_id": user_id},
             {
                 "$set": {
-                    "password_hash": hash_password(temp_password),
+                    "password_hash": await hash_password(temp_password),
                     "requires_password_reset": True,
                     "password_reset_at": datetime.utcnow(),
                     "updated_at": datetime.utcnow()
                 }
             }
         )
+        principal_cache.invalidate("user", user_id)
+        await token_revocations.revoke(user_id, "password_reset")
         
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="User not found")
@@ -5861,6 +6330,8 @@ async def manage_users(
                         {"user_id": user_id},
                         {"$set": {"is_suspended": True, "suspended_at": datetime.utcnow()}}
                     )
+                    principal_cache.invalidate("user", user_id)
+                    await token_revocations.revoke(user_id, "suspended")
                     results.append({"user_id": user_id, "status": "success", "message": "User suspended"})
                     
                 elif request.action == UserAction.REACTIVATE:
@@ -5868,11 +6339,14 @@ async def manage_users(
                         {"user_id": user_id},
                         {"$set": {"is_suspended": False}, "$unset": {"suspended_at": ""}}
                     )
+                    principal_cache.invalidate("user", user_id)
                     results.append({"user_id": user_id, "status": "success", "message": "User reactivated"})
                     
                 elif request.action == UserAction.DELETE:
                     # Delete user data (be careful with this!)
                     await db.users.delete_one({"user_id": user_id})
+                    principal_cache.invalidate("user", user_id)
+                    await token_revocations.revoke(user_id, "deleted")
                     await db.questions.delete_many({"user_id": user_id})
                     await db.payment_transactions.delete_many({"user_id": user_id})
                     results.append({"user_id": user_id, "status": "success", "message": "User deleted"})
@@ -5923,6 +6397,7 @@ async def change_user_role(
                 }
             }
         )
+        principal_cache.invalidate("user", user_id)
         
         # Create audit log entry
         audit_entry = {
@@ -6016,6 +6491,9 @@ async def suspend_user(
             {"user_id": user_id},
             {"$set": update_data}
         )
+        principal_cache.invalidate("user", user_id)
+        if request.suspend:
+            await token_revocations.revoke(user_id, "suspended")
         
         # Create audit log entry
         audit_entry = {
@@ -6114,6 +6592,8 @@ async def admin_reset_user_password(
                 }
             }
         )
+        principal_cache.invalidate("user", user_id)
+        await token_revocations.revoke(user_id, "password_reset")
         
         # Create audit log entry
         audit_entry = {
@@ -6200,6 +6680,8 @@ async def delete_user(
                 }
             }
         )
+        principal_cache.invalidate("user", user_id)
+        await token_revocations.revoke(user_id, "deleted")
         
         # Create audit log entry
         audit_entry = {
@@ -6332,6 +6814,7 @@ async def admin_reset_mentor_password(
                 }
             }
         )
+        principal_cache.invalidate("creator", mentor_id)
         
         # Send password reset email for mentor
         email_sent = await send_admin_password_reset_email(
@@ -6402,6 +6885,7 @@ async def admin_suspend_mentor(
             })
         
         await db.creators.update_one({"creator_id": mentor_id}, {"$set": update_data})
+        principal_cache.invalidate("creator", mentor_id)
         
         # Send notification email to mentor
         action = "suspended" if suspend_request.suspend else "reactivated"
@@ -6480,6 +6964,7 @@ async def admin_delete_mentor(
         
         # Delete mentor from creators collection
         await db.creators.delete_one({"creator_id": mentor_id})
+        principal_cache.invalidate("creator", mentor_id)
         
         # Send notification email
         subject = "OnlyMentors.ai - Mentor Account Deletion Notice"
@@ -6666,12 +7151,165 @@ async def get_platform_health(current_admin = Depends(get_current_admin)):
             raise HTTPException(status_code=500, detail="Database connection failed")
         
         health = await db_manager.get_platform_health()
+        
+        # LLM provider circuit state and its recent transitions
+        health["llm_provider"] = llm_circuit_breaker.get_stats()
+        if health["llm_provider"]["state"] != "closed":
+            health["recommendations"].append("LLM provider circuit is not closed: mentors are receiving fallback answers")
         return health
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get platform health: {str(e)}")
 
+@app.on_event("startup")
+async def ensure_conversation_indexes():
+    """Indexes for conversation context lookups, then move legacy messages into buckets"""
+    try:
+        await EnhancedContext.ensure_indexes(db)
+    except Exception as e:
+        print(f"❌ Error creating conversation indexes: {str(e)}")
+        return
+    
+    async def migrate():
+        try:
+            result = await EnhancedContext.migrate_message_buckets(db)
+            if result["messages"]:
+                print(f"✅ Migrated {result['messages']} messages from {result['threads']} threads into buckets")
+        except Exception as e:
+            print(f"❌ Error migrating conversation messages: {str(e)}")
+    
+    asyncio.create_task(migrate())
+
+@app.on_event("startup")
+async def ensure_user_history_indexes():
+    """Indexes for the history endpoints, then move legacy history arrays off user documents"""
+    try:
+        await UserHistory.ensure_indexes(db)
+    except Exception as e:
+        print(f"❌ Error creating user history indexes: {str(e)}")
+        return
+    
+    async def migrate():
+        try:
+            result = await UserHistory.migrate_user_history_arrays(db)
+            if result["users"]:
+                print(f"✅ Removed history arrays from {result['users']} users ({result['backfilled']} records backfilled)")
+        except Exception as e:
+            print(f"❌ Error migrating user history arrays: {str(e)}")
+    
+    asyncio.create_task(migrate())
+
+@app.on_event("startup")
+async def start_conversation_sessions():
+    """Start idle eviction for WebSocket conversation sessions"""
+    conversation_sessions.start()
+
+@app.on_event("startup")
+async def build_prompt_registry():
+    """Compile persona prompt headers for every catalog mentor"""
+    compiled = prompt_registry.build(ALL_MENTORS)
+    print(f"✅ Prompt registry compiled {compiled} mentor personas")
+
+@app.on_event("startup")
+async def start_write_outbox():
+    """Ensure outbox indexes and start the background drainer"""
+    try:
+        await write_outbox.ensure_indexes()
+        write_outbox.start()
+        print("✅ Write outbox drainer started")
+    except Exception as e:
+        print(f"❌ Error starting write outbox: {str(e)}")
+
+@app.on_event("startup")
+async def ensure_auth_admission_indexes():
+    """TTL and key indexes for the shared login rate buckets"""
+    if isinstance(auth_admission.buckets, MongoTokenBuckets):
+        try:
+            await auth_admission.buckets.ensure_indexes()
+        except Exception as e:
+            print(f"❌ Error creating auth admission indexes: {str(e)}")
+
+@app.on_event("startup")
+async def start_token_revocations():
+    """Load the revocation table and keep it in sync with other workers"""
+    try:
+        await token_revocations.ensure_indexes()
+        token_revocations.start()
+    except Exception as e:
+        print(f"❌ Error starting token revocation table: {str(e)}")
+
+@app.on_event("shutdown")
+async def stop_write_outbox():
+    """Stop the drainer and flush events that are already due"""
+    await write_outbox.stop()
+
+@app.on_event("startup")
+async def warm_answer_cache():
+    """Ensure answer cache indexes, warm the in-memory tier from the shared tier and schedule prewarm"""
+    try:
+        await persistent_answer_cache.ensure_indexes()
+        warmed = await persistent_answer_cache.warm(
+            answer_cache,
+            on_entry=lambda doc: question_similarity_index.add(doc["mentor_id"], doc["question"], doc["digest"])
+        )
+        print(f"✅ Answer cache warmed with {warmed} entries")
+    except Exception as e:
+        print(f"❌ Error warming answer cache: {str(e)}")
+    
+    # Off-peak pre-generation of the most-asked questions
+    answer_prewarmer.start()
+
+@app.post("/api/admin/answer-cache/prewarm")
+async def trigger_answer_prewarm(current_admin = Depends(get_current_admin)):
+    """Run an answer pre-generation pass now, ignoring the off-peak window"""
+    try:
+        if not has_permission(AdminRole(current_admin["role"]), "manage_system"):
+            raise HTTPException(status_code=403, detail="Insufficient permissions")
+        
+        asyncio.create_task(answer_prewarmer.run_once(force=True))
+        return {"message": "Answer prewarm started", "stats": answer_prewarmer.get_stats()}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to start answer prewarm: {str(e)}")
+
+@app.get("/api/admin/analytics/performance")
+async def get_performance_metrics(current_admin = Depends(get_current_admin)):
+    """Get in-process performance counters for the question pipeline"""
+    try:
+        if not has_permission(AdminRole(current_admin["role"]), "view_reports"):
+            raise HTTPException(status_code=403, detail="Insufficient permissions")
+
+        return {
+            "answer_cache": answer_cache.get_stats(),
+            "persistent_answer_cache": persistent_answer_cache.get_stats(),
+            "question_similarity": question_similarity_index.get_stats(),
+            "answer_prewarm": answer_prewarmer.get_stats(),
+            "llm_singleflight": llm_singleflight.get_stats(),
+            "llm_governor": llm_governor.get_stats(),
+            "llm_hedging": llm_hedger.get_stats(),
+            "batched_generation": batch_generation_stats.get_stats(),
+            "prompt_registry": prompt_registry.get_stats(),
+            "conversation_sessions": conversation_sessions.get_stats(),
+            "question_writes": question_writer.get_stats(),
+            "question_quota": question_quota.get_stats(),
+            "write_outbox": await write_outbox.get_stats(),
+            "llm_circuit_breaker": llm_circuit_breaker.get_stats(),
+            "llm_backend": llm_backend.get_stats(),
+            "principal_cache": principal_cache.get_stats(),
+            "token_revocations": token_revocations.get_stats(),
+            "password_hashing": password_hasher.get_stats(),
+            "auth_admission": auth_admission.get_stats(),
+            "mentor_catalog": mentor_catalog.get_stats(),
+            "generated_at": datetime.utcnow()
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get performance metrics: {str(e)}")
+
 # ================================
 # PREMIUM CONTENT ENDPOINTS (PAY-PER-VIEW)
 # ================================
@@ -7053,6 +7691,7 @@ async def manage_mentors(
                         {"creator_id": creator_id},
                         {"$set": {"status": CreatorStatus.APPROVED, "approved_at": datetime.utcnow()}}
                     )
+                    principal_cache.invalidate("creator", creator_id)
                     results.append({"creator_id": creator_id, "status": "success", "message": "Mentor approved"})
                     
                 elif request.action == MentorAction.REJECT:
@@ -7060,6 +7699,7 @@ async def manage_mentors(
                         {"creator_id": creator_id},
                         {"$set": {"status": CreatorStatus.REJECTED, "rejected_at": datetime.utcnow()}}
                     )
+                    principal_cache.invalidate("creator", creator_id)
                     results.append({"creator_id": creator_id, "status": "success", "message": "Mentor rejected"})
                     
                 elif request.action == MentorAction.SUSPEND:
@@ -7067,6 +7707,7 @@ async def manage_mentors(
                         {"creator_id": creator_id},
                         {"$set": {"status": CreatorStatus.SUSPENDED, "suspended_at": datetime.utcnow()}}
                     )
+                    principal_cache.invalidate("creator", creator_id)
                     results.append({"creator_id": creator_id, "status": "success", "message": "Mentor suspended"})
                     
                 elif request.action == MentorAction.REACTIVATE:
@@ -7074,11 +7715,13 @@ async def manage_mentors(
                         {"creator_id": creator_id},
                         {"$set": {"status": CreatorStatus.APPROVED}, "$unset": {"suspended_at": ""}}
                     )
+                    principal_cache.invalidate("creator", creator_id)
                     results.append({"creator_id": creator_id, "status": "success", "message": "Mentor reactivated"})
                     
                 elif request.action == MentorAction.DELETE:
                     # Delete mentor data
                     await db.creators.delete_one({"creator_id": creator_id})
+                    principal_cache.invalidate("creator", creator_id)
                     await db.creator_content.delete_many({"creator_id": creator_id})
                     results.append({"creator_id": creator_id, "status": "success", "message": "Mentor deleted"})
                     
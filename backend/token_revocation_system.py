@@ -0,0 +1,145 @@
+"""
+OnlyMentors.ai Token Revocation System
+Signed identity claims for stateless auth, and a compact per-user revocation table
+"""
+
+import os
+import time
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# When enabled, identity-only endpoints trust the signed claims and skip the users lookup
+STATELESS_AUTH_ENABLED = os.getenv("STATELESS_AUTH_ENABLED", "false").lower() == "true"
+# How often each worker pulls revocations recorded by other workers
+TOKEN_REVOCATION_REFRESH_SECONDS = float(os.getenv("TOKEN_REVOCATION_REFRESH_SECONDS", "5"))
+# Matches the lifetime set by create_access_token; older revocations can no longer match a live token
+TOKEN_LIFETIME_DAYS = 7
+
+CLAIMS_VERSION = 1
+
+def user_token_claims(user: Dict[str, Any]) -> Dict[str, Any]:
+    """Identity claims embedded in a user JWT
+
+    iat is the token's suspension epoch: a token is revoked when its user has
+    a revocation recorded at or after the moment it was issued.
+    """
+    return {
+        "user_id": user["user_id"],
+        "user_type": user.get("user_type", "consumer"),
+        "company_id": user.get("company_id"),
+        "is_subscribed": user.get("is_subscribed", False),
+        "iat": round(time.time(), 3),
+        "cv": CLAIMS_VERSION
+    }
+
+def has_identity_claims(payload: Dict[str, Any]) -> bool:
+    """Tokens minted before claims were added only carry user_id"""
+    return payload.get("cv") == CLAIMS_VERSION and "iat" in payload
+
+class TokenRevocationTable:
+    """user_id -> not-before time, mirrored from a small Mongo collection
+
+    Revocations take effect immediately on the worker that records them and
+    within one refresh interval everywhere else. Entries expire with the
+    longest-lived token they could affect, so the table stays proportional to
+    recent suspensions, deletions and password resets, not to the user base.
+    """
+
+    def __init__(self, collection, refresh_seconds: float = TOKEN_REVOCATION_REFRESH_SECONDS):
+        self.collection = collection
+        self.refresh_seconds = refresh_seconds
+        self._not_before: Dict[str, float] = {}
+        self._synced_until: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self.revocations = 0
+        self.checks = 0
+        self.rejected = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    def __len__(self) -> int:
+        return len(self._not_before)
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("user_id", unique=True)
+        await self.collection.create_index("updated_at")
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def revoke(self, user_id: str, reason: str) -> None:
+        """Invalidate every token issued to this user until now"""
+        now = time.time()
+        self._not_before[user_id] = max(now, self._not_before.get(user_id, 0.0))
+        self.revocations += 1
+        updated_at = datetime.utcnow()
+        await self.collection.update_one(
+            {"user_id": user_id},
+            {
+                "$max": {"not_before": now},
+                "$set": {
+                    "reason": reason,
+                    "updated_at": updated_at,
+                    "expires_at": updated_at + timedelta(days=TOKEN_LIFETIME_DAYS)
+                }
+            },
+            upsert=True
+        )
+
+    def is_revoked(self, user_id: str, issued_at: float) -> bool:
+        self.checks += 1
+        not_before = self._not_before.get(user_id)
+        if not_before is not None and issued_at <= not_before:
+            self.rejected += 1
+            return True
+        return False
+
+    async def refresh(self) -> int:
+        """Pull revocations recorded since the last refresh; returns how many were applied"""
+        query = {} if self._synced_until is None else {"updated_at": {"$gte": self._synced_until}}
+        # Overlap by a second so writes racing with the previous refresh are not missed
+        synced_until = datetime.utcnow() - timedelta(seconds=1)
+        applied = 0
+        async for doc in self.collection.find(query, {"_id": 0, "user_id": 1, "not_before": 1}):
+            if doc["not_before"] > self._not_before.get(doc["user_id"], 0.0):
+                self._not_before[doc["user_id"]] = doc["not_before"]
+                applied += 1
+        self._synced_until = synced_until
+
+        # Drop entries older than any token that could still be presented
+        horizon = time.time() - TOKEN_LIFETIME_DAYS * 86400
+        for user_id in [u for u, nb in self._not_before.items() if nb < horizon]:
+            del self._not_before[user_id]
+
+        self.refreshes += 1
+        return applied
+
+    async def run(self):
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.refresh_failures += 1
+                logger.error(f"Token revocation refresh failed: {str(e)}")
+            await asyncio.sleep(self.refresh_seconds)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "stateless_auth_enabled": STATELESS_AUTH_ENABLED,
+            "entries": len(self._not_before),
+            "refresh_seconds": self.refresh_seconds,
+            "revocations": self.revocations,
+            "checks": self.checks,
+            "rejected": self.rejected,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "synced_until": self._synced_until.isoformat() if self._synced_until else None
+        }
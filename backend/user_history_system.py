@@ -0,0 +1,106 @@
+"""
+OnlyMentors.ai User History System
+Question history lives in the questions and mentor_interactions collections, not on the user document
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List
+
+from pymongo import UpdateOne
+
+# Legacy per-user arrays that grew by one entry per question
+LEGACY_HISTORY_FIELDS = ("question_history", "mentor_interactions")
+
+# Fields never needed by request handlers; excluded from auth and profile reads
+HEAVY_USER_FIELDS = LEGACY_HISTORY_FIELDS + ("outbox_applied", "payment_info")
+
+# Projection for the per-request principal lookup
+LEAN_USER_PROJECTION = {"_id": 0, "password_hash": 0, **{field: 0 for field in HEAVY_USER_FIELDS}}
+
+class UserHistory:
+    """Indexes and migration for per-user question history"""
+
+    @staticmethod
+    async def ensure_indexes(db):
+        """Indexes behind the history endpoints, which read these collections by user"""
+        await db.mentor_interactions.create_index("interaction_id")
+        await db.mentor_interactions.create_index([("user_id", 1), ("timestamp", -1)])
+        await db.questions.create_index([("user_id", 1), ("created_at", -1)])
+
+    @staticmethod
+    def _backfill_requests(user_id: str, entries: List[Dict[str, Any]]) -> Dict[str, List[UpdateOne]]:
+        """Upserts recreating any history entry whose backing record is missing
+
+        Entries written by /api/questions/ask carry a question_id, entries from
+        the single-mentor endpoint an interaction_id. Both records are normally
+        written alongside the array push, so these upserts are almost always
+        no-ops; $setOnInsert never touches an existing record.
+        """
+        questions, interactions = [], []
+        for entry in entries:
+            timestamp = entry.get("timestamp") or datetime.utcnow()
+            if entry.get("question_id"):
+                questions.append(UpdateOne(
+                    {"question_id": entry["question_id"]},
+                    {"$setOnInsert": {
+                        "user_id": user_id,
+                        "category": entry.get("category"),
+                        "mentor_ids": [],
+                        "mentor_names": entry.get("mentor_names", []),
+                        "question": entry.get("question", ""),
+                        "responses": [],
+                        "created_at": timestamp,
+                        "migrated_from_user": True
+                    }},
+                    upsert=True
+                ))
+            elif entry.get("interaction_id"):
+                interactions.append(UpdateOne(
+                    {"interaction_id": entry["interaction_id"]},
+                    {"$setOnInsert": {
+                        "user_id": user_id,
+                        "mentor_id": entry.get("mentor_id"),
+                        "mentor_name": entry.get("mentor_name"),
+                        "mentor_category": entry.get("mentor_category"),
+                        "question": entry.get("question", ""),
+                        "response": "",
+                        "timestamp": timestamp,
+                        "rating": None,
+                        "follow_up_questions": [],
+                        "migrated_from_user": True
+                    }},
+                    upsert=True
+                ))
+        return {"questions": questions, "mentor_interactions": interactions}
+
+    @staticmethod
+    async def migrate_user_history_arrays(db, batch_users: int = 200) -> Dict[str, int]:
+        """Backfill anything only recorded in the legacy arrays, then $unset them
+
+        Resumable and idempotent: a user is only unset after their backfill is
+        written, and rerunning the backfill never overwrites existing records.
+        """
+        has_arrays = {"$or": [{field: {"$exists": True}} for field in LEGACY_HISTORY_FIELDS]}
+        migrated_users = 0
+        backfilled = 0
+        while True:
+            users = await db.users.find(
+                has_arrays, {"_id": 0, "user_id": 1, "question_history": 1}
+            ).limit(batch_users).to_list(batch_users)
+            if not users:
+                break
+
+            for user in users:
+                requests = UserHistory._backfill_requests(user["user_id"], user.get("question_history") or [])
+                for collection, ops in requests.items():
+                    if ops:
+                        result = await db[collection].bulk_write(ops, ordered=False)
+                        backfilled += result.upserted_count
+
+            await db.users.update_many(
+                {"user_id": {"$in": [user["user_id"] for user in users]}},
+                {"$unset": {field: "" for field in LEGACY_HISTORY_FIELDS}}
+            )
+            migrated_users += len(users)
+
+        return {"users": migrated_users, "backfilled": backfilled}
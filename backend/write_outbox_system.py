@@ -0,0 +1,248 @@
+"""
+OnlyMentors.ai Write Outbox System
+Durable write-behind queue so bookkeeping writes happen after the response is sent
+"""
+
+import os
+import uuid
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+import logging
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+WRITE_OUTBOX_ENABLED = os.getenv("WRITE_OUTBOX_ENABLED", "true").lower() == "true"
+WRITE_OUTBOX_BATCH_SIZE = int(os.getenv("WRITE_OUTBOX_BATCH_SIZE", "100"))
+WRITE_OUTBOX_POLL_SECONDS = float(os.getenv("WRITE_OUTBOX_POLL_SECONDS", "0.25"))
+WRITE_OUTBOX_LEASE_SECONDS = int(os.getenv("WRITE_OUTBOX_LEASE_SECONDS", "60"))
+WRITE_OUTBOX_MAX_ATTEMPTS = int(os.getenv("WRITE_OUTBOX_MAX_ATTEMPTS", "8"))
+WRITE_OUTBOX_RETRY_BASE_SECONDS = float(os.getenv("WRITE_OUTBOX_RETRY_BASE_SECONDS", "1.0"))
+# How many applied event ids a target document remembers for idempotent updates
+WRITE_OUTBOX_APPLIED_HISTORY = int(os.getenv("WRITE_OUTBOX_APPLIED_HISTORY", "50"))
+
+def outbox_insert(collection: str, key_field: str, documents: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Deferred insert; documents are upserted on key_field so replays are no-ops"""
+    return {"type": "insert", "collection": collection, "key": key_field, "documents": documents}
+
+def outbox_update(collection: str, filter: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    """Deferred update_one; the drainer guards it so it applies at most once
+
+    The update document's operators are stored as plain values
+    ({"op": "inc", "fields": {...}}), because "$"-prefixed field names cannot
+    be stored before MongoDB 5.0 and are awkward to query on any version.
+    """
+    changes = []
+    for operator, fields in update.items():
+        if not operator.startswith("$") or any(name.startswith("$") for name in fields):
+            raise ValueError(f"Unsupported outbox update: {update}")
+        changes.append({"op": operator[1:], "fields": fields})
+    return {"type": "update", "collection": collection, "filter": filter, "changes": changes}
+
+def _update_document(op: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Rebuild the update document from an outbox_update op"""
+    if "changes" not in op:
+        # Events queued before operators were stored as plain values
+        return {key: dict(value) for key, value in op["update"].items()}
+    return {f"${change['op']}": dict(change["fields"]) for change in op["changes"]}
+
+def _bulk_requests(event_id: str, ops: List[Dict[str, Any]]) -> Dict[str, List[UpdateOne]]:
+    """Translate an event's ops into idempotent bulk requests grouped by collection"""
+    requests = defaultdict(list)
+    for index, op in enumerate(ops):
+        if op["type"] == "insert":
+            for document in op["documents"]:
+                requests[op["collection"]].append(UpdateOne(
+                    {op["key"]: document[op["key"]]}, {"$setOnInsert": document}, upsert=True
+                ))
+        else:
+            token = f"{event_id}:{index}"
+            update = _update_document(op)
+            update.setdefault("$push", {})["outbox_applied"] = {
+                "$each": [token], "$slice": -WRITE_OUTBOX_APPLIED_HISTORY
+            }
+            requests[op["collection"]].append(UpdateOne(
+                {**op["filter"], "outbox_applied": {"$ne": token}}, update
+            ))
+    return requests
+
+class WriteOutbox:
+    """Outbox collection plus a background drainer that applies events in batches"""
+
+    def __init__(self, db, collection_name: str = "write_outbox", enabled: bool = WRITE_OUTBOX_ENABLED):
+        self.db = db
+        self.collection = db[collection_name]
+        self.enabled = enabled
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self.enqueued = 0
+        self.applied = 0
+        self.retried = 0
+        self.dead_lettered = 0
+        self.batches = 0
+        self.last_lag_seconds = 0.0
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("event_id", unique=True)
+        await self.collection.create_index([("status", 1), ("available_at", 1)])
+        await self.collection.create_index("claim")
+
+    async def enqueue(self, event_type: str, ops: List[Dict[str, Any]], session=None) -> str:
+        """Record one event's side-effect writes; applied inline when the outbox is disabled"""
+        event_id = str(uuid.uuid4())
+        if not self.enabled:
+            await self._apply_requests(_bulk_requests(event_id, ops), session=session)
+            return event_id
+
+        now = datetime.utcnow()
+        await self.collection.insert_one({
+            "event_id": event_id,
+            "event_type": event_type,
+            "ops": ops,
+            "status": "pending",
+            "attempts": 0,
+            "created_at": now,
+            "available_at": now
+        }, session=session)
+        self.enqueued += 1
+        self._wakeup.set()
+        return event_id
+
+    async def _apply_requests(self, requests: Dict[str, List[UpdateOne]], session=None):
+        await asyncio.gather(*(
+            self.db[name].bulk_write(batch, ordered=False, session=session)
+            for name, batch in requests.items()
+        ))
+
+    async def _claim_batch(self) -> List[Dict[str, Any]]:
+        """Lease up to a batch of due events; expired leases from crashed workers are reclaimed"""
+        now = datetime.utcnow()
+        due = {"$or": [
+            {"status": "pending", "available_at": {"$lte": now}},
+            {"status": "processing", "lease_until": {"$lt": now}}
+        ]}
+        ids = [doc["_id"] for doc in await self.collection.find(due, {"_id": 1})
+               .sort("created_at", 1).limit(WRITE_OUTBOX_BATCH_SIZE).to_list(WRITE_OUTBOX_BATCH_SIZE)]
+        if not ids:
+            return []
+
+        claim = str(uuid.uuid4())
+        await self.collection.update_many(
+            {"_id": {"$in": ids}, **due},
+            {"$set": {"status": "processing", "claim": claim,
+                      "lease_until": now + timedelta(seconds=WRITE_OUTBOX_LEASE_SECONDS)}}
+        )
+        return await self.collection.find({"claim": claim}).to_list(WRITE_OUTBOX_BATCH_SIZE)
+
+    async def drain_once(self) -> int:
+        """Apply one batch of events; returns how many were applied"""
+        events = await self._claim_batch()
+        if not events:
+            self.last_lag_seconds = 0.0
+            return 0
+
+        self.batches += 1
+        oldest = min(event["created_at"] for event in events)
+        self.last_lag_seconds = (datetime.utcnow() - oldest).total_seconds()
+
+        # Fast path: one bulk_write per target collection for the whole batch
+        combined = defaultdict(list)
+        for event in events:
+            for name, batch in _bulk_requests(event["event_id"], event["ops"]).items():
+                combined[name].extend(batch)
+        try:
+            await self._apply_requests(combined)
+            succeeded, failed = events, []
+        except Exception as e:
+            # Every request is idempotent, so replay event by event to isolate the bad one
+            logger.warning(f"Outbox batch failed, retrying events individually: {str(e)}")
+            succeeded, failed = [], []
+            for event in events:
+                try:
+                    await self._apply_requests(_bulk_requests(event["event_id"], event["ops"]))
+                    succeeded.append(event)
+                except Exception as event_error:
+                    failed.append((event, str(event_error)))
+
+        if succeeded:
+            await self.collection.delete_many({"_id": {"$in": [event["_id"] for event in succeeded]}})
+            self.applied += len(succeeded)
+
+        for event, error in failed:
+            await self._reschedule(event, error)
+
+        return len(succeeded)
+
+    async def _reschedule(self, event: Dict[str, Any], error: str):
+        attempts = event.get("attempts", 0) + 1
+        if attempts >= WRITE_OUTBOX_MAX_ATTEMPTS:
+            status, available_at = "dead", event["available_at"]
+            self.dead_lettered += 1
+            logger.error(f"Outbox event {event['event_id']} failed {attempts} times: {error}")
+        else:
+            status = "pending"
+            available_at = datetime.utcnow() + timedelta(
+                seconds=WRITE_OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+            )
+            self.retried += 1
+        await self.collection.update_one(
+            {"_id": event["_id"]},
+            {"$set": {"status": status, "attempts": attempts, "available_at": available_at,
+                      "last_error": error}, "$unset": {"claim": "", "lease_until": ""}}
+        )
+
+    async def run(self):
+        """Drainer loop: keep applying batches, sleeping only when the outbox is empty"""
+        while True:
+            try:
+                if await self.drain_once():
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbox drainer error: {str(e)}")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=WRITE_OUTBOX_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Stop the loop and flush what is already due"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            while await self.drain_once():
+                pass
+
+    async def get_stats(self) -> Dict[str, Any]:
+        """Counters plus backlog and lag measured from the oldest unapplied event"""
+        pending = await self.collection.count_documents({"status": {"$in": ["pending", "processing"]}})
+        dead = await self.collection.count_documents({"status": "dead"})
+        oldest = await self.collection.find_one(
+            {"status": {"$in": ["pending", "processing"]}}, {"created_at": 1}, sort=[("created_at", 1)]
+        )
+        return {
+            "enabled": self.enabled,
+            "drainer_running": self._task is not None and not self._task.done(),
+            "pending_events": pending,
+            "dead_events": dead,
+            "lag_seconds": round((datetime.utcnow() - oldest["created_at"]).total_seconds(), 3) if oldest else 0.0,
+            "last_batch_lag_seconds": round(self.last_lag_seconds, 3),
+            "enqueued": self.enqueued,
+            "applied": self.applied,
+            "retried": self.retried,
+            "dead_lettered": self.dead_lettered,
+            "batches": self.batches
+        }
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Mentor Catalog Benchmark for OnlyMentors.ai
+===========================================
+
+Times mentor lookups by id over the full merged catalog (the base database
+plus the expanded mentor lists, as server.py assembles it). Compares the
+linear scans the endpoints used to run with MentorCatalog's indexed maps,
+for hits spread across every category and for misses. The catalog's answers
+are checked against the scans' first-match results before timing. No
+database is needed; importing the mentor database fetches Wikipedia images
+as the server does.
+
+Usage: python mentor_catalog_benchmark.py [lookups]
+"""
+
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from complete_mentors_database import ALL_MENTORS, BUSINESS_MENTORS, SPORTS_MENTORS, HEALTH_MENTORS, SCIENCE_MENTORS
+from expanded_mentors import ADDITIONAL_BUSINESS_MENTORS, ADDITIONAL_SPORTS_MENTORS, ADDITIONAL_HEALTH_MENTORS, ADDITIONAL_SCIENCE_MENTORS
+from mentor_catalog_system import MentorCatalog
+
+BUSINESS_MENTORS.extend(ADDITIONAL_BUSINESS_MENTORS)
+SPORTS_MENTORS.extend(ADDITIONAL_SPORTS_MENTORS)
+HEALTH_MENTORS.extend(ADDITIONAL_HEALTH_MENTORS)
+SCIENCE_MENTORS.extend(ADDITIONAL_SCIENCE_MENTORS)
+
+def scan_by_id(mentor_id):
+    """The nested loop from ask_mentor_question / continue_conversation"""
+    for category, mentors in ALL_MENTORS.items():
+        for mentor in mentors:
+            if mentor["id"] == mentor_id:
+                return mentor, category
+    return None, None
+
+def scan_in_category(category, mentor_id):
+    """The per-category next(...) from ask_question"""
+    return next((m for m in ALL_MENTORS.get(category, []) if m["id"] == mentor_id), None)
+
+def timed(label, fn, keys, baseline=None):
+    started = time.perf_counter()
+    for key in keys:
+        fn(key)
+    elapsed = time.perf_counter() - started
+    per_lookup_us = elapsed / len(keys) * 1e6
+    speedup = f"x{baseline / per_lookup_us:7.1f}" if baseline else ""
+    print(f"{label:34} {per_lookup_us:9.3f} µs/lookup  {speedup}")
+    return per_lookup_us
+
+def run_benchmark(lookups: int):
+    started = time.perf_counter()
+    catalog = MentorCatalog(ALL_MENTORS)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    pairs = [(category, m["id"]) for category, mentors in ALL_MENTORS.items() for m in mentors]
+    for category, mentor_id in pairs:
+        mentor, found_category = scan_by_id(mentor_id)
+        assert catalog.get(mentor_id) is mentor and catalog.category_of(mentor_id) == found_category
+        assert catalog.get_in_category(category, mentor_id) is scan_in_category(category, mentor_id)
+
+    stats = catalog.get_stats()
+    print(f"📊 {stats['listed_entries']} listed mentors ({stats['mentors']} unique ids), "
+          f"catalog built in {build_ms:.2f} ms, {lookups} lookups each\n")
+
+    rng = random.Random(42)
+    hits = [rng.choice(pairs) for _ in range(lookups)]
+    hit_ids = [mentor_id for _, mentor_id in hits]
+    misses = [f"missing_{i}" for i in range(lookups)]
+
+    base = timed("scan by id (hit)", scan_by_id, hit_ids)
+    timed("catalog.get (hit)", catalog.get, hit_ids, base)
+    base = timed("scan by id (miss)", scan_by_id, misses)
+    timed("catalog.get (miss)", catalog.get, misses, base)
+    base = timed("scan in category (hit)", lambda pair: scan_in_category(*pair), hits)
+    timed("catalog.get_in_category (hit)", lambda pair: catalog.get_in_category(*pair), hits, base)
+    base = timed("scan for listing summary (hit)", scan_by_id, hit_ids)
+    timed("catalog.record (hit)", catalog.record, hit_ids, base)
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
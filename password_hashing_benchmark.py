@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Password Hashing Benchmark for OnlyMentors.ai
+=============================================
+
+Simulates a login storm and measures how long the event loop stalls while it
+runs. A probe coroutine asks to wake up every few milliseconds and records
+how late it actually woke: that lateness is what every in-flight LLM stream
+and request sees. The storm is run twice, once with bcrypt verification
+called inline in the coroutine (the old verify_password) and once through
+the PasswordHasher executor. No database is needed.
+
+Usage: python password_hashing_benchmark.py [logins] [concurrency] [rounds]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from password_hashing_system import PasswordHasher
+
+PROBE_INTERVAL = 0.005
+
+async def probe(stop: asyncio.Event, lateness: list):
+    """Sleeps PROBE_INTERVAL at a time and records how late each wake-up was"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + PROBE_INTERVAL
+        await asyncio.sleep(PROBE_INTERVAL)
+        lateness.append(max(0.0, loop.time() - expected) * 1000)
+
+async def storm(verify, logins: int, concurrency: int) -> float:
+    remaining = [logins]
+
+    async def client():
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            await verify()
+
+    started = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    return time.perf_counter() - started
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))] if ordered else 0.0
+
+async def run_benchmark(logins: int, concurrency: int, rounds: int):
+    hasher = PasswordHasher(rounds=rounds)
+    password = "correct horse battery staple"
+    stored = hasher.context.hash(password)
+
+    async def inline_verify():
+        hasher.context.verify(password, stored)
+
+    async def executor_verify():
+        await hasher.verify(password, stored)
+
+    print(f"📊 {logins} logins, {concurrency} concurrent, bcrypt cost {rounds}, "
+          f"{hasher.workers} hashing threads\n")
+    for name, verify in (("inline (blocking)", inline_verify), ("executor", executor_verify)):
+        stop = asyncio.Event()
+        lateness = []
+        probe_task = asyncio.create_task(probe(stop, lateness))
+        elapsed = await storm(verify, logins, concurrency)
+        stop.set()
+        await probe_task
+        print(f"{name:18} {logins / elapsed:7.1f} logins/s   loop lag p50 {statistics.median(lateness) if lateness else 0.0:7.2f} ms   "
+              f"p99 {percentile(lateness, 0.99):7.2f} ms   max {max(lateness, default=0.0):7.2f} ms   "
+              f"probe wake-ups {len(lateness)}")
+
+    print(f"\nexecutor stats: {hasher.get_stats()}")
+
+if __name__ == "__main__":
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    rounds = int(sys.argv[3]) if len(sys.argv) > 3 else 12
+    asyncio.run(run_benchmark(logins, concurrency, rounds))
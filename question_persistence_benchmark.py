@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Question Persistence Benchmark for OnlyMentors.ai
+=================================================
+
+Compares the legacy per-mentor write path of /api/questions/ask (one
+insert_one per mentor interaction, all sequential) with the batched
+QuestionAnswerWriter, which writes the question plus one outbox event on
+the request path. The outbox drain cost is reported separately, amortized
+per question. Round trips are counted with a pymongo command listener;
+everything is written to a scratch database that is dropped afterwards.
+
+Usage: MONGO_URL=mongodb://localhost:27017 python question_persistence_benchmark.py [questions] [mentors]
+"""
+
+import os
+import sys
+import time
+import uuid
+import asyncio
+from datetime import datetime
+from pymongo import monitoring
+from motor.motor_asyncio import AsyncIOMotorClient
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from question_persistence_system import QuestionAnswerWriter
+from write_outbox_system import WriteOutbox, outbox_insert, outbox_update
+
+# Load environment variables
+load_dotenv()
+
+WRITE_COMMANDS = {"insert", "update", "delete", "find", "commitTransaction"}
+
+class RoundTripCounter(monitoring.CommandListener):
+    """Counts persistence commands (writes plus outbox claim reads) sent to the server"""
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        if event.command_name in WRITE_COMMANDS:
+            self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+def build_question(user_id: str, mentors: int):
+    question_id = str(uuid.uuid4())
+    question_doc = {
+        "question_id": question_id,
+        "user_id": user_id,
+        "question": "How do I build a great team?",
+        "responses": [{"mentor": {"id": f"mentor_{i}"}, "response": "x" * 1500} for i in range(mentors)],
+        "created_at": datetime.utcnow()
+    }
+    interactions = [
+        {
+            "interaction_id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "question_id": question_id,
+            "mentor_id": f"mentor_{i}",
+            "response": "x" * 1500,
+            "timestamp": datetime.utcnow()
+        }
+        for i in range(mentors)
+    ]
+    user_update = {
+        "$inc": {"questions_asked": 1},
+        "$push": {"mentor_interactions": {"$each": [r["interaction_id"] for r in interactions]}}
+    }
+    return question_doc, interactions, user_update
+
+async def legacy_write(db, question_doc, interactions, user_id, user_update):
+    """The pre-batching path: 2 + N sequential round trips"""
+    await db.questions.insert_one(question_doc)
+    for record in interactions:
+        await db.mentor_interactions.insert_one(record)
+    await db.users.update_one({"user_id": user_id}, user_update)
+
+async def run_benchmark(questions: int, mentors: int):
+    counter = RoundTripCounter()
+    mongo_url = os.getenv("MONGO_URL", "mongodb://localhost:27017")
+    client = AsyncIOMotorClient(mongo_url, event_listeners=[counter])
+    db = client.onlymentors_benchmark_db
+    user_id = str(uuid.uuid4())
+    await db.users.insert_one({"user_id": user_id, "questions_asked": 0})
+
+    outbox = WriteOutbox(db, collection_name="write_outbox", enabled=True)
+    await outbox.ensure_indexes()
+    writers = [("batched (concurrent)", QuestionAnswerWriter(client, db, outbox, use_transactions=False))]
+    if os.getenv("QUESTION_WRITE_TRANSACTIONS", "false").lower() == "true":
+        writers.append(("batched (transaction)", QuestionAnswerWriter(client, db, outbox, use_transactions=True)))
+
+    async def legacy(question_doc, interactions, user_id, user_update):
+        await legacy_write(db, question_doc, interactions, user_id, user_update)
+
+    def batched(writer):
+        async def write(question_doc, interactions, user_id, user_update):
+            await writer.write(question_doc, [
+                outbox_insert("mentor_interactions", "interaction_id", interactions),
+                outbox_update("users", {"user_id": user_id}, user_update)
+            ])
+        return write
+
+    modes = [("legacy (sequential)", legacy)] + [(name, batched(writer)) for name, writer in writers]
+
+    print(f"📊 {questions} questions x {mentors} mentors against {mongo_url}\n")
+    try:
+        for name, write in modes:
+            counter.count = 0
+            started = time.perf_counter()
+            for _ in range(questions):
+                question_doc, interactions, user_update = build_question(user_id, mentors)
+                await write(question_doc, interactions, user_id, user_update)
+            elapsed = time.perf_counter() - started
+            print(f"{name:24} {counter.count / questions:5.1f} round trips/question   "
+                  f"{elapsed / questions * 1000:7.2f} ms/question")
+
+            if name != "legacy (sequential)":
+                counter.count = 0
+                started = time.perf_counter()
+                while await outbox.drain_once():
+                    pass
+                elapsed = time.perf_counter() - started
+                print(f"{'  outbox drain':24} {counter.count / questions:5.1f} round trips/question   "
+                      f"{elapsed / questions * 1000:7.2f} ms/question (off the request path)")
+    finally:
+        await client.drop_database("onlymentors_benchmark_db")
+        client.close()
+
+if __name__ == "__main__":
+    questions = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    mentors = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    asyncio.run(run_benchmark(questions, mentors))
@@ -0,0 +1,189 @@
+"""
+Unit tests for the auth admission system (token buckets, login admission, client IP)
+"""
+
+import os
+import sys
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+import auth_admission_system
+from auth_admission_system import (
+    AdmissionRejected, AuthAdmissionController, InMemoryTokenBuckets, TokenBucketSpec, client_ip
+)
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(auth_admission_system, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+def test_spec_retry_after_rounds_up_to_whole_seconds():
+    spec = TokenBucketSpec(5, per_minute=6)
+    assert spec.rate_per_second == pytest.approx(0.1)
+    assert spec.retry_after(0.0) == 10
+    assert spec.retry_after(0.5) == 5
+    # Never tells a client to retry immediately
+    assert spec.retry_after(0.99) == 1
+    assert spec.idle_seconds == pytest.approx(50)
+
+def test_spec_without_refill():
+    spec = TokenBucketSpec(5, per_minute=0)
+    assert spec.retry_after(0.0) == 60
+    assert spec.idle_seconds == 3600.0
+
+def test_memory_bucket_refill_math(clock):
+    async def run():
+        buckets = InMemoryTokenBuckets()
+        spec = TokenBucketSpec(2, per_minute=60)
+        assert await buckets.peek("k", spec) == 2
+        assert await buckets.take("k", spec) == (True, 1.0)
+        assert await buckets.take("k", spec) == (True, 0.0)
+        assert await buckets.take("k", spec) == (False, 0.0)
+
+        clock.now += 0.5
+        assert await buckets.peek("k", spec) == pytest.approx(0.5)
+        allowed, tokens = await buckets.take("k", spec)
+        # A refused take keeps the partial refill
+        assert not allowed and tokens == pytest.approx(0.5)
+        clock.now += 0.5
+        allowed, tokens = await buckets.take("k", spec)
+        assert allowed and tokens == pytest.approx(0.0)
+
+        clock.now += 100
+        assert await buckets.peek("k", spec) == 2
+
+    asyncio.run(run())
+
+def test_memory_buckets_evict_least_recently_touched(clock):
+    async def run():
+        buckets = InMemoryTokenBuckets(max_buckets=2)
+        spec = TokenBucketSpec(2, per_minute=60)
+        for key in ("a", "b", "a", "c"):
+            await buckets.take(key, spec)
+        assert len(buckets) == 2
+        assert list(buckets._buckets) == ["a", "c"]
+
+    asyncio.run(run())
+
+def _controller(buckets=None, saturated=False, enabled=True):
+    return AuthAdmissionController(
+        buckets or InMemoryTokenBuckets(), SimpleNamespace(saturated=saturated),
+        ip_spec=TokenBucketSpec(3, per_minute=6),
+        account_spec=TokenBucketSpec(2, per_minute=6),
+        account_global_spec=TokenBucketSpec(3, per_minute=6),
+        enabled=enabled
+    )
+
+def test_ip_bucket_limits_attempts(clock):
+    async def run():
+        controller = _controller()
+        for _ in range(3):
+            await controller.admit("1.1.1.1", "a@example.com")
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.admit("1.1.1.1", "b@example.com")
+        assert rejected.value.reason == "ip_rate"
+        assert rejected.value.retry_after == 10
+        # Other addresses are unaffected
+        await controller.admit("2.2.2.2", "a@example.com")
+        assert controller.admitted == 4
+
+    asyncio.run(run())
+
+def test_failures_from_one_address_do_not_lock_out_the_owner(clock):
+    async def run():
+        controller = _controller()
+        for _ in range(2):
+            await controller.admit("1.1.1.1", "a@example.com")
+            await controller.record_failure("1.1.1.1", "a@example.com")
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.admit("1.1.1.1", "a@example.com")
+        assert rejected.value.reason == "account_ip_failures"
+        await controller.admit("2.2.2.2", "a@example.com")
+        assert controller.failures == 2
+
+    asyncio.run(run())
+
+def test_failures_spread_over_addresses_hit_the_account_bucket(clock):
+    async def run():
+        controller = _controller()
+        for n in range(3):
+            await controller.admit(f"10.0.0.{n}", "a@example.com")
+            await controller.record_failure(f"10.0.0.{n}", "a@example.com")
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.admit("10.0.0.9", "a@example.com")
+        assert rejected.value.reason == "account_failures"
+        assert controller.get_stats()["rejected"] == {"account_failures": 1}
+
+        clock.now += 10
+        await controller.admit("10.0.0.9", "a@example.com")
+
+    asyncio.run(run())
+
+def test_saturated_hash_queue_sheds_before_buckets(clock):
+    async def run():
+        buckets = InMemoryTokenBuckets()
+        controller = _controller(buckets, saturated=True)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.admit("1.1.1.1", "a@example.com")
+        assert (rejected.value.reason, rejected.value.retry_after) == ("hash_queue_saturated", 1)
+        assert len(buckets) == 0
+
+    asyncio.run(run())
+
+class _BrokenBuckets:
+    name = "broken"
+
+    async def take(self, key, spec):
+        raise ConnectionError("limiter unavailable")
+
+    async def peek(self, key, spec):
+        raise ConnectionError("limiter unavailable")
+
+def test_backend_errors_fail_open():
+    async def run():
+        controller = _controller(_BrokenBuckets())
+        await controller.admit("1.1.1.1", "a@example.com")
+        await controller.record_failure("1.1.1.1", "a@example.com")
+        stats = controller.get_stats()
+        assert stats["admitted"] == 1
+        assert stats["failures_recorded"] == 0
+        assert stats["backend_errors"] == 2
+        assert stats["tracked_buckets"] is None
+
+    asyncio.run(run())
+
+def test_disabled_controller_admits_everything():
+    async def run():
+        controller = _controller(_BrokenBuckets(), saturated=True, enabled=False)
+        await controller.admit("1.1.1.1", "a@example.com")
+        await controller.record_failure("1.1.1.1", "a@example.com")
+        assert controller.backend_errors == 0
+
+    asyncio.run(run())
+
+def test_client_ip_ignores_forwarded_for_unless_trusted(monkeypatch):
+    monkeypatch.setattr(auth_admission_system, "AUTH_TRUST_FORWARDED_FOR", False)
+    assert client_ip({"x-forwarded-for": "6.6.6.6"}, "10.0.0.1") == "10.0.0.1"
+    assert client_ip({}, None) == "unknown"
+
+def test_client_ip_reads_trusted_hops_from_the_right(monkeypatch):
+    monkeypatch.setattr(auth_admission_system, "AUTH_TRUST_FORWARDED_FOR", True)
+    monkeypatch.setattr(auth_admission_system, "AUTH_TRUSTED_PROXY_HOPS", 1)
+    assert client_ip({"x-forwarded-for": "6.6.6.6, 1.1.1.1"}, "10.0.0.1") == "1.1.1.1"
+
+    monkeypatch.setattr(auth_admission_system, "AUTH_TRUSTED_PROXY_HOPS", 2)
+    assert client_ip({"x-forwarded-for": "6.6.6.6 , 1.1.1.1, 10.0.0.2"}, "10.0.0.1") == "1.1.1.1"
+    # Fewer hops than trusted proxies means the header did not come through them
+    assert client_ip({"x-forwarded-for": "6.6.6.6"}, "10.0.0.1") == "10.0.0.1"
@@ -0,0 +1,119 @@
+"""
+Unit tests for the enhanced context system (context window budgeting, bucket migration)
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from enhanced_context_system import CONVERSATION_BUCKET_SIZE, EnhancedContext
+from prompt_registry_system import estimate_tokens
+
+START = datetime(2024, 1, 1, 12, 0, 0)
+
+def _exchanges(count, content_chars=40):
+    """recent messages and the summary entries add_message_to_thread writes for them"""
+    recent, summary = [], []
+    for n in range(count):
+        asked_at = START + timedelta(minutes=2 * n)
+        answered_at = asked_at + timedelta(minutes=1)
+        recent.append({"message_type": "question", "content": f"q{n} " + "x" * content_chars, "created_at": asked_at})
+        recent.append({"message_type": "response", "content": f"r{n} " + "y" * content_chars, "created_at": answered_at})
+        summary.append({"text": f"s{n}", "created_at": answered_at})
+    return recent, summary
+
+def _cost(msg):
+    speaker = "User asked" if msg["message_type"] == "question" else "You responded"
+    return estimate_tokens(f"{speaker}: {msg['content']}\n")
+
+def test_everything_fits_and_covered_summaries_are_skipped():
+    recent, summary = _exchanges(3)
+    older = {"text": "s-older", "created_at": START - timedelta(minutes=5)}
+    context = EnhancedContext.fit_context(recent, [older] + summary, budget=10000)
+    assert "Summary of earlier exchanges:\n- s-older\n" in context
+    for n in range(3):
+        assert f"- s{n}\n" not in context
+        assert f"User asked: q{n}" in context and f"You responded: r{n}" in context
+    assert context.index("Summary of earlier exchanges") < context.index("Most recent messages")
+
+def test_recent_messages_cut_by_budget_fall_back_to_their_summary():
+    recent, summary = _exchanges(3)
+    # Room for the newest exchange only, plus a little for summary lines
+    budget = _cost(recent[-1]) + _cost(recent[-2]) + 10
+    context = EnhancedContext.fit_context(recent, summary, budget)
+    assert "User asked: q2" in context and "You responded: r2" in context
+    assert "q1 " not in context and "q0 " not in context
+    # The dropped exchanges are still represented, oldest first
+    assert "Summary of earlier exchanges:\n- s0\n- s1\n" in context
+    assert "- s2\n" not in context
+
+def test_oversized_newest_message_is_truncated():
+    recent, summary = _exchanges(2)
+    recent[-1]["content"] = "r1 " + "z" * 2000
+    context = EnhancedContext.fit_context(recent, summary, budget=100)
+    assert context.startswith("Most recent messages:\nYou responded: r1 zzz")
+    assert context.endswith("...\n")
+    assert "User asked: q1" not in context
+    # The budget was spent on the truncated message
+    assert "Summary of earlier exchanges" not in context
+
+def test_nothing_rendered_leaves_every_summary_eligible():
+    recent, summary = _exchanges(2, content_chars=400)
+    context = EnhancedContext.fit_context(recent, summary, budget=20)
+    assert "Most recent messages" not in context
+    assert context == "Summary of earlier exchanges:\n- s0\n- s1\n"
+
+def test_summary_lines_keep_the_newest_within_budget():
+    summary = [{"text": f"entry {n} " + "w" * 30, "created_at": START + timedelta(minutes=n)} for n in range(5)]
+    line_cost = estimate_tokens(f"- {summary[0]['text']}\n")
+    context = EnhancedContext.fit_context([], summary, budget=line_cost * 2)
+    assert "entry 3" in context and "entry 4" in context
+    assert "entry 2" not in context
+    assert context.index("entry 3") < context.index("entry 4")
+
+def test_empty_window_renders_nothing():
+    assert EnhancedContext.fit_context([], [], budget=1000) == ""
+
+def _legacy(count):
+    return [
+        {"message_id": f"m{n}", "thread_id": "t1", "user_id": "u1", "mentor_id": "steve_jobs",
+         "message_type": "question" if n % 2 == 0 else "response", "content": f"c{n}",
+         "created_at": START + timedelta(minutes=n)}
+        for n in range(count)
+    ]
+
+def test_legacy_messages_are_grouped_by_sequence():
+    legacy = _legacy(CONVERSATION_BUCKET_SIZE + 3)
+    grouped = EnhancedContext._group_legacy_messages(legacy, set())
+    assert sorted(grouped) == [0, 1]
+    user_id, mentor_id, first = grouped[0]
+    assert (user_id, mentor_id) == ("u1", "steve_jobs")
+    assert [m["message_id"] for m in first] == [f"m{n}" for n in range(CONVERSATION_BUCKET_SIZE)]
+    assert [m["message_id"] for m in grouped[1][2]] == [f"m{n}" for n in range(CONVERSATION_BUCKET_SIZE, CONVERSATION_BUCKET_SIZE + 3)]
+    # Thread, user and mentor live on the bucket, not on each message
+    assert set(first[0]) == {"message_id", "message_type", "content", "context_summary", "created_at"}
+
+def test_already_bucketed_messages_keep_later_sequence_numbers():
+    legacy = _legacy(CONVERSATION_BUCKET_SIZE + 2)
+    existing = {f"m{n}" for n in range(CONVERSATION_BUCKET_SIZE + 1)}
+    grouped = EnhancedContext._group_legacy_messages(legacy, existing)
+    # The remaining message stays in the bucket its position puts it in
+    assert list(grouped) == [1]
+    assert [m["message_id"] for m in grouped[1][2]] == [f"m{CONVERSATION_BUCKET_SIZE + 1}"]
+
+def test_fully_migrated_thread_has_nothing_to_group():
+    legacy = _legacy(3)
+    assert EnhancedContext._group_legacy_messages(legacy, {"m0", "m1", "m2"}) == {}
+
+def test_bucket_append_upserts_counts_and_bounds():
+    messages = [EnhancedContext._bucket_message(m) for m in _legacy(3)]
+    append = EnhancedContext._bucket_append("t1", 4, "u1", "steve_jobs", messages)
+    assert append["filter"] == {"thread_id": "t1", "bucket": 4}
+    update = append["update"]
+    assert update["$push"]["messages"]["$each"] == messages
+    assert update["$inc"] == {"count": 3}
+    assert update["$min"] == {"first_at": START}
+    assert update["$max"] == {"last_at": START + timedelta(minutes=2)}
+    assert update["$setOnInsert"] == {"user_id": "u1", "mentor_id": "steve_jobs"}
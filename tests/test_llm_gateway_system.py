@@ -0,0 +1,229 @@
+"""
+Unit tests for the LLM gateway system (concurrency governor, circuit breaker)
+"""
+
+import os
+import sys
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+import llm_gateway_system
+from llm_gateway_system import (
+    CircuitBreaker, CircuitOpenError, LLMConcurrencyGovernor, PRIORITY_LANE, STANDARD_LANE
+)
+
+async def _grant_order(governor, requests):
+    """Queue requests behind a held slot and return the order they are granted in"""
+    order = []
+    hold = asyncio.Event()
+
+    async def holder():
+        async with governor.slot("holder"):
+            await hold.wait()
+
+    async def waiter(name, tenant, lane):
+        async with governor.slot(tenant, lane):
+            order.append(name)
+
+    holding = asyncio.create_task(holder())
+    await asyncio.sleep(0)
+    waiters = [asyncio.create_task(waiter(*request)) for request in requests]
+    await asyncio.sleep(0)
+    hold.set()
+    await asyncio.gather(holding, *waiters)
+    return order
+
+def test_free_slot_is_taken_without_queueing():
+    async def run():
+        governor = LLMConcurrencyGovernor(max_concurrency=2)
+        async with governor.slot("user:a"):
+            assert governor.active == 1
+            assert governor.try_acquire()
+            governor.release()
+        assert governor.active == 0
+        assert governor.get_stats()["queued"] == 0
+
+    asyncio.run(run())
+
+def test_flooding_tenant_does_not_starve_others():
+    async def run():
+        governor = LLMConcurrencyGovernor(max_concurrency=1)
+        flood = [(f"a{i}", "user:a", STANDARD_LANE) for i in range(5)]
+        order = await _grant_order(governor, flood + [("b0", "user:b", STANDARD_LANE)])
+        # b arrives last but shares the first virtual slot with a0
+        assert order.index("b0") == 1
+        assert [name for name in order if name.startswith("a")] == [f"a{i}" for i in range(5)]
+        assert governor.active == 0
+
+    asyncio.run(run())
+
+def test_priority_lane_gets_larger_share():
+    async def run():
+        governor = LLMConcurrencyGovernor(
+            max_concurrency=1, lane_weights={PRIORITY_LANE: 4.0, STANDARD_LANE: 1.0}
+        )
+        standard = [(f"s{i}", "user:s", STANDARD_LANE) for i in range(4)]
+        priority = [(f"p{i}", "user:p", PRIORITY_LANE) for i in range(8)]
+        order = await _grant_order(governor, standard + priority)
+        # Finish tags 0.25, 0.5, ... 2.0 for priority vs 1, 2, 3, 4 for standard;
+        # ties go to the earlier arrival
+        assert order[:5] == ["p0", "p1", "p2", "s0", "p3"]
+        assert sum(name.startswith("p") for name in order[:10]) == 8
+
+    asyncio.run(run())
+
+def test_cancelled_waiters_leave_the_queue():
+    async def run():
+        governor = LLMConcurrencyGovernor(max_concurrency=1)
+        assert governor.try_acquire()
+        waiters = [asyncio.create_task(governor._acquire("user:a", STANDARD_LANE)) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert governor.get_stats()["queue_depth"] == 3
+
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        stats = governor.get_stats()
+        assert stats["queue_depth"] == 0
+        assert stats["lanes"][STANDARD_LANE]["queue_depth"] == 0
+        assert governor._tenant_finish == {}
+
+        governor.release()
+        assert governor.active == 0
+        # Nothing stale is queued, so a hedge may take the free slot
+        assert governor.try_acquire()
+
+    asyncio.run(run())
+
+def test_cancelled_waiter_does_not_push_back_its_tenant():
+    async def run():
+        governor = LLMConcurrencyGovernor(max_concurrency=1)
+        assert governor.try_acquire()
+        first = asyncio.create_task(governor._acquire("user:a", STANDARD_LANE))
+        second = asyncio.create_task(governor._acquire("user:a", STANDARD_LANE))
+        await asyncio.sleep(0)
+        second.cancel()
+        await asyncio.gather(second, return_exceptions=True)
+        # Only the surviving request's tag remains for the tenant
+        assert governor._tenant_finish["user:a"] == 1.0
+
+        governor.release()
+        await first
+        assert governor.active == 1
+        governor.release()
+        assert governor.active == 0
+
+    asyncio.run(run())
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+async def _succeed():
+    return "ok"
+
+async def _fail():
+    raise RuntimeError("provider error")
+
+async def _outcomes(breaker, factories):
+    for factory in factories:
+        try:
+            await breaker.call(factory)
+        except RuntimeError:
+            pass
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    # Only the gateway's clock is replaced; the event loop keeps real time
+    monkeypatch.setattr(llm_gateway_system, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+def _breaker():
+    return CircuitBreaker(window_seconds=60, min_calls=4, failure_rate=0.5, open_seconds=30, half_open_probes=2)
+
+def test_breaker_opens_at_failure_rate_after_min_calls(clock):
+    breaker = _breaker()
+    asyncio.run(_outcomes(breaker, [_fail, _fail, _fail]))
+    # Below min_calls the circuit stays closed however bad the rate
+    assert breaker.state == CircuitBreaker.CLOSED
+    asyncio.run(_outcomes(breaker, [_succeed, _fail]))
+    assert breaker.state == CircuitBreaker.OPEN
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(breaker.call(_succeed))
+    assert breaker.rejected == 1
+
+def test_breaker_window_forgets_old_failures(clock):
+    breaker = _breaker()
+    asyncio.run(_outcomes(breaker, [_fail, _fail, _fail]))
+    clock.now += 61
+    asyncio.run(_outcomes(breaker, [_succeed, _succeed, _succeed, _fail]))
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_breaker_half_open_probes_close_it(clock):
+    breaker = _breaker()
+    asyncio.run(_outcomes(breaker, [_fail] * 4))
+    clock.now += 30
+    assert asyncio.run(breaker.call(_succeed)) == "ok"
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert asyncio.run(breaker.call(_succeed)) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert [t["to"] for t in breaker.transitions] == ["open", "half_open", "closed"]
+
+def test_breaker_failed_probe_reopens_it(clock):
+    breaker = _breaker()
+    asyncio.run(_outcomes(breaker, [_fail] * 4))
+    clock.now += 30
+    asyncio.run(_outcomes(breaker, [_fail]))
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(breaker.call(_succeed))
+
+def test_breaker_limits_concurrent_probes(clock):
+    async def run():
+        breaker = _breaker()
+        await _outcomes(breaker, [_fail] * 4)
+        clock.now += 30
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            return "ok"
+
+        probes = [asyncio.create_task(breaker.call(slow)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(CircuitOpenError):
+            await breaker.call(_succeed)
+        release.set()
+        assert await asyncio.gather(*probes) == ["ok", "ok"]
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    asyncio.run(run())
+
+def test_breaker_ignores_cancelled_calls(clock):
+    async def run():
+        breaker = _breaker()
+        await _outcomes(breaker, [_fail] * 4)
+        clock.now += 30
+
+        async def hang():
+            await asyncio.sleep(3600)
+
+        probe = asyncio.create_task(breaker.call(hang))
+        await asyncio.sleep(0)
+        probe.cancel()
+        await asyncio.gather(probe, return_exceptions=True)
+        # The cancelled probe freed its slot and did not reopen the circuit
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.failures == 4
+        assert await breaker.call(_succeed) == "ok"
+
+    asyncio.run(run())
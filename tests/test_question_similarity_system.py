@@ -0,0 +1,79 @@
+"""
+Unit tests for the question similarity system (normalization, MinHash/LSH index)
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from question_similarity_system import (
+    MentorQuestionIndex, QuestionSimilarityIndex, jaccard_similarity, minhash_signature, question_shingles
+)
+
+def test_shingles_drop_filler_and_stem_plurals():
+    assert question_shingles("What are the best ways to hire engineers?") == {"what", "best", "way", "hire", "engineer"}
+    assert question_shingles("How do I stay focused") == question_shingles("how to stay focus")
+    assert question_shingles("growing my business") == question_shingles("grow businesses")
+
+def test_shingles_keep_interrogatives_and_negations():
+    why = question_shingles("Why should I raise a seed round?")
+    how = question_shingles("How should I raise a seed round?")
+    assert why != how
+    assert jaccard_similarity(why, how) < 0.8
+    assert "not" in question_shingles("Should I not raise money?")
+
+def test_jaccard_similarity():
+    assert jaccard_similarity({"a", "b"}, {"a", "b"}) == 1.0
+    assert jaccard_similarity({"a", "b"}, {"b", "c"}) == 1 / 3
+    assert jaccard_similarity(set(), {"a"}) == 0.0
+
+def test_minhash_signature_is_stable_and_order_independent():
+    first = minhash_signature({"raise", "seed", "round"})
+    assert first == minhash_signature({"round", "seed", "raise"})
+    assert first != minhash_signature({"raise", "seed", "fund"})
+
+def test_index_finds_paraphrase_above_threshold():
+    index = QuestionSimilarityIndex(threshold=0.8)
+    index.add("steve_jobs", "How do I raise a seed round?", "key-1")
+    assert index.find("steve_jobs", "how can I raise a seed round") == "key-1"
+    assert index.find("steve_jobs", "Why should I raise a seed round?") is None
+    # Matches never cross mentors
+    assert index.find("bill_gates", "how can I raise a seed round") is None
+    stats = index.get_stats()
+    assert stats["lookups"] == 2 and stats["matches"] == 1
+
+def test_index_skips_questions_with_too_few_tokens():
+    index = QuestionSimilarityIndex(min_tokens=2)
+    index.add("steve_jobs", "Why?", "key-1")
+    assert index.get_stats()["questions_indexed"] == 0
+    assert index.find("steve_jobs", "Why?") is None
+
+def test_discard_stale_removes_key_from_every_band():
+    index = QuestionSimilarityIndex()
+    index.add("steve_jobs", "How do I raise a seed round?", "key-1")
+    index.discard_stale("steve_jobs", "key-1")
+    assert index.find("steve_jobs", "How do I raise a seed round?") is None
+    assert index.get_stats()["stale_matches"] == 1
+    mentor_index = index._mentors["steve_jobs"]
+    assert len(mentor_index) == 0
+    assert all(not bands for bands in mentor_index._bands)
+
+def test_mentor_index_evicts_oldest_entry():
+    index = MentorQuestionIndex(max_entries=2)
+    index.add("key-1", question_shingles("how to raise a seed round"))
+    index.add("key-2", question_shingles("how to hire great engineers"))
+    index.add("key-3", question_shingles("how to price a new product"))
+    assert len(index) == 2
+    key, _, _ = index.query(question_shingles("how to raise a seed round"), 0.8)
+    assert key is None
+    key, score, _ = index.query(question_shingles("how to price a new product"), 0.8)
+    assert key == "key-3" and score == 1.0
+
+def test_readding_a_key_replaces_its_shingles():
+    index = MentorQuestionIndex()
+    index.add("key-1", question_shingles("how to raise a seed round"))
+    index.add("key-1", question_shingles("how to hire great engineers"))
+    assert len(index) == 1
+    assert index.query(question_shingles("how to raise a seed round"), 0.8)[0] is None
+    assert index.query(question_shingles("how to hire great engineers"), 0.8)[0] == "key-1"
@@ -0,0 +1,141 @@
+"""
+Unit tests for the quota system (atomic reserve/release)
+"""
+
+import os
+import sys
+import asyncio
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from quota_system import CounterQuota, QuotaExceededError
+
+def _matches(doc, query):
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(_matches(doc, option) for option in condition):
+                return False
+        elif isinstance(condition, dict):
+            for op, value in condition.items():
+                if op == "$exists" and (field in doc) != value:
+                    return False
+                if op == "$lt" and not (field in doc and doc[field] < value):
+                    return False
+                if op == "$gt" and not (field in doc and doc[field] > value):
+                    return False
+        elif doc.get(field) != condition:
+            return False
+    return True
+
+class _Collection:
+    """Enough of a Motor collection for CounterQuota; each update is atomic per document,
+    but callers interleave at every await as they would against the server"""
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    def _update(self, query, update):
+        doc = next((doc for doc in self.docs if _matches(doc, query)), None)
+        if doc is not None:
+            for field, amount in update["$inc"].items():
+                doc[field] = doc.get(field, 0) + amount
+        return doc
+
+    async def find_one_and_update(self, query, update, projection=None, return_document=None):
+        await asyncio.sleep(0)
+        doc = self._update(query, update)
+        if doc is None:
+            return None
+        return {field: doc[field] for field in projection if field in doc}
+
+    async def update_one(self, query, update):
+        await asyncio.sleep(0)
+        self._update(query, update)
+
+def _quota(docs, limit=3):
+    return CounterQuota(_Collection(docs), "user_id", "questions_asked", limit, exempt_field="is_subscribed")
+
+def test_reserve_counts_down_remaining():
+    async def run():
+        user = {"user_id": "u1"}
+        quota = _quota([user])
+        remaining = [(await quota.reserve("u1")).remaining for _ in range(3)]
+        assert remaining == [2, 1, 0]
+        with pytest.raises(QuotaExceededError):
+            await quota.reserve("u1")
+        assert user["questions_asked"] == 3
+        assert quota.get_stats() == {"limit": 3, "reserved": 3, "rejected": 1, "released": 0}
+
+    asyncio.run(run())
+
+def test_concurrent_reserves_never_overshoot():
+    async def run():
+        user = {"user_id": "u1", "questions_asked": 1}
+        quota = _quota([user])
+        results = await asyncio.gather(*(quota.reserve("u1") for _ in range(10)), return_exceptions=True)
+        granted = [r for r in results if not isinstance(r, Exception)]
+        assert len(granted) == 2
+        assert sum(isinstance(r, QuotaExceededError) for r in results) == 8
+        assert user["questions_asked"] == 3
+
+    asyncio.run(run())
+
+def test_release_returns_the_slot_once():
+    async def run():
+        user = {"user_id": "u1", "questions_asked": 2}
+        quota = _quota([user])
+        reservation = await quota.reserve("u1")
+        assert user["questions_asked"] == 3
+        await quota.release(reservation)
+        await quota.release(reservation)
+        assert user["questions_asked"] == 2
+        assert quota.released == 1
+        assert (await quota.reserve("u1")).remaining == 0
+
+    asyncio.run(run())
+
+def test_concurrent_reserve_and_release_settle_at_the_limit():
+    async def run():
+        user = {"user_id": "u1", "questions_asked": 2}
+        quota = _quota([user])
+        first = await quota.reserve("u1")
+        # The failed request gives its slot back while others race for it
+        results = await asyncio.gather(
+            quota.release(first), *(quota.reserve("u1") for _ in range(5)), return_exceptions=True
+        )
+        assert sum(isinstance(r, QuotaExceededError) for r in results) == 4
+        assert user["questions_asked"] == 3
+
+    asyncio.run(run())
+
+def test_release_never_goes_negative():
+    async def run():
+        user = {"user_id": "u1", "questions_asked": 1}
+        quota = _quota([user])
+        reservation = await quota.reserve("u1")
+        # The counter was reset (e.g. by an admin) before the release landed
+        user["questions_asked"] = 0
+        await quota.release(reservation)
+        assert user["questions_asked"] == 0
+
+    asyncio.run(run())
+
+def test_exempt_documents_are_not_limited():
+    async def run():
+        user = {"user_id": "u1", "questions_asked": 3, "is_subscribed": True}
+        quota = _quota([user])
+        reservation = await quota.reserve("u1")
+        assert reservation.remaining is None
+        assert user["questions_asked"] == 4
+
+    asyncio.run(run())
+
+def test_unknown_key_is_rejected():
+    async def run():
+        quota = _quota([{"user_id": "u1"}])
+        with pytest.raises(QuotaExceededError):
+            await quota.reserve("u2")
+
+    asyncio.run(run())